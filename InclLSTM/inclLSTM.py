@@ -3,6 +3,8 @@ import tensorflow as tf
 from tensorflow.keras import layers, models, backend as K, optimizers, losses
 import os
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
 tf.get_logger().setLevel('ERROR')
@@ -29,6 +31,58 @@ class FLShareLayer(layers.Layer):
         config.update({"units": self.units})
         return config
 
+def make_dataset(X_p, X_f, y, batch_size=32):
+    """Shuffled, batched and prefetched tf.data.Dataset of ((X_p, X_f), y) arrays held in memory"""
+    dataset = tf.data.Dataset.from_tensor_slices(((X_p.astype(np.float32), X_f.astype(np.float32)), y.astype(np.float32)))
+    return dataset.shuffle(len(y)).batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+
+class ReplayBuffer:
+    """
+    Fixed capacity buffer of the latest (past, future, target) windows, preallocated once and written in place:
+    once full, every append overwrites the oldest windows.
+    """
+    def __init__(self, capacity, steps_past, features_past, steps_future, features_future):
+        self.capacity = capacity
+        self.X_p = np.zeros((capacity, steps_past, features_past), dtype=np.float32)
+        self.X_f = np.zeros((capacity, steps_future, features_future), dtype=np.float32)
+        self.y = np.zeros((capacity, steps_future), dtype=np.float32)
+        self.size = 0
+        self.head = 0
+
+    def __len__(self):
+        return self.size
+
+    def append(self, X_p, X_f, y):
+        """Adds the windows, keeping only the last capacity if there are more"""
+        n = min(len(y), self.capacity)
+        slots = (self.head + np.arange(n)) % self.capacity
+        self.X_p[slots] = X_p[-n:]
+        self.X_f[slots] = X_f[-n:]
+        self.y[slots] = np.asarray(y[-n:]).reshape(n, -1)
+        self.head = (self.head + n) % self.capacity
+        self.size = min(self.size + n, self.capacity)
+
+    def _gather(self, idx):
+        return self.X_p[idx], self.X_f[idx], self.y[idx]
+
+    def dataset(self, batch_size=32):
+        """
+        tf.data.Dataset over the buffered windows, reshuffled every epoch.
+        Only the indices go through shuffle and batch, each batch is gathered from the buffer on demand
+        while the model trains on the previous one.
+        """
+        def gather(idx):
+            X_p, X_f, y = tf.numpy_function(self._gather, [idx], [tf.float32, tf.float32, tf.float32])
+            X_p.set_shape((None,) + self.X_p.shape[1:])
+            X_f.set_shape((None,) + self.X_f.shape[1:])
+            y.set_shape((None,) + self.y.shape[1:])
+            return (X_p, X_f), y
+
+        dataset = tf.data.Dataset.range(self.size).shuffle(self.size).batch(batch_size)
+        return dataset.map(gather).prefetch(tf.data.AUTOTUNE)
+
+
 class IncLSTMDual:
     def __init__(self, steps_past, features_past, steps_future, features_future, buffer_size=5):
         self.steps_past = steps_past
@@ -39,6 +93,7 @@ class IncLSTMDual:
         self.weak_learners = []
         self.learner_weights = []
         self.learner_count = 0
+        self._fused = None
 
     def _build_graph(self, trainable=True):
         """Builds the dual input graph"""
@@ -100,16 +155,40 @@ class IncLSTMDual:
         self.learner_count += 1
         return model
 
-    def update_weights_and_buffer(self, X_p_new, X_f_new, y_new):
+    def predict_learners(self, X_past, X_future, batch_size=32):
+        """Predictions of every learner, shape (learners, samples, steps_future), the learners run concurrently"""
+        if not self.weak_learners:
+            return np.zeros((0, len(X_past), self.steps_future))
+
+        # TensorFlow releases the GIL, so the learners' predict calls overlap
+        with ThreadPoolExecutor(max_workers=len(self.weak_learners)) as pool:
+            preds = pool.map(lambda model: model.predict([X_past, X_future], batch_size=batch_size, verbose=0), self.weak_learners)
+            return np.stack(list(preds))
+
+    def combine(self, learner_preds):
+        """Weighted ensemble forecast from the output of predict_learners"""
+        preds_stack = np.zeros(learner_preds.shape[1:])
+        total_w = sum(self.learner_weights)
+
+        for p, w in zip(learner_preds, self.learner_weights):
+            preds_stack += p * w
+
+        return preds_stack / total_w
+
+    def update_weights_and_buffer(self, X_p_new, X_f_new, y_new, learner_preds=None):
         """
-        Implements weighting and buffer, evaluates existing learners on the new data to determine validity
+        Implements weighting and buffer, evaluates existing learners on the new data to determine validity.
+        learner_preds, the predict_learners output on the same data, avoids predicting it again.
         """
         if not self.weak_learners:
             return
 
+        if learner_preds is None:
+            learner_preds = self.predict_learners(X_p_new, X_f_new)
+
+        self._fused = None
         errors = []
-        for model in self.weak_learners:
-            pred = model.predict([X_p_new, X_f_new], verbose=0)
+        for pred in learner_preds:
             abs_err = np.abs(pred - y_new.reshape(pred.shape))
             mean_err = np.mean(abs_err)
             errors.append(mean_err)
@@ -133,17 +212,38 @@ class IncLSTMDual:
 
         self.learner_weights = list(weights)
 
-    def fit_incremental(self, X_p, X_f, y, epochs=10):
-        """Trains a new weak learner and adds it to the ensemble"""
+    def fit_incremental(self, X_p, X_f=None, y=None, epochs=10, batch_size=32, verbose=0):
+        """
+        Trains a new weak learner and adds it to the ensemble.
+        X_p is either a batched tf.data.Dataset of ((X_p, X_f), y), e.g. ReplayBuffer.dataset(), or the past
+        windows with X_f and y, which are then fed through make_dataset.
+        Returns the samples trained on, the training time and the throughput, printed as well when verbose.
+        """
         K.clear_session()
+        self._fused = None
+
+        dataset = X_p if isinstance(X_p, tf.data.Dataset) else make_dataset(X_p, X_f, y, batch_size)
+        # counts the samples actually trained on, for the throughput report
+        seen = tf.Variable(0, dtype=tf.int64)
+        def count(x, y):
+            seen.assign_add(tf.cast(tf.shape(y)[0], tf.int64))
+            return x, y
+        dataset = dataset.map(count)
 
         if not self.weak_learners:
             model = self._build_base_model()
-            model.fit([X_p, X_f], y, epochs=epochs*2, batch_size=32, verbose=0)
+            epochs = epochs * 2
         else:
             prev = self.weak_learners[-1]
             model = self._build_transfer_model(prev)
-            model.fit([X_p, X_f], y, epochs=epochs, batch_size=32, verbose=0)
+
+        start = time.perf_counter()
+        model.fit(dataset, epochs=epochs, shuffle=False, verbose=0)
+        elapsed = time.perf_counter() - start
+        samples = int(seen.numpy())
+        stats = {"samples": samples, "elapsed_s": elapsed, "samples_per_s": samples / elapsed if elapsed > 0 else 0.0}
+        if verbose:
+            print(f"Learner {self.learner_count}: {samples} samples in {elapsed:.1f}s ({stats['samples_per_s']:.0f} samples/s)")
 
         self.weak_learners.append(model)
 
@@ -155,19 +255,108 @@ class IncLSTMDual:
 
         total = sum(self.learner_weights)
         self.learner_weights = [w/total for w in self.learner_weights]
+        return stats
+
+    @staticmethod
+    def _learner_parts(model):
+        """Layers of a learner (or of an old_branch) built by _build_graph/_build_transfer_model, by role"""
+        dense = [l for l in model.layers if isinstance(l, layers.Dense)]
+        return {
+            'lstms': [l for l in model.layers if isinstance(l, layers.Bidirectional)],
+            'flatten': next(l for l in model.layers if isinstance(l, layers.Flatten)),
+            'concat': next(l for l in model.layers if isinstance(l, layers.Concatenate)),
+            'hidden': dense[0],
+            'hook': next(l for l in model.layers if isinstance(l, layers.Lambda)),
+            'old_branch': next((l for l in model.layers if isinstance(l, models.Model)), None),
+            'fusion': next((l for l in model.layers if isinstance(l, FLShareLayer)), None),
+            'output': dense[-1],
+        }
+
+    @staticmethod
+    def _hidden_weights(parts):
+        return [w for layer in parts['lstms'] + [parts['hidden']] for w in layer.get_weights()]
+
+    @staticmethod
+    def _hidden_state(parts, X_past, X_future):
+        """Output of the shared hook: the LSTM encoding of the past joined with the flattened future"""
+        x = X_past
+        for lstm in parts['lstms']:
+            x = lstm(x, training=False)
+        concat = parts['concat']([x, parts['flatten'](X_future)])
+        return parts['hook'](parts['hidden'](concat))
+
+    def compile_inference(self, verbose=0):
+        """
+        Fused inference mode: compiles the weighted ensemble into a single tf.function on shared inputs,
+        with the normalized learner weights as graph constants.
+        The frozen old_branch of a transfer learner computes the hook of the learner it was built on: when that
+        learner is still in the ensemble (same weights) its hidden state is reused instead of being computed twice.
+        predict uses the fused graph until the learners or their weights change.
+        Returns the number of learners fused and of old branches shared, printed as well when verbose.
+        """
+        if not self.weak_learners:
+            self._fused = None
+            return {"learners": 0, "shared_branches": 0}
+
+        parts = [self._learner_parts(m) for m in self.weak_learners]
+        # hidden states computed once and shared: ('hidden', j) of learner j, ('branch', k) of the old_branch of k
+        providers = [(('hidden', j), self._hidden_weights(p)) for j, p in enumerate(parts)]
+        old_sources = []
+        for k, p in enumerate(parts):
+            if p['old_branch'] is None:
+                old_sources.append(None)
+                continue
+            branch_weights = self._hidden_weights(self._learner_parts(p['old_branch']))
+            source = next((key for key, w in providers
+                           if len(w) == len(branch_weights) and all(np.array_equal(a, b) for a, b in zip(w, branch_weights))), None)
+            if source is None:
+                source = ('branch', k)
+                providers.append((source, branch_weights))
+            old_sources.append(source)
+
+        branches = {source[1] for source in old_sources if source is not None and source[0] == 'branch'}
+        weights = tf.constant(np.asarray(self.learner_weights) / sum(self.learner_weights), dtype=tf.float32)
+
+        @tf.function(input_signature=[
+            tf.TensorSpec((None, self.steps_past, self.features_past), tf.float32),
+            tf.TensorSpec((None, self.steps_future, self.features_future), tf.float32),
+        ])
+        def fused(X_past, X_future):
+            states = {('hidden', j): self._hidden_state(p, X_past, X_future) for j, p in enumerate(parts)}
+            for k in branches:
+                states[('branch', k)] = parts[k]['old_branch']([X_past, X_future], training=False)
+
+            outputs = []
+            for j, (p, source) in enumerate(zip(parts, old_sources)):
+                h_new = states[('hidden', j)]
+                if p['fusion'] is None:
+                    outputs.append(p['output'](h_new))
+                else:
+                    outputs.append(p['output'](p['fusion']([states[source], h_new])))
+            return tf.tensordot(weights, tf.stack(outputs), axes=1)
+
+        self._fused = fused
+        shared = sum(1 for source in old_sources if source is not None and source[0] == 'hidden')
+        if verbose:
+            print(f"Fused ensemble of {len(parts)} learners compiled ({shared} old branches shared)")
+        return {"learners": len(parts), "shared_branches": shared}
+
+    def _predict_fused(self, X_past, X_future, batch_size=256):
+        preds = [
+            self._fused(tf.convert_to_tensor(X_past[i:i + batch_size], tf.float32),
+                        tf.convert_to_tensor(X_future[i:i + batch_size], tf.float32)).numpy()
+            for i in range(0, len(X_past), batch_size)
+        ]
+        return np.concatenate(preds).astype(np.float64)
 
     def predict(self, X_past, X_future):
         if not self.weak_learners:
             return np.zeros((len(X_past), self.steps_future))
 
-        preds_stack = np.zeros((len(X_past), self.steps_future))
-        total_w = sum(self.learner_weights)
-
-        for model, w in zip(self.weak_learners, self.learner_weights):
-            p = model.predict([X_past, X_future], verbose=0)
-            preds_stack += p * w
+        if self._fused is not None:
+            return self._predict_fused(X_past, X_future)
 
-        return preds_stack / total_w
+        return self.combine(self.predict_learners(X_past, X_future))
 
     def save_system(self, directory):
         """Saves the entire ensemble, metadata, and config"""
@@ -219,7 +408,8 @@ class IncLSTMDual:
             if not os.path.exists(model_path):
                 break
 
-            model = tf.keras.models.load_model(model_path, custom_objects=custom_objects)
+            # the learners contain Lambda layers, which Keras only deserializes with safe mode off; the files are our own
+            model = tf.keras.models.load_model(model_path, custom_objects=custom_objects, safe_mode=False)
             instance.weak_learners.append(model)
             i += 1
 
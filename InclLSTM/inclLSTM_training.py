@@ -1,18 +1,41 @@
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 import pandas as pd
 import tensorflow as tf
 from sklearn.preprocessing import MinMaxScaler
 import matplotlib.pyplot as plt
 import os
 import joblib
-from inclLSTM import IncLSTMDual
+from inclLSTM import IncLSTMDual, ReplayBuffer
 
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
 tf.get_logger().setLevel('ERROR')
 
 
+class DualWindows:
+    """
+    The (past, future, target) windows of every inverter, sorted by forecast time, as strided views over the
+    scaled rows: windows[idx] copies only the windows it selects, the full set is never materialized.
+    """
+    def __init__(self, data_past, data_fut, data_target, starts, lookback, horizon):
+        self.past = sliding_window_view(data_past, lookback, axis=0).transpose(0, 2, 1)
+        self.fut = sliding_window_view(data_fut, horizon, axis=0).transpose(0, 2, 1)
+        self.target = sliding_window_view(data_target[:, 0], horizon)
+        self.starts = starts
+        self.lookback = lookback
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, idx):
+        """X_past, X_future, y of the windows selected by idx (indices or boolean mask)"""
+        s = self.starts[idx]
+        return self.past[s], self.fut[s + self.lookback], self.target[s + self.lookback]
+
+
 def prepare_dual_data(df, lookback=192, horizon=96):
-    all_X_past, all_X_fut, all_y, all_t = [], [], [], []
+    rows, starts, all_t = [], [], []
+    n_rows = 0
 
     cols_past = ['AC_POWER', 'AMBIENT_TEMPERATURE', 'MODULE_TEMPERATURE', 'IRRADIATION', 'hour_sin', 'hour_cos']
     cols_fut = ['AMBIENT_TEMPERATURE', 'MODULE_TEMPERATURE', 'IRRADIATION', 'hour_sin', 'hour_cos']
@@ -43,26 +66,27 @@ def prepare_dual_data(df, lookback=192, horizon=96):
 
         n_samples = len(d_p) - lookback - horizon + 1
         if n_samples > 0:
-            idx_p = np.arange(n_samples)[:, None] + np.arange(lookback)[None, :]
-            all_X_past.append(d_p[idx_p])
-
-            idx_f = np.arange(n_samples)[:, None] + np.arange(lookback, lookback + horizon)[None, :]
-            all_X_fut.append(d_f[idx_f])
-
-            all_y.append(d_t[idx_f].squeeze())
+            # windows start at every row of the inverter that leaves a full past and future
+            starts.append(n_rows + np.arange(n_samples))
+            rows.append((d_p, d_f, d_t))
+            n_rows += len(d_p)
             all_t.append(time_vals[np.arange(lookback, len(d_p) - horizon + 1)])
 
-    if not all_X_past:
+    if not starts:
         raise ValueError("Not enough data to create windows.")
 
-    X_past = np.concatenate(all_X_past)
-    X_fut = np.concatenate(all_X_fut)
-    y = np.concatenate(all_y)
     t = np.concatenate(all_t)
-
     sort_idx = np.argsort(t)
 
-    return X_past[sort_idx], X_fut[sort_idx], y[sort_idx], t[sort_idx], scalers
+    windows = DualWindows(
+        np.concatenate([r[0] for r in rows]),
+        np.concatenate([r[1] for r in rows]),
+        np.concatenate([r[2] for r in rows]),
+        np.concatenate(starts)[sort_idx],
+        lookback,
+        horizon,
+    )
+    return windows, t[sort_idx], scalers
 
 print("Loading Data...")
 df = pd.read_csv('cleaned_data/solar_1.csv')
@@ -74,7 +98,7 @@ LOOKBACK = 96 * 2
 HORIZON = 96
 
 print("Preparing Dual Inputs...")
-X_all_p, X_all_f, y_all, t_all, scalers = prepare_dual_data(df, LOOKBACK, HORIZON)
+windows, t_all, scalers = prepare_dual_data(df, LOOKBACK, HORIZON)
 
 scaler_filename = "solar_scalers.pkl"
 joblib.dump(scalers, scaler_filename)
@@ -88,31 +112,33 @@ print(f"Splitting data. Final Test Set starts after: {cutoff_timestamp}")
 test_mask = t_all > cutoff_timestamp
 working_mask = ~test_mask
 
-X_test_p, X_test_f, y_test, t_test = X_all_p[test_mask], X_all_f[test_mask], y_all[test_mask], t_all[test_mask]
-X_work_p, X_work_f, y_work, t_work = X_all_p[working_mask], X_all_f[working_mask], y_all[working_mask], t_all[working_mask]
+X_test_p, X_test_f, y_test = windows[test_mask]
+t_test = t_all[test_mask]
+work_idx = np.flatnonzero(working_mask)
+t_work = t_all[work_idx]
 
-print(f"Total Working Samples (Init + Stream): {len(y_work)}")
+print(f"Total Working Samples (Init + Stream): {len(work_idx)}")
 print(f"Final Held-out Test Samples: {len(y_test)}")
 
 start_date = pd.to_datetime(t_work[0])
 split_date = start_date + pd.Timedelta(days=7)
 init_mask = t_work < split_date
 
-X_p_init, X_f_init, y_init = X_work_p[init_mask], X_work_f[init_mask], y_work[init_mask]
-X_p_stream, X_f_stream, y_stream, t_stream = X_work_p[~init_mask], X_work_f[~init_mask], y_work[~init_mask], t_work[~init_mask]
+# the stream windows are only materialized one day at a time
+X_p_init, X_f_init, y_init = windows[work_idx[init_mask]]
+stream_idx, t_stream = work_idx[~init_mask], t_work[~init_mask]
 
 
 
 model = IncLSTMDual(LOOKBACK, 6, HORIZON, 5, buffer_size=5)
 
 print(f"Cold Start Training ({len(y_init)} samples)...")
-model.fit_incremental(X_p_init, X_f_init, y_init, epochs=20)
+model.fit_incremental(X_p_init, X_f_init, y_init, epochs=20, verbose=1)
 
 SEED = 2000
-buf_X_p = list(X_p_init[-SEED:])
-buf_X_f = list(X_f_init[-SEED:])
-buf_y = list(y_init[-SEED:])
 MAX_BUF = 3000
+replay = ReplayBuffer(MAX_BUF, LOOKBACK, 6, HORIZON, 5)
+replay.append(X_p_init[-SEED:], X_f_init[-SEED:], y_init[-SEED:])
 
 print("Starting Stream Loop...")
 
@@ -123,25 +149,18 @@ for current_date in unique_dates:
     idx = np.where(dates == current_date)[0]
     if len(idx) == 0: continue
 
-    X_p_day = X_p_stream[idx]
-    X_f_day = X_f_stream[idx]
-    y_day = y_stream[idx]
-
-    model.predict(X_p_day, X_f_day)
-
-    model.update_weights_and_buffer(X_p_day, X_f_day, y_day)
+    X_p_day, X_f_day, y_day = windows[stream_idx[idx]]
 
-    buf_X_p.extend(X_p_day)
-    buf_X_f.extend(X_f_day)
-    buf_y.extend(y_day)
+    # one prediction per learner, used for the day's forecast and for re-weighting
+    learner_preds = model.predict_learners(X_p_day, X_f_day)
+    pred_day = np.maximum(model.combine(learner_preds), 0)
+    day_mae = np.mean(np.abs(scalers['scaler_target'].inverse_transform(pred_day) - scalers['scaler_target'].inverse_transform(y_day)))
 
-    if len(buf_X_p) > MAX_BUF:
-        buf_X_p = buf_X_p[-MAX_BUF:]
-        buf_X_f = buf_X_f[-MAX_BUF:]
-        buf_y = buf_y[-MAX_BUF:]
+    model.update_weights_and_buffer(X_p_day, X_f_day, y_day, learner_preds)
 
-    model.fit_incremental(np.array(buf_X_p), np.array(buf_X_f), np.array(buf_y), epochs=15)
-    print(f"Processed Day: {current_date}")
+    replay.append(X_p_day, X_f_day, y_day)
+    model.fit_incremental(replay.dataset(), epochs=15, verbose=1)
+    print(f"Processed Day: {current_date} | Forecast MAE: {day_mae:.2f} kW")
 
 print("\nFINAL TEST ON HELD-OUT DATA (LAST 24 HOURS)")
 
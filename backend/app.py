@@ -1,23 +1,47 @@
+import os
 from flask import Flask
+from werkzeug.serving import is_running_from_reloader
 from backend.routes.plants import plants_bp
 from backend.routes.panels import panels_bp
-from backend.utils.startups_tasks import startup_tasks
+from backend.routes.stats import stats_bp
+from backend.services.service_registry import ServiceRegistry
+from backend.dao.storage import set_storage
+from backend.utils.startups_tasks import startup_tasks, start_ingestion
 
-def create_app():
+def create_app(ingest: bool = True):
     app = Flask(__name__)
 
 
+    app.config["STORAGE_BACKEND"] = os.environ.get("STORAGE_BACKEND", "csv")   # "csv" or "parquet"
     app.config["DATA_DIRECTORY"] = "cleaned_data"
     app.config["HISTORICAL_PREDICTIONS"] = "historical_predictions"
+    app.config["CHECKPOINT_DIRECTORY"] = "model_checkpoints"
+    app.config["CHECKPOINT_INTERVAL_S"] = 300
+    app.config["STARTUP_WORKERS"] = int(os.environ.get("STARTUP_WORKERS", os.cpu_count() or 1))
+    # opt-in replay of the slots after the bootstrap: seconds between 15 minute slots, 0 as fast as possible, < 0 (default) disables.
+    # It learns through the same plant learners as /new_prediction, so run one or the other
+    app.config["INGESTION_INTERVAL_S"] = float(os.environ.get("INGESTION_INTERVAL_S", -1))
+    app.config["LSTM_MODEL_DIRECTORY"] = os.environ.get("LSTM_MODEL_DIRECTORY", "ilstm_model")   # "" disables the LSTM forecasts
+
+    set_storage(app.config["STORAGE_BACKEND"])
 
     app.register_blueprint(plants_bp)
     app.register_blueprint(panels_bp)
+    app.register_blueprint(stats_bp)
 
     startup_tasks(app)
 
-    return app
+    app.services = ServiceRegistry(app)
+    # the LSTM routes answer 503 until the ensemble is loaded
+    app.services.lstm_service.start()
 
-app = create_app()
+    if ingest:
+        start_ingestion(app)
+
+    return app
 
 if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+    # created here and not at import, the spawned startup workers import this module again
+    # the debug reloader runs this in the watching parent and in the serving child, only the child ingests
+    app = create_app(ingest=is_running_from_reloader())
+    app.run(debug=True)
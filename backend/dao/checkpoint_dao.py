@@ -0,0 +1,45 @@
+import os
+import pickle
+import tempfile
+from pathlib import Path
+from backend.models.checkpoint import ModelCheckpoint
+
+
+class CheckpointDao:
+    # one pickle per plant holding the (model, metric, adwin) state and the last timestamp it learned
+    def __init__(self, data_directory: str = "model_checkpoints"):
+        self.data_directory = Path(data_directory)
+
+
+    def get_by_plant_id(self, plant_id: str) -> ModelCheckpoint | None:
+
+        path = self.data_directory / f"{plant_id}.pkl"
+        if not path.exists():
+            return None
+
+        try:
+            with path.open("rb") as f:
+                checkpoint = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+            print(f"Discarding unreadable checkpoint {path}: {e}")
+            return None
+
+        if not isinstance(checkpoint, ModelCheckpoint) or checkpoint.plant_id != plant_id:
+            return None
+
+        return checkpoint
+
+
+    def save(self, checkpoint: ModelCheckpoint):
+        self.data_directory.mkdir(parents=True, exist_ok=True)
+        path = self.data_directory / f"{checkpoint.plant_id}.pkl"
+
+        # write to a temporary file first so a crash never leaves a truncated checkpoint behind
+        fd, tmp_path = tempfile.mkstemp(dir=self.data_directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(checkpoint, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
@@ -0,0 +1,206 @@
+import sys
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backend.dao.storage import CSV, DATE_FORMAT, get_storage
+from backend.dao.snapshot import PlantSnapshot, open_snapshot
+
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def to_epoch(timestamp: datetime) -> int:
+    """Converts a naive datetime to integer seconds since EPOCH."""
+    return (timestamp - EPOCH) // timedelta(seconds=1)
+
+
+def to_datetimes(epochs: np.ndarray) -> List[datetime]:
+    """Converts an array of epoch seconds back to a list of datetime objects."""
+    return np.asarray(epochs, dtype=np.int64).astype("datetime64[s]").tolist()
+
+
+def aggregate_by_timestamp(timestamps: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Sums values sharing a timestamp, returns the sorted unique timestamps and their totals."""
+    unique, inverse = np.unique(timestamps, return_inverse=True)
+    return unique, np.bincount(inverse, weights=values, minlength=len(unique))
+
+
+def group_rows(panel_codes: np.ndarray, panel_ids: List[str]) -> Dict[str, np.ndarray]:
+    """Row indices of every panel, in the order of the rows (time order for time sorted columns)."""
+    # one stable sort groups the rows by panel while keeping their order
+    by_panel = np.argsort(panel_codes, kind="stable")
+    splits = np.searchsorted(panel_codes[by_panel], np.arange(1, len(panel_ids)))
+    return dict(zip(panel_ids, np.split(by_panel, splits)))
+
+
+def _search_rows(timestamps: np.ndarray, rows: np.ndarray, epoch: int, side: str) -> int:
+    """np.searchsorted(timestamps[rows], epoch, side) in O(log n), without gathering timestamps[rows]."""
+    lo, hi = 0, len(rows)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        t = timestamps[rows[mid]]
+        if t < epoch or (side == "right" and t == epoch):
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def rows_in_range(timestamps: np.ndarray, rows: np.ndarray, start_time: datetime = None, end_time: datetime = None) -> np.ndarray:
+    """The time sorted rows with start_time <= timestamp <= end_time, a view of rows."""
+    lo = 0 if start_time is None else _search_rows(timestamps, rows, to_epoch(start_time), "left")
+    hi = len(rows) if end_time is None else _search_rows(timestamps, rows, to_epoch(end_time), "right")
+    return rows[lo:max(lo, hi)]
+
+
+@dataclass
+class PlantMeasurements:
+    """
+    Columnar view of one plant csv file, sorted by timestamp.
+    Rows sharing a timestamp keep the order they have in the file.
+    The plant-level series (sum over panels per timestamp) is computed once at load.
+    """
+    timestamps: np.ndarray      # int64 epoch seconds
+    panel_codes: np.ndarray     # int32 index into panel_ids
+    ac_power: np.ndarray        # float64
+    panel_ids: List[str]
+    panel_rows: Dict[str, np.ndarray]   # panel id -> row indices, sorted by time
+    global_timestamps: np.ndarray
+    global_power: np.ndarray
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def time_bounds(self, start_time: datetime = None, end_time: datetime = None) -> Tuple[int, int]:
+        """Returns the [lo, hi) row interval with start_time <= timestamp <= end_time."""
+        lo = 0 if start_time is None else int(np.searchsorted(self.timestamps, to_epoch(start_time), side="left"))
+        hi = len(self.timestamps) if end_time is None else int(np.searchsorted(self.timestamps, to_epoch(end_time), side="right"))
+        return lo, max(lo, hi)
+
+    def global_bounds(self, start_time: datetime = None, end_time: datetime = None) -> Tuple[int, int]:
+        lo = 0 if start_time is None else int(np.searchsorted(self.global_timestamps, to_epoch(start_time), side="left"))
+        hi = len(self.global_timestamps) if end_time is None else int(np.searchsorted(self.global_timestamps, to_epoch(end_time), side="right"))
+        return lo, max(lo, hi)
+
+    def panel_indices(self, panel_id: str, start_time: datetime = None, end_time: datetime = None) -> np.ndarray:
+        rows = self.panel_rows.get(panel_id)
+        if rows is None:
+            return np.empty(0, dtype=np.int64)
+        return rows_in_range(self.timestamps, rows, start_time, end_time)
+
+
+def load_plant_measurements(path: Path) -> PlantMeasurements:
+    """
+    Parses a plant file once into columnar arrays.
+    Accepts both the cleaned data layout (AC_POWER) and the prediction layout (REAL_AC_POWER).
+    """
+    storage = get_storage()
+    header = storage.columns(path)
+    power_col = "AC_POWER" if "AC_POWER" in header else "REAL_AC_POWER"
+
+    df = storage.read(path, ["DATE_TIME", "SOURCE_KEY", power_col], dtype={"SOURCE_KEY": str})
+    # panel ids in order of first appearance in the file, before the time sort reorders the rows
+    codes, uniques = pd.factorize(df["SOURCE_KEY"].to_numpy())
+    df["PANEL_CODE"] = codes
+    df["DATE_TIME"] = pd.to_datetime(df["DATE_TIME"], format=DATE_FORMAT, errors="coerce")
+    df[power_col] = pd.to_numeric(df[power_col], errors="coerce")
+    df = df.dropna(subset=["DATE_TIME", "SOURCE_KEY", power_col])
+
+    timestamps = df["DATE_TIME"].to_numpy(dtype="datetime64[s]").astype(np.int64)
+    order = np.argsort(timestamps, kind="stable")
+    timestamps = timestamps[order]
+
+    panel_codes = df["PANEL_CODE"].to_numpy(dtype=np.int32)[order]
+    panel_ids = [sys.intern(str(p)) for p in uniques]
+
+    panel_rows = group_rows(panel_codes, panel_ids)
+
+    ac_power = df[power_col].to_numpy(dtype=np.float64)[order]
+    global_timestamps, global_power = aggregate_by_timestamp(timestamps, ac_power)
+
+    return PlantMeasurements(
+        timestamps=timestamps,
+        panel_codes=panel_codes,
+        ac_power=ac_power,
+        panel_ids=panel_ids,
+        panel_rows=panel_rows,
+        global_timestamps=global_timestamps,
+        global_power=global_power,
+    )
+
+
+def snapshot_plant_measurements(snapshot: PlantSnapshot) -> PlantMeasurements:
+    """PlantMeasurements over the memory mapped columns of a snapshot, without copying them."""
+    panel_ids = [sys.intern(p) for p in snapshot.meta["panel_ids"]]
+    return PlantMeasurements(
+        timestamps=snapshot.column("timestamps"),
+        panel_codes=snapshot.column("panel_codes"),
+        ac_power=snapshot.column("ac_power"),
+        panel_ids=panel_ids,
+        panel_rows=dict(zip(panel_ids, np.split(snapshot.column("by_panel"), snapshot.column("panel_splits")))),
+        global_timestamps=snapshot.column("global_timestamps"),
+        global_power=snapshot.column("global_power"),
+    )
+
+
+class PlantFileStore(ABC):
+    """
+    Process-wide cache of per-plant columnar data keyed by file path.
+    A file is parsed again only when its version (see the storage backend) changes.
+    Subclasses implement _load, which parses one plant file.
+    """
+    def __init__(self):
+        self._plants: Dict[Path, Tuple[tuple, object]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @abstractmethod
+    def _load(self, path: Path):
+        ...
+
+    def get(self, path: Path):
+        version = get_storage().version(path)
+        if version is None:
+            return None
+
+        key = path.resolve()
+        cached = self._plants.get(key)
+        if cached is not None and cached[0] == version:
+            self.hits += 1
+            return cached[1]
+
+        with self._lock:
+            cached = self._plants.get(key)
+            if cached is not None and cached[0] == version:
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+            plant = self._load(path)
+            self._plants[key] = (version, plant)
+            return plant
+
+    def clear(self):
+        with self._lock:
+            self._plants.clear()
+
+    def stats(self) -> dict:
+        return {"files": len(self._plants), "hits": self.hits, "misses": self.misses}
+
+
+class MeasurementStore(PlantFileStore):
+    def _load(self, path: Path) -> PlantMeasurements:
+        snapshot = open_snapshot(path) if get_storage() is CSV else None
+        if snapshot is not None:
+            return snapshot_plant_measurements(snapshot)
+        return load_plant_measurements(path)
+
+
+measurement_store = MeasurementStore()
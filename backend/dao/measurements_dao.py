@@ -1,153 +1,103 @@
-import csv
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import List
 from pathlib import Path
-from collections import defaultdict
 from backend.models.measurement import PanelMeasurement, GlobalMeasurement
+from backend.dao.measurement_store import PlantMeasurements, measurement_store, to_epoch, to_datetimes
+from backend.dao.storage import get_storage
+from backend.utils.downsampling import Downsample
 
 
 class MeasurementsDAO:
-    def __init__(self, data_directory: str):
+    def __init__(self, data_directory: str, store=measurement_store):
         self.data_directory = Path(data_directory)
+        self.store = store
 
 
-    def _parse_row(self, plant_id: str, row: dict, panel_id: str = None) -> PanelMeasurement:
+    def _load_plant(self, plant_id: str) -> PlantMeasurements | None:
+        return self.store.get(get_storage().plant_path(self.data_directory, plant_id))
 
-        try:
-            if panel_id is not None and row.get("SOURCE_KEY") != panel_id:
-                return None  
-            
-            if "AC_POWER" in row:
-                ac_power = float(row["AC_POWER"])
-            else:
-                ac_power = float(row["REAL_AC_POWER"]) 
 
-            return PanelMeasurement(
-                timestamp=datetime.strptime(row["DATE_TIME"], "%Y-%m-%d %H:%M:%S"),
-                plant_id=plant_id,
-                panel_id=row["SOURCE_KEY"],
-                ac_power=ac_power,
-            )
-        except (KeyError, ValueError, TypeError):
-            return None
+    def plant_version(self, plant_id: str):
+        """(version, last modified ns) of the plant file the reads are served from, (None, None) when missing."""
+        storage = get_storage()
+        path = storage.plant_path(self.data_directory, plant_id)
+        return storage.version(path), storage.last_modified(path)
+
+
+    def _to_panel_measurements(self, plant_id: str, plant: PlantMeasurements, rows) -> List[PanelMeasurement]:
+        timestamps = to_datetimes(plant.timestamps[rows])
+        panel_ids = [plant.panel_ids[c] for c in plant.panel_codes[rows].tolist()]
+        powers = plant.ac_power[rows].tolist()
+
+        return [
+            PanelMeasurement(timestamp=ts, plant_id=plant_id, panel_id=panel_id, ac_power=power)
+            for ts, panel_id, power in zip(timestamps, panel_ids, powers)
+        ]
 
 
     def get_panel_measurement_by_plant_id_and_panel_id_and_timestamp(
         self, plant_id: str, panel_id: str, timestamp: datetime
-    ) -> List[PanelMeasurement]:
+    ) -> PanelMeasurement:
 
-        csv_file = self.data_directory / f"{plant_id}.csv"
-        if not csv_file.exists():
+        plant = self._load_plant(plant_id)
+        if plant is None:
             return
-        else:
-            with open(csv_file, newline="") as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    measurement = self._parse_row(plant_id, row, panel_id)
-                    if measurement is not None and  measurement.timestamp == timestamp and measurement.panel_id == panel_id:
-                        return measurement
-
-        return
 
+        rows = plant.panel_indices(panel_id, start_time=timestamp, end_time=timestamp)
+        if len(rows) == 0:
+            return
 
-    def get_all_panel_measurements_by_plant_id_and_panel_id(self, plant_id: str, panel_id: str) -> List[PanelMeasurement]:
-        
-        measurements = []
+        return self._to_panel_measurements(plant_id, plant, rows[:1])[0]
 
-        csv_file = self.data_directory / f"{plant_id}.csv"
-        if not csv_file.exists():
-            return []
 
-        with open(csv_file, newline="") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                m = self._parse_row(plant_id, row, panel_id=panel_id)
-                if m is not None:
-                    measurements.append(m)
-        return measurements
+    def get_all_panel_measurements_by_plant_id_and_panel_id(self, plant_id: str, panel_id: str) -> List[PanelMeasurement]:
+        return self.get_panel_measurements_by_panel_id_and_time_range(plant_id, panel_id)
     
 
     def get_panel_measurements_by_panel_id_and_time_range(
-        self, plant_id: str, panel_id: str, start_time: datetime = None, end_time: datetime = None
+        self, plant_id: str, panel_id: str, start_time: datetime = None, end_time: datetime = None, limit: int = None, downsample: Downsample = None
     ) -> List[PanelMeasurement]:
-        
-        measurements = []
+        """
+        Measurements of one panel sorted by time, at most limit of them when given.
+        With downsample the columns are reduced first and only the output rows become objects.
+        """
 
-        csv_file = self.data_directory / f"{plant_id}.csv"
-        if not csv_file.exists():
+        plant = self._load_plant(plant_id)
+        if plant is None:
             return []
 
+        rows = plant.panel_indices(panel_id, start_time=start_time, end_time=end_time)[:limit]
+        if downsample is None:
+            return self._to_panel_measurements(plant_id, plant, rows)
 
-        if end_time is None and start_time is None:
-            return self.get_all_panel_measurements_by_plant_id_and_panel_id(plant_id, panel_id)
-        
-        if end_time is None:
-            end_time = datetime.max
-        if start_time is None:
-            start_time = datetime.min
-
-        with open(csv_file, newline="") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                m = self._parse_row(plant_id, row, panel_id)
-                if m is not None and start_time <= m.timestamp <= end_time:
-                    measurements.append(m)
-
-        return measurements
+        epochs, columns = downsample.reduce(plant.timestamps[rows], {"ac_power": plant.ac_power[rows]})
+        return [
+            PanelMeasurement(timestamp=ts, plant_id=plant_id, panel_id=panel_id, ac_power=power)
+            for ts, power in zip(to_datetimes(epochs), columns["ac_power"].tolist())
+        ]
 
 
     def get_all_panel_measurements_by_plant_id(self, plant_id: str) -> List[PanelMeasurement]:
-        
-        measurements = []
-
-        csv_file = self.data_directory / f"{plant_id}.csv"
-        if not csv_file.exists():
-            return []
-        
-        with open(csv_file, newline="") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                m = self._parse_row(plant_id, row)
-                if m is not None:
-                    measurements.append(m)
-        return measurements
+        return self.get_panel_measurements_by_plant_id_and_time_range(plant_id)
 
 
     def get_panel_measurements_by_plant_id_and_time_range(
         self, plant_id: str, start_time: datetime = None, end_time: datetime = None
     ) -> List[PanelMeasurement]:
-        
-        measurements = []
 
-        csv_file = self.data_directory / f"{plant_id}.csv"
-        if not csv_file.exists():
+        plant = self._load_plant(plant_id)
+        if plant is None:
             return []
-        
-        if start_time is None and end_time is None:
-            return self.get_all_panel_measurements_by_plant_id(plant_id=plant_id)
-
-        if start_time is None:
-            start_time = datetime.min
-
-        if end_time is None:
-            end_time = datetime.max
 
-        with open(csv_file, newline="") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                m = self._parse_row(plant_id, row)
-                if m is not None and start_time <= m.timestamp <= end_time:
-                    measurements.append(m)
-
-        return measurements
+        lo, hi = plant.time_bounds(start_time, end_time)
+        return self._to_panel_measurements(plant_id, plant, slice(lo, hi))
     
 
     def get_all_panel_measurements(self) -> List[PanelMeasurement]:
         
         measurements = []
 
-        for csv in self.data_directory.iterdir():
-            plant_id = csv.stem
+        for plant_id in get_storage().plant_ids(self.data_directory):
             plant_measurements = self.get_all_panel_measurements_by_plant_id(plant_id)
             measurements.extend(plant_measurements)
 
@@ -156,42 +106,27 @@ class MeasurementsDAO:
 
 
     def get_all_global_measurements_by_plant_id(self, plant_id: str) -> List[GlobalMeasurement]:
-        
-        panel_measurements = self.get_all_panel_measurements_by_plant_id(plant_id)
-
-        agg: dict[datetime, float] = defaultdict(float)
-        for m in panel_measurements:
-            agg[m.timestamp] += m.ac_power
-    
-        global_measurements = [
-            GlobalMeasurement(timestamp=ts, plant_id=plant_id, ac_power=power)
-            for ts, power in sorted(agg.items())
-        ]
-    
-        return global_measurements
+        return self.get_global_measurements_by_plant_id_and_time_range(plant_id)
 
 
     def get_global_measurements_by_plant_id_and_time_range(
-        self, plant_id: str, start_time: datetime = None, end_time: datetime = None
+        self, plant_id: str, start_time: datetime = None, end_time: datetime = None, downsample: Downsample = None
     ) -> List[GlobalMeasurement]:
-        
-        all_measurements = self.get_all_global_measurements_by_plant_id(plant_id)
-        
-        if end_time is None and start_time is None:
-            return all_measurements
-        measurements = []
 
-        if end_time is None:
-            end_time = datetime.max
-        
-        if start_time is None:
-            start_time = datetime.min
+        plant = self._load_plant(plant_id)
+        if plant is None:
+            return []
 
-        for m in all_measurements:
-            if m is not None and start_time <= m.timestamp <= end_time:
-                measurements.append(m)
+        lo, hi = plant.global_bounds(start_time, end_time)
+        epochs, power = plant.global_timestamps[lo:hi], plant.global_power[lo:hi]
+        if downsample is not None:
+            epochs, columns = downsample.reduce(epochs, {"ac_power": power})
+            power = columns["ac_power"]
 
-        return measurements
+        return [
+            GlobalMeasurement(timestamp=ts, plant_id=plant_id, ac_power=power)
+            for ts, power in zip(to_datetimes(epochs), power.tolist())
+        ]
     
 
 
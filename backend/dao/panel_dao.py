@@ -1,43 +1,23 @@
 from pathlib import Path
 from typing import List
-import csv
 from backend.models.panel import Panel  
+from backend.dao.measurement_store import measurement_store
+from backend.dao.storage import get_storage
 
 class PanelsDAO:
-    def __init__(self, data_directory: str):
+    def __init__(self, data_directory: str, store=measurement_store):
         self.data_directory = Path(data_directory)
-
-
-
-    def _parse_row(self, plant_id: str, row: dict) -> Panel | None:
-        try:
-            return Panel(
-                id=row["SOURCE_KEY"],
-                plant_id=plant_id
-            )
-        except KeyError:
-            return None
+        self.store = store
 
 
 
     def get_all_by_plant_id(self, plant_id: str) -> List[Panel]:
-        panels: List[Panel] = []
-
-        csv_file = self.data_directory / f"{plant_id}.csv"
-        if not csv_file.exists():
+        # the measurement store already interns the panel ids in order of first appearance
+        plant = self.store.get(get_storage().plant_path(self.data_directory, plant_id))
+        if plant is None:
             return []
 
-        seen_panel_ids = set()
-
-        with open(csv_file, newline="") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                panel = self._parse_row(plant_id, row)
-                if panel is not None and panel.id not in seen_panel_ids:
-                    panels.append(panel)
-                    seen_panel_ids.add(panel.id)
-
-        return panels
+        return [Panel(id=panel_id, plant_id=plant_id) for panel_id in plant.panel_ids]
 
 
 
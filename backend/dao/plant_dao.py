@@ -1,6 +1,7 @@
 from typing import List
 from backend.models.plant import Plant
 from pathlib import Path
+from backend.dao.storage import get_storage
 
 
 
@@ -23,11 +24,11 @@ class PlantsDAO:
     def get_all(self) -> List[Plant]:
         plants: List[Plant] = []
 
-        for csv_file in self.data_directory.glob("*.csv"):
-            plant_name = self._name_refactor(csv_file.stem)
+        for plant_id in get_storage().plant_ids(self.data_directory):
+            plant_name = self._name_refactor(plant_id)
             plant = Plant(
                 name=plant_name,
-                id=str(csv_file.stem)
+                id=str(plant_id)
             )
             plants.append(plant)
 
@@ -1,152 +1,155 @@
-import csv
+import atexit
+import logging
+import threading
+import weakref
 from datetime import datetime, timedelta
-from typing import List
+from typing import List, Iterable
 from pathlib import Path
 from collections import defaultdict
 from backend.models.prediction import PanelPrediction, GlobalPrediction, HistoricalPrediction
+from backend.dao.prediction_index import prediction_index
+from backend.dao.prediction_store import PlantPredictions, prediction_store
+from backend.dao.measurement_store import to_epoch, to_datetimes
+from backend.dao.storage import get_storage
+from backend.utils.downsampling import Downsample
 
 
-class PredictionDao:
-    def __init__(self, data_directory: str = "historical_predictions"):
-        self.data_directory = Path(data_directory)
-        self._index = {}
-
-
-    def _load_index(self, path: Path):
-        if path in self._index:
-            return
+HEADER = [
+    "DATE_TIME",
+    "PLANT_ID",
+    "SOURCE_KEY",
+    "PREDICTED_AC_POWER",
+    "REAL_AC_POWER",
+    "DRIFT"
+]
 
-        seen = set()
+logger = logging.getLogger(__name__)
 
-        if path.exists():
-            with path.open("r", newline="") as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    seen.add((
-                        row["DATE_TIME"],
-                        row["PLANT_ID"],
-                        row["SOURCE_KEY"],
-                    ))
+# DAOs holding unwritten predictions, flushed when the interpreter exits
+_pending_daos = weakref.WeakSet()
 
-        self._index[path] = seen
 
+@atexit.register
+def _flush_pending_daos():
+    for dao in list(_pending_daos):
+        dao.flush()
 
-    def _parse_row(self, plant_id: str, row: dict, panel_id: str = None) -> HistoricalPrediction:
 
-        try:
-            if panel_id is not None and row.get("SOURCE_KEY") != panel_id:
-                return None  
-
-            drift_str = str(row.get("DRIFT", "False")).lower()
-            drift_bool = drift_str in ("true", "1", "t")
-
-            return HistoricalPrediction(
-                timestamp=datetime.strptime(row["DATE_TIME"], "%Y-%m-%d %H:%M:%S"),
+class PredictionDao:
+    """
+    Predictions are written behind a buffer: rows are appended to the plant files when
+    buffer_size rows are pending, by a daemon timer flush_interval_s after the oldest pending row
+    was saved (0 disables it), before any read and at interpreter exit.
+    Duplicate keys are detected through the process-wide PredictionIndex shared by all instances,
+    and reads are served from the PredictionStore, which the flushed rows are appended to.
+    """
+    def __init__(self, data_directory: str = "historical_predictions", buffer_size: int = 1000, flush_interval_s: float = 5.0, index=prediction_index, store=prediction_store):
+        self.data_directory = Path(data_directory)
+        self.buffer_size = buffer_size
+        self.flush_interval_s = flush_interval_s
+        self.index = index
+        self.store = store
+        self._buffer: dict[Path, list] = defaultdict(list)
+        self._buffered_rows = 0
+        self._timer = None
+        self._lock = threading.RLock()
+        self.flush_errors = 0
+        self.last_flush_error = None
+
+
+    def _load_plant(self, plant_id: str) -> PlantPredictions | None:
+        self.flush()
+        return self.store.get(get_storage().plant_path(self.data_directory, plant_id))
+
+
+    def plant_version(self, plant_id: str):
+        """(version, last modified ns) of the plant file, pending rows are flushed first so they count."""
+        self.flush()
+        storage = get_storage()
+        path = storage.plant_path(self.data_directory, plant_id)
+        return storage.version(path), storage.last_modified(path)
+
+
+    def _to_predictions(self, plant_id: str, plant: PlantPredictions, rows) -> List[HistoricalPrediction]:
+        return [
+            HistoricalPrediction(
+                timestamp=ts,
                 plant_id=plant_id,
-                panel_id=row["SOURCE_KEY"],
-                predicted_ac_power=float(row["PREDICTED_AC_POWER"]),
-                real_ac_power=float(row["REAL_AC_POWER"]),
-                drift=drift_bool
-
+                panel_id=plant.panel_ids[code],
+                predicted_ac_power=predicted,
+                real_ac_power=real,
+                drift=drift
             )
-        except (KeyError, ValueError, TypeError):
-            return None
+            for ts, code, predicted, real, drift in zip(
+                to_datetimes(plant.timestamps[rows]),
+                plant.panel_codes[rows].tolist(),
+                plant.predicted[rows].tolist(),
+                plant.real[rows].tolist(),
+                plant.drift[rows].tolist(),
+            )
+        ]
 
 
     def get_all_panel_predictions_by_panel_id(self, plant_id: str, panel_id: str) -> List[HistoricalPrediction]:
-        
-        prediction = []
-
-        csv_file = self.data_directory / f"{plant_id}.csv"
-        if not csv_file.exists():
-            return []
-
-        with open(csv_file, newline="") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                p = self._parse_row(plant_id, row, panel_id=panel_id)
-                if p is not None:
-                    prediction.append(p)
-        return prediction
+        return self.get_panel_predictions_by_panel_id_and_time_range(plant_id, panel_id)
     
 
     def get_panel_predictions_by_panel_id_and_time_range(
-        self, plant_id: str, panel_id: str, start_time: datetime = None, end_time: datetime = None
+        self, plant_id: str, panel_id: str, start_time: datetime = None, end_time: datetime = None, limit: int = None, downsample: Downsample = None
     ) -> List[HistoricalPrediction]:
-        
-        prediction = []
+        """
+        Predictions of one panel sorted by time, at most limit of them when given.
+        With downsample the columns are reduced first and only the output rows become objects.
+        """
 
-        csv_file = self.data_directory / f"{plant_id}.csv"
-        if not csv_file.exists():
+        plant = self._load_plant(plant_id)
+        if plant is None:
             return []
 
-        if end_time is None and start_time is None:
-            return self.get_all_panel_predictions_by_panel_id(panel_id=panel_id)
-
-        if end_time is None:
-            end_time = datetime.max
-        
-        if start_time is None:
-            start_time = datetime.min
-
-        with open(csv_file, newline="") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                m = self._parse_row(plant_id, row, panel_id)
-                if m is not None and start_time <= m.timestamp <= end_time:
-                    prediction.append(m)
-
-        return prediction
+        rows = plant.panel_indices(panel_id, start_time, end_time)[:limit]
+        if downsample is None:
+            return self._to_predictions(plant_id, plant, rows)
+
+        epochs, columns = downsample.reduce(
+            plant.timestamps[rows],
+            {"predicted": plant.predicted[rows], "real": plant.real[rows], "drift": plant.drift[rows]},
+        )
+        return [
+            HistoricalPrediction(
+                timestamp=ts,
+                plant_id=plant_id,
+                panel_id=panel_id,
+                predicted_ac_power=predicted,
+                real_ac_power=real,
+                drift=drift
+            )
+            for ts, predicted, real, drift in zip(
+                to_datetimes(epochs), columns["predicted"].tolist(), columns["real"].tolist(), columns["drift"].tolist()
+            )
+        ]
 
 
     def get_all_panel_predictions_by_plant_id(self, plant_id: str) -> List[HistoricalPrediction]:
-        
-        prediction = []
-
-        csv_file = self.data_directory / f"{plant_id}.csv"
-        if not csv_file.exists():
-            return []
-        
-        with open(csv_file, newline="") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                m = self._parse_row(plant_id, row)
-                if m is not None:
-                    prediction.append(m)
-        return prediction
+        return self.get_panel_predictions_by_plant_id_and_time_range(plant_id)
 
 
     def get_panel_predictions_by_plant_id_and_time_range(
         self, plant_id: str, start_time: datetime = None, end_time: datetime = None
     ) -> List[HistoricalPrediction]:
-        
-        prediction = []
 
-        csv_file = self.data_directory / f"{plant_id}.csv"
-        if not csv_file.exists():
+        plant = self._load_plant(plant_id)
+        if plant is None:
             return []
 
-        if end_time is None:
-            end_time = datetime.max
-        if start_time is None:
-            start_time = datetime.min
-
-        with open(csv_file, newline="") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                m = self._parse_row(plant_id, row)
-                if m is not None and start_time <= m.timestamp <= end_time:
-                    prediction.append(m)
-
-        return prediction
+        lo, hi = plant.time_bounds(start_time, end_time)
+        return self._to_predictions(plant_id, plant, slice(lo, hi))
     
 
     def get_all_panel_predictions(self) -> List[HistoricalPrediction]:
         
         prediction = []
 
-        for csv in self.data_directory.iterdir():
-            plant_id = csv.stem
+        for plant_id in get_storage().plant_ids(self.data_directory):
             plant_prediction = self.get_all_panel_predictions_by_plant_id(plant_id)
             prediction.extend(plant_prediction)
 
@@ -155,86 +158,117 @@ class PredictionDao:
 
 
     def get_all_global_predictions_by_plant_id(self, plant_id: str) -> List[GlobalPrediction]:
-        
-        panel_prediction = self.get_all_panel_predictions_by_plant_id(plant_id)
-
-        agg: dict[datetime, float] = defaultdict(float)
-        for m in panel_prediction:
-            agg[m.timestamp] += m.predicted_ac_power
-    
-        global_prediction = [
-            GlobalPrediction(timestamp=ts, plant_id=plant_id, ac_power=power)
-            for ts, power in sorted(agg.items())
-        ]
-    
-        return global_prediction
+        return self.get_global_predictions_by_plant_id_and_time_range(plant_id)
 
 
     def get_global_predictions_by_plant_id_and_time_range(
-        self, plant_id: str, start_time: datetime = None, end_time: datetime = None
+        self, plant_id: str, start_time: datetime = None, end_time: datetime = None, downsample: Downsample = None
     ) -> List[GlobalPrediction]:
-        
-        all_prediction = self.get_all_global_predictions_by_plant_id(plant_id)
 
-        if end_time is None and start_time is None:
-            return all_prediction
-
-        prediction = []
-
-        if end_time is None:
-            end_time = datetime.max
-        if start_time is None:
-            start_time = datetime.min
+        plant = self._load_plant(plant_id)
+        if plant is None:
+            return []
 
-        for m in all_prediction:
-            if m is not None and start_time <= m.timestamp <= end_time:
-                prediction.append(m)
+        lo, hi = plant.global_bounds(start_time, end_time)
+        epochs, power = plant.global_timestamps[lo:hi], plant.global_predicted[lo:hi]
+        if downsample is not None:
+            epochs, columns = downsample.reduce(epochs, {"ac_power": power})
+            power = columns["ac_power"]
 
-        return prediction
+        return [
+            GlobalPrediction(timestamp=ts, plant_id=plant_id, ac_power=power)
+            for ts, power in zip(to_datetimes(epochs), power.tolist())
+        ]
     
 
     def save_prediction(self, prediction: HistoricalPrediction):
-        data_dir = Path(self.data_directory)
-        data_dir.mkdir(parents=True, exist_ok=True)
+        self.save_predictions([prediction])
 
-        path = data_dir / f"{prediction.plant_id}.csv"
 
-        self._load_index(path)
-
-        timestamp = prediction.timestamp.strftime("%Y-%m-%d %H:%M:%S")
-        plant_id = str(prediction.plant_id)
-        panel_id = str(prediction.panel_id)
-
-        key = (timestamp, plant_id, panel_id)
+    def save_predictions(self, predictions: Iterable[HistoricalPrediction]):
+        data_dir = Path(self.data_directory)
+        storage = get_storage()
+        file_indexes = {}
+
+        with self._lock, self.index.lock:
+            for prediction in predictions:
+                path = storage.plant_path(data_dir, prediction.plant_id)
+
+                file_index = file_indexes.get(path)
+                if file_index is None:
+                    file_index = file_indexes[path] = self.index.get(path)
+
+                epoch = to_epoch(prediction.timestamp)
+                plant_id = str(prediction.plant_id)
+                panel_id = str(prediction.panel_id)
+
+                if file_index.contains(epoch, plant_id, panel_id):
+                    continue
+
+                self._buffer[path].append([
+                    prediction.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+                    plant_id,
+                    panel_id,
+                    prediction.predicted_ac_power,
+                    prediction.real_ac_power,
+                    prediction.drift
+                ])
+                file_index.add(epoch, plant_id, panel_id)
 
-        if key in self._index[path]:
-            return
+                if self._buffered_rows == 0:
+                    _pending_daos.add(self)
+                    self._start_timer()
+                self._buffered_rows += 1
 
-        write_header = not path.exists()
+                if self._buffered_rows >= self.buffer_size:
+                    self.flush()
 
-        with path.open("a", newline="") as f:
-            writer = csv.writer(f)
 
-            if write_header:
-                writer.writerow([
-                    "DATE_TIME",
-                    "PLANT_ID",
-                    "SOURCE_KEY",
-                    "PREDICTED_AC_POWER",
-                    "REAL_AC_POWER",
-                    "DRIFT"
-                ])
+    def _start_timer(self):
+        if self.flush_interval_s <= 0:
+            return
+        self._timer = threading.Timer(self.flush_interval_s, self._timed_flush)
+        self._timer.daemon = True
+        self._timer.start()
 
-            writer.writerow([
-                timestamp,
-                plant_id,
-                panel_id,
-                prediction.predicted_ac_power,
-                prediction.real_ac_power,
-                prediction.drift
-            ])
 
-        self._index[path].add(key)
+    def _timed_flush(self):
+        # nobody waits on the timer thread: the failure is logged and counted in stats(), the rows stay buffered for the next try
+        try:
+            self.flush()
+        except Exception as e:
+            with self._lock:
+                self.flush_errors += 1
+                self.last_flush_error = str(e)
+                logger.exception("Timed flush of %d buffered predictions failed", self._buffered_rows)
+                self._start_timer()
+
+
+    def flush(self):
+        with self._lock:
+            if not self._buffered_rows:
+                return
+
+            with self.index.lock:
+                for path, rows in self._buffer.items():
+                    if not rows:
+                        continue
+
+                    get_storage().append(path, HEADER, rows)
+                    self.index.mark_synced(path)
+                    self.store.append(path, rows)
+
+            self._buffer.clear()
+            self._buffered_rows = 0
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            _pending_daos.discard(self)
+
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"buffered_rows": self._buffered_rows, "flush_errors": self.flush_errors, "last_flush_error": self.last_flush_error}
 
 
 ## this works if you use it as a module with python -m backend.dao.measurments_dao
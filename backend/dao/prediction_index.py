@@ -0,0 +1,156 @@
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backend.dao.measurement_store import DATE_FORMAT, to_epoch
+from backend.dao.storage import get_storage
+
+
+SLOT_SECONDS = 15 * 60
+
+
+class SlotBitmap:
+    """One bit per 15 minute slot, growing in both directions as slots are added."""
+    __slots__ = ("base", "bits")
+
+    def __init__(self, base: int = 0, bits: bytearray = None):
+        self.base = base            # first slot covered, always a multiple of 8
+        self.bits = bits if bits is not None else bytearray()
+
+    @staticmethod
+    def from_slots(slots: np.ndarray) -> "SlotBitmap":
+        base = int(slots.min()) // 8 * 8
+        flags = np.zeros(int(slots.max()) - base + 1, dtype=bool)
+        flags[slots - base] = True
+        return SlotBitmap(base, bytearray(np.packbits(flags, bitorder="little").tobytes()))
+
+    def __contains__(self, slot: int) -> bool:
+        offset = slot - self.base
+        if offset < 0 or offset >= len(self.bits) * 8:
+            return False
+        return bool(self.bits[offset >> 3] & (1 << (offset & 7)))
+
+    def add(self, slot: int):
+        if not self.bits:
+            self.base = slot // 8 * 8
+            self.bits = bytearray(1)
+        elif slot < self.base:
+            missing = (self.base - slot + 7) // 8
+            self.bits[:0] = bytearray(missing)
+            self.base -= missing * 8
+        offset = slot - self.base
+        if offset >= len(self.bits) * 8:
+            self.bits.extend(bytearray((offset >> 3) + 1 - len(self.bits)))
+        self.bits[offset >> 3] |= 1 << (offset & 7)
+
+
+class PredictionFileIndex:
+    """Keys already written to one prediction csv: a slot bitmap per (plant, panel) plus a set for off-grid timestamps."""
+    def __init__(self):
+        self.bitmaps: Dict[Tuple[str, str], SlotBitmap] = {}
+        self.off_grid: Set[Tuple[int, str, str]] = set()
+        self.stat: tuple | None = None
+
+    def contains(self, epoch: int, plant_id: str, panel_id: str) -> bool:
+        slot, rest = divmod(epoch, SLOT_SECONDS)
+        if rest:
+            return (epoch, plant_id, panel_id) in self.off_grid
+        bitmap = self.bitmaps.get((plant_id, panel_id))
+        return bitmap is not None and slot in bitmap
+
+    def add(self, epoch: int, plant_id: str, panel_id: str):
+        slot, rest = divmod(epoch, SLOT_SECONDS)
+        if rest:
+            self.off_grid.add((epoch, plant_id, panel_id))
+            return
+        key = (plant_id, panel_id)
+        bitmap = self.bitmaps.get(key)
+        if bitmap is None:
+            bitmap = self.bitmaps[key] = SlotBitmap()
+        bitmap.add(slot)
+
+    def nbytes(self) -> int:
+        return sum(len(b.bits) for b in self.bitmaps.values())
+
+
+def load_prediction_file_index(path: Path) -> PredictionFileIndex:
+    storage = get_storage()
+    index = PredictionFileIndex()
+    index.stat = storage.version(path)
+    if index.stat is None:
+        return index
+
+    df = storage.read(path, ["DATE_TIME", "PLANT_ID", "SOURCE_KEY"], dtype={"PLANT_ID": str, "SOURCE_KEY": str})
+    df["DATE_TIME"] = pd.to_datetime(df["DATE_TIME"], format=DATE_FORMAT, errors="coerce")
+    df = df.dropna()
+    if df.empty:
+        return index
+
+    epochs = df["DATE_TIME"].to_numpy(dtype="datetime64[s]").astype(np.int64)
+    on_grid = epochs % SLOT_SECONDS == 0
+
+    grid = df.loc[on_grid, ["PLANT_ID", "SOURCE_KEY"]].assign(SLOT=epochs[on_grid] // SLOT_SECONDS)
+    for (plant_id, panel_id), slots in grid.groupby(["PLANT_ID", "SOURCE_KEY"])["SLOT"]:
+        index.bitmaps[(plant_id, panel_id)] = SlotBitmap.from_slots(slots.to_numpy())
+
+    off = df.loc[~on_grid]
+    index.off_grid.update(zip(epochs[~on_grid].tolist(), off["PLANT_ID"].tolist(), off["SOURCE_KEY"].tolist()))
+    return index
+
+
+class PredictionIndex:
+    """
+    Process-wide dedup index of the (DATE_TIME, PLANT_ID, SOURCE_KEY) keys in the prediction csv files.
+    Every file is read once and then kept up to date by the writers; it is read again only if the
+    file was changed by someone else, e.g. a bootstrap worker process.
+    """
+    def __init__(self):
+        self._files: Dict[Path, PredictionFileIndex] = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def lock(self):
+        return self._lock
+
+    def get(self, path: Path) -> PredictionFileIndex:
+        key = path.resolve()
+        with self._lock:
+            index = self._files.get(key)
+            if index is None or index.stat != get_storage().version(path):
+                self.misses += 1
+                index = self._files[key] = load_prediction_file_index(path)
+            else:
+                self.hits += 1
+            return index
+
+    def mark_synced(self, path: Path):
+        """Records the file state after a write of ours, so it is not mistaken for an external change."""
+        with self._lock:
+            index = self._files.get(path.resolve())
+            if index is not None:
+                index.stat = get_storage().version(path)
+
+    def contains(self, path: Path, timestamp: datetime, plant_id: str, panel_id: str) -> bool:
+        return self.get(path).contains(to_epoch(timestamp), plant_id, panel_id)
+
+    def clear(self):
+        with self._lock:
+            self._files.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "files": len(self._files),
+                "hits": self.hits,
+                "misses": self.misses,
+                "bitmap_bytes": sum(f.nbytes() for f in self._files.values()),
+            }
+
+
+prediction_index = PredictionIndex()
@@ -0,0 +1,224 @@
+import sys
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backend.dao.measurement_store import DATE_FORMAT, aggregate_by_timestamp, group_rows, rows_in_range, to_epoch
+from backend.dao.storage import get_storage
+
+
+def merge_series(timestamps: np.ndarray, values: np.ndarray, new_timestamps: np.ndarray, new_values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Adds a sorted, unique (timestamp, value) batch into a sorted series without rebuilding it."""
+    pos = np.searchsorted(timestamps, new_timestamps)
+    exists = pos < len(timestamps)
+    exists[exists] = timestamps[pos[exists]] == new_timestamps[exists]
+
+    values = values.copy()
+    values[pos[exists]] += new_values[exists]
+
+    fresh = ~exists
+    if not fresh.any():
+        return timestamps, values
+    return (
+        np.insert(timestamps, pos[fresh], new_timestamps[fresh]),
+        np.insert(values, pos[fresh], new_values[fresh]),
+    )
+
+
+@dataclass(frozen=True)
+class PlantPredictions:
+    """
+    Immutable columnar snapshot of one prediction csv, sorted by timestamp, with the plant-level
+    predicted series (sum over panels per timestamp) kept alongside. Appends build a new snapshot,
+    so readers never see a half updated one; they insert the new rows by binary search and only
+    touch the row groups of the panels in the batch, the stored history is never sorted again.
+    """
+    timestamps: np.ndarray      # int64 epoch seconds
+    panel_codes: np.ndarray     # int32 index into panel_ids
+    predicted: np.ndarray
+    real: np.ndarray
+    drift: np.ndarray
+    panel_ids: Tuple[str, ...]
+    panel_rows: Dict[str, np.ndarray]   # panel id -> row indices, sorted by time
+    global_timestamps: np.ndarray
+    global_predicted: np.ndarray
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @staticmethod
+    def build(timestamps, panel_ids, predicted, real, drift) -> "PlantPredictions":
+        order = np.argsort(timestamps, kind="stable")
+        codes, uniques = pd.factorize(np.asarray(panel_ids, dtype=object)[order])
+        timestamps = np.asarray(timestamps, dtype=np.int64)[order]
+        predicted = np.asarray(predicted, dtype=np.float64)[order]
+        global_timestamps, global_predicted = aggregate_by_timestamp(timestamps, predicted)
+        panel_ids = tuple(sys.intern(str(p)) for p in uniques)
+
+        return PlantPredictions(
+            timestamps=timestamps,
+            panel_codes=codes.astype(np.int32),
+            predicted=predicted,
+            real=np.asarray(real, dtype=np.float64)[order],
+            drift=np.asarray(drift, dtype=bool)[order],
+            panel_ids=panel_ids,
+            panel_rows=group_rows(codes, panel_ids),
+            global_timestamps=global_timestamps,
+            global_predicted=global_predicted,
+        )
+
+    def appended(self, timestamps, panel_ids, predicted, real, drift) -> "PlantPredictions":
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        predicted = np.asarray(predicted, dtype=np.float64)
+        if len(timestamps) == 0:
+            return self
+
+        lookup = {p: i for i, p in enumerate(self.panel_ids)}
+        known = list(self.panel_ids)
+        codes = np.empty(len(panel_ids), dtype=np.int32)
+        for i, panel_id in enumerate(panel_ids):
+            code = lookup.get(panel_id)
+            if code is None:
+                code = lookup[panel_id] = len(known)
+                known.append(sys.intern(str(panel_id)))
+            codes[i] = code
+
+        real = np.asarray(real, dtype=np.float64)
+        drift = np.asarray(drift, dtype=bool)
+        # predictions usually arrive in time order, the sort only costs the size of the batch
+        order = np.argsort(timestamps, kind="stable")
+        timestamps, codes, predicted, real, drift = timestamps[order], codes[order], predicted[order], real[order], drift[order]
+
+        # a batch row goes after the rows already stored at its timestamp, where a stable sort of the whole file puts it
+        pos = np.searchsorted(self.timestamps, timestamps, side="right")
+        rows = pos + np.arange(len(pos))    # the rows np.insert gives the batch
+
+        panel_rows = dict(self.panel_rows)
+        if pos[0] < len(self.timestamps):
+            # late rows shift the stored rows after them
+            panel_rows = {p: r + np.searchsorted(pos, r, side="right") for p, r in panel_rows.items()}
+        for panel_id, batch in group_rows(codes, known).items():
+            if len(batch) == 0:
+                continue
+            old = panel_rows.get(panel_id, np.empty(0, dtype=np.int64))
+            panel_rows[panel_id] = np.insert(old, np.searchsorted(old, rows[batch]), rows[batch])
+
+        global_timestamps, global_predicted = merge_series(
+            self.global_timestamps, self.global_predicted, *aggregate_by_timestamp(timestamps, predicted)
+        )
+
+        return PlantPredictions(
+            timestamps=np.insert(self.timestamps, pos, timestamps),
+            panel_codes=np.insert(self.panel_codes, pos, codes),
+            predicted=np.insert(self.predicted, pos, predicted),
+            real=np.insert(self.real, pos, real),
+            drift=np.insert(self.drift, pos, drift),
+            panel_ids=tuple(known),
+            panel_rows=panel_rows,
+            global_timestamps=global_timestamps,
+            global_predicted=global_predicted,
+        )
+
+    def time_bounds(self, start_time: datetime = None, end_time: datetime = None) -> Tuple[int, int]:
+        return _bounds(self.timestamps, start_time, end_time)
+
+    def global_bounds(self, start_time: datetime = None, end_time: datetime = None) -> Tuple[int, int]:
+        return _bounds(self.global_timestamps, start_time, end_time)
+
+    def panel_indices(self, panel_id: str, start_time: datetime = None, end_time: datetime = None) -> np.ndarray:
+        """Rows of the panel within the range in time order, found by binary search so a page costs O(log n)."""
+        rows = self.panel_rows.get(panel_id)
+        if rows is None:
+            return np.empty(0, dtype=np.int64)
+        return rows_in_range(self.timestamps, rows, start_time, end_time)
+
+
+def _bounds(timestamps: np.ndarray, start_time: datetime = None, end_time: datetime = None) -> Tuple[int, int]:
+    lo = 0 if start_time is None else int(np.searchsorted(timestamps, to_epoch(start_time), side="left"))
+    hi = len(timestamps) if end_time is None else int(np.searchsorted(timestamps, to_epoch(end_time), side="right"))
+    return lo, max(lo, hi)
+
+
+def load_plant_predictions(path: Path) -> PlantPredictions:
+    df = get_storage().read(
+        path,
+        ["DATE_TIME", "SOURCE_KEY", "PREDICTED_AC_POWER", "REAL_AC_POWER", "DRIFT"],
+        dtype={"SOURCE_KEY": str, "DRIFT": str},
+    )
+    df["DATE_TIME"] = pd.to_datetime(df["DATE_TIME"], format=DATE_FORMAT, errors="coerce")
+    for col in ["PREDICTED_AC_POWER", "REAL_AC_POWER"]:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    df = df.dropna(subset=["DATE_TIME", "SOURCE_KEY", "PREDICTED_AC_POWER", "REAL_AC_POWER"])
+
+    return PlantPredictions.build(
+        df["DATE_TIME"].to_numpy(dtype="datetime64[s]").astype(np.int64),
+        df["SOURCE_KEY"].to_numpy(),
+        df["PREDICTED_AC_POWER"].to_numpy(),
+        df["REAL_AC_POWER"].to_numpy(),
+        df["DRIFT"].fillna("False").str.lower().isin(["true", "1", "t"]).to_numpy(),
+    )
+
+
+class PredictionStore:
+    """
+    Process-wide cache of PlantPredictions keyed by file path.
+    Writers append the rows they flush, so a file is read again only if someone else changed it.
+    """
+    def __init__(self):
+        self._plants: Dict[Path, Tuple[tuple, PlantPredictions]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path: Path) -> PlantPredictions | None:
+        stat = get_storage().version(path)
+        if stat is None:
+            return None
+
+        key = path.resolve()
+        cached = self._plants.get(key)
+        if cached is not None and cached[0] == stat:
+            self.hits += 1
+            return cached[1]
+
+        with self._lock:
+            cached = self._plants.get(key)
+            if cached is not None and cached[0] == stat:
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+            plant = load_plant_predictions(path)
+            self._plants[key] = (stat, plant)
+            return plant
+
+    def append(self, path: Path, rows: List[list]):
+        """Adds rows just written to path, in the csv layout (DATE_TIME, PLANT_ID, SOURCE_KEY, PREDICTED, REAL, DRIFT)."""
+        key = path.resolve()
+        with self._lock:
+            cached = self._plants.get(key)
+            if cached is None:
+                return
+
+            plant = cached[1].appended(
+                np.array([r[0] for r in rows], dtype="datetime64[s]").astype(np.int64),
+                [r[2] for r in rows],
+                [r[3] for r in rows],
+                [r[4] for r in rows],
+                [bool(r[5]) for r in rows],
+            )
+            self._plants[key] = (get_storage().version(path), plant)
+
+    def clear(self):
+        with self._lock:
+            self._plants.clear()
+
+    def stats(self) -> dict:
+        return {"files": len(self._plants), "hits": self.hits, "misses": self.misses}
+
+
+prediction_store = PredictionStore()
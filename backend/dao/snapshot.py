@@ -0,0 +1,108 @@
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Tuple
+
+import numpy as np
+
+from backend.dao.storage import CSV, file_stat
+
+
+MAGIC = b"PVSNAP01"
+ALIGNMENT = 64
+SUFFIX = ".snap"
+
+
+def snapshot_path(csv_file: Path) -> Path:
+    return csv_file.with_suffix(SUFFIX)
+
+
+def _aligned(n: int) -> int:
+    return (n + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_snapshot(path: Path, columns: Dict[str, np.ndarray], meta: dict):
+    """
+    Fixed-width binary layout: MAGIC, the header length (uint64), a json header with meta and the
+    dtype/offset/length of every column, then the raw columns, each aligned to 64 bytes.
+    """
+    columns = {name: np.ascontiguousarray(values) for name, values in columns.items()}
+    layout = {}
+    offset = 0
+    for name, values in columns.items():
+        layout[name] = {"dtype": values.dtype.str, "offset": offset, "length": len(values)}
+        offset = _aligned(offset + values.nbytes)
+
+    header = json.dumps({"meta": meta, "columns": layout}).encode()
+    data_start = _aligned(len(MAGIC) + 8 + len(header))
+
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC)
+            f.write(np.uint64(len(header)).tobytes())
+            f.write(header)
+            for name, values in columns.items():
+                f.seek(data_start + layout[name]["offset"])
+                f.write(values.tobytes())
+            f.truncate(data_start + offset)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+class PlantSnapshot:
+    """Read-only columns of one snapshot file, zero-copy views over a shared memory map."""
+    def __init__(self, path: Path):
+        self.path = path
+        self._map = np.memmap(path, dtype=np.uint8, mode="r")
+        if bytes(self._map[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{path} is not a plant snapshot")
+        header_len = int(self._map[len(MAGIC):len(MAGIC) + 8].view(np.uint64)[0])
+        header = json.loads(bytes(self._map[len(MAGIC) + 8:len(MAGIC) + 8 + header_len]))
+        self.meta = header["meta"]
+        self._columns = header["columns"]
+        self._data_start = _aligned(len(MAGIC) + 8 + header_len)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._columns
+
+    def column(self, name: str) -> np.ndarray:
+        c = self._columns[name]
+        dtype = np.dtype(c["dtype"])
+        start = self._data_start + c["offset"]
+        return self._map[start:start + c["length"] * dtype.itemsize].view(dtype)
+
+
+_snapshots: Dict[Path, Tuple[tuple, PlantSnapshot]] = {}
+_lock = threading.Lock()
+
+
+def open_snapshot(csv_file: Path) -> PlantSnapshot | None:
+    """
+    The snapshot compiled from csv_file, if there is one and it was built from the current version of the csv.
+    Each file is mapped once per process; the pages are shared by every process mapping it.
+    """
+    path = snapshot_path(csv_file)
+    snap_stat = file_stat(path)
+    source = CSV.version(csv_file)
+    if snap_stat is None or source is None:
+        return None
+
+    key = path.resolve()
+    with _lock:
+        cached = _snapshots.get(key)
+        if cached is not None and cached[0] == (snap_stat, source):
+            return cached[1]
+        try:
+            snapshot = PlantSnapshot(path)
+        except (ValueError, OSError, KeyError) as e:
+            print(f"Ignoring snapshot {path}: {e}")
+            return None
+        if tuple(snapshot.meta.get("source", ())) != source:
+            return None
+        _snapshots[key] = ((snap_stat, source), snapshot)
+        return snapshot
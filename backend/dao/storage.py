@@ -0,0 +1,260 @@
+import csv
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+DAY_FORMAT = "%Y-%m-%d"
+ROW_GROUP_SIZE = 16384
+# a day partition is rewritten as one file once appends have left this many files in it
+COMPACT_PARTS = 8
+# per dataset generation counter, rewritten by every write so version() does not walk the files
+MANIFEST = "_manifest.json"
+
+
+def file_stat(path: Path) -> Tuple[int, int] | None:
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class CsvStorage:
+    """One csv file per plant, the original layout. Filters are applied by the callers after parsing."""
+    name = "csv"
+    suffix = ".csv"
+
+    def plant_path(self, directory, plant_id: str) -> Path:
+        return Path(directory) / f"{plant_id}{self.suffix}"
+
+    def plant_ids(self, directory) -> List[str]:
+        return [p.stem for p in sorted(Path(directory).glob(f"*{self.suffix}"))]
+
+    def version(self, path: Path):
+        return file_stat(path)
+
+    def last_modified(self, path: Path) -> int | None:
+        """mtime in ns of the plant data, None when missing."""
+        stat = file_stat(path)
+        return stat[0] if stat is not None else None
+
+    def columns(self, path: Path) -> List[str]:
+        return list(pd.read_csv(path, nrows=0).columns)
+
+    def read(self, path: Path, columns: List[str], dtype: Dict[str, type] = None,
+             start_time: datetime = None, end_time: datetime = None, panel_id: str = None) -> pd.DataFrame:
+        return pd.read_csv(path, usecols=columns, dtype=dtype, float_precision="round_trip")
+
+    def append(self, path: Path, header: List[str], rows: List[list]):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        write_header = not path.exists()
+        with path.open("a", newline="") as f:
+            writer = csv.writer(f)
+            if write_header:
+                writer.writerow(header)
+            writer.writerows(rows)
+
+
+class ParquetStorage:
+    """
+    One Parquet dataset per plant, a <plant_id>.parquet directory partitioned by day (day=YYYY-MM-DD),
+    rows sorted by time. Time and panel filters given to read() are pushed down to the dataset scan, so a
+    range read only touches the day partitions and row groups it needs; load_full_packets_frame (bootstrap,
+    backtests, batch forecasts) uses this.
+    The measurement, weather and prediction stores and the prediction index read a plant in full once and
+    answer every DAO range query from memory until the version changes, so those queries are not pruned:
+    with Parquet their first load is faster (typed columns) but still reads the whole dataset.
+    Every write bumps the generation in the dataset manifest, which is all version() reads.
+    """
+    name = "parquet"
+    suffix = ".parquet"
+
+    def plant_path(self, directory, plant_id: str) -> Path:
+        return Path(directory) / f"{plant_id}{self.suffix}"
+
+    def plant_ids(self, directory) -> List[str]:
+        return [p.stem for p in sorted(Path(directory).glob(f"*{self.suffix}")) if p.is_dir()]
+
+    def version(self, path: Path):
+        """(generation, last write ns) from the manifest, any write changes it."""
+        manifest = _read_manifest(path)
+        if manifest is not None:
+            return manifest["generation"], manifest["modified_ns"]
+        if not path.is_dir():
+            return None
+        # dataset written without a manifest: (files, latest mtime, total size)
+        stats = [file_stat(f) for f in path.rglob("*.parquet")]
+        stats = [s for s in stats if s is not None]
+        return len(stats), max((s[0] for s in stats), default=0), sum(s[1] for s in stats)
+
+    def last_modified(self, path: Path) -> int | None:
+        version = self.version(path)
+        return version[1] if version is not None else None
+
+    def _dataset(self, path: Path):
+        return ds.dataset(path, format="parquet", partitioning="hive")
+
+    def columns(self, path: Path) -> List[str]:
+        return [c for c in self._dataset(path).schema.names if c != "day"]
+
+    def read(self, path: Path, columns: List[str], dtype: Dict[str, type] = None,
+             start_time: datetime = None, end_time: datetime = None, panel_id: str = None) -> pd.DataFrame:
+        dataset = self._dataset(path)
+        filters = []
+        if start_time is not None:
+            filters.append(ds.field("day") >= start_time.strftime(DAY_FORMAT))
+            filters.append(ds.field("DATE_TIME") >= pa.scalar(start_time, pa.timestamp("s")))
+        if end_time is not None:
+            filters.append(ds.field("day") <= end_time.strftime(DAY_FORMAT))
+            filters.append(ds.field("DATE_TIME") <= pa.scalar(end_time, pa.timestamp("s")))
+        if panel_id is not None:
+            filters.append(ds.field("SOURCE_KEY") == panel_id)
+
+        expression = None
+        for f in filters:
+            expression = f if expression is None else expression & f
+
+        missing = [c for c in columns if c not in dataset.schema.names]
+        if missing:
+            raise ValueError(f"Usecols do not match columns, columns expected but not found: {missing}")
+
+        df = dataset.to_table(columns=columns, filter=expression).to_pandas()
+        if "DATE_TIME" in df.columns:
+            # same resolution as the parsed csv timestamps
+            df["DATE_TIME"] = df["DATE_TIME"].astype("datetime64[ns]")
+        if dtype:
+            df = df.astype({c: t for c, t in dtype.items() if c in df.columns})
+        return df
+
+    def append(self, path: Path, header: List[str], rows: List[list]):
+        """
+        Writes the rows as new files in their day partitions.
+        A partition holding COMPACT_PARTS files is compacted into one, so reads do not slow down as appends pile up.
+        """
+        df = pd.DataFrame(rows, columns=header)
+        # names sort after the converted part-0 files and in write order, so a scan returns the rows in append order
+        partitions = _write_dataset(_typed(df), path, f"part-{time.time_ns()}.parquet")
+        for partition in partitions:
+            parts = sorted(partition.glob("*.parquet"))
+            if len(parts) >= COMPACT_PARTS:
+                _compact(partition, parts)
+        if partitions:
+            _write_manifest(path)
+
+
+def _typed(df: pd.DataFrame) -> pd.DataFrame:
+    """Frame in the column types stored in Parquet: DATE_TIME as timestamp[s], numbers as float, DRIFT as bool."""
+    df = df.drop(columns=[c for c in df.columns if c.startswith("Unnamed")])
+    df["DATE_TIME"] = pd.to_datetime(df["DATE_TIME"], format=DATE_FORMAT, errors="coerce").astype("datetime64[s]")
+    for col in df.columns:
+        if col in ("PLANT_ID", "SOURCE_KEY"):
+            df[col] = df[col].astype(str)
+        elif col == "DRIFT":
+            df[col] = df[col].astype(str).str.lower().isin(["true", "1", "t"])
+        elif col != "DATE_TIME":
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("float64")
+    df = df.dropna(subset=["DATE_TIME"])
+    return df.sort_values("DATE_TIME", kind="stable").reset_index(drop=True)
+
+
+def _write_dataset(df: pd.DataFrame, path: Path, basename: str, replace: bool = False) -> List[Path]:
+    """Writes one file per day partition, path/day=YYYY-MM-DD/<basename>, keeping the row order. Returns the partitions."""
+    if replace and path.exists():
+        shutil.rmtree(path)
+    days = df["DATE_TIME"].dt.strftime(DAY_FORMAT)
+    partitions = []
+    for day, rows in df.groupby(days, sort=True).indices.items():
+        partition = path / f"day={day}"
+        partition.mkdir(parents=True, exist_ok=True)
+        table = pa.Table.from_pandas(df.iloc[rows], preserve_index=False)
+        pq.write_table(table, partition / basename, row_group_size=ROW_GROUP_SIZE)
+        partitions.append(partition)
+    return partitions
+
+
+def _compact(partition: Path, parts: List[Path]):
+    """Rewrites the files of a partition, in name order, as a single file named after the latest write."""
+    table = pa.concat_tables([pq.ParquetFile(p).read() for p in parts])
+    basename = f"part-{time.time_ns()}.parquet"
+    # dot files are skipped by dataset scans, the compacted file only appears once complete
+    tmp = partition / f".{basename}"
+    pq.write_table(table, tmp, row_group_size=ROW_GROUP_SIZE)
+    os.replace(tmp, partition / basename)
+    for p in parts:
+        p.unlink()
+
+
+def _read_manifest(path: Path) -> dict | None:
+    try:
+        return json.loads((path / MANIFEST).read_text())
+    except (FileNotFoundError, NotADirectoryError, ValueError):
+        return None
+
+
+def _write_manifest(path: Path):
+    manifest = _read_manifest(path)
+    generation = manifest["generation"] + 1 if manifest is not None else 0
+    tmp = path / f".{MANIFEST}"
+    tmp.write_text(json.dumps({"generation": generation, "modified_ns": time.time_ns()}))
+    os.replace(tmp, path / MANIFEST)
+
+
+def convert_csv_directory(directory, output_directory=None) -> List[Path]:
+    """
+    One-shot conversion of every plant csv in directory into a Parquet dataset, next to the csv files by default.
+    Existing datasets of the same plants are replaced.
+    """
+    output_directory = Path(output_directory or directory)
+    written = []
+    for csv_file in sorted(Path(directory).glob("*.csv")):
+        df = pd.read_csv(csv_file, dtype={"PLANT_ID": str, "SOURCE_KEY": str}, float_precision="round_trip")
+        if "DATE_TIME" not in df.columns:
+            continue
+        path = PARQUET.plant_path(output_directory, csv_file.stem)
+        _write_dataset(_typed(df), path, "part-0.parquet", replace=True)
+        _write_manifest(path)
+        written.append(path)
+        print(f"Converted {csv_file} -> {path} ({len(df)} rows)")
+    return written
+
+
+CSV = CsvStorage()
+PARQUET = ParquetStorage()
+BACKENDS = {CSV.name: CSV, PARQUET.name: PARQUET}
+
+
+def _backend(name: str):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown storage backend {name}, expected one of {list(BACKENDS)}")
+    return BACKENDS[name]
+
+
+_storage = _backend(os.environ.get("STORAGE_BACKEND", "csv"))
+
+
+def get_storage():
+    return _storage
+
+
+def set_storage(name: str):
+    """Selects the storage backend of the process, 'csv' or 'parquet'."""
+    global _storage
+    _storage = _backend(name)
+
+
+if __name__ == "__main__":
+    # python -m backend.dao.storage cleaned_data historical_predictions InclLSTM
+    for directory in sys.argv[1:] or ["cleaned_data", "historical_predictions", "InclLSTM"]:
+        convert_csv_directory(directory)
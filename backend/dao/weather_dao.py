@@ -1,96 +1,67 @@
-import csv
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import List
 from pathlib import Path
-from collections import defaultdict
 from backend.models.weather import Weather
+from backend.dao.measurement_store import to_datetimes
+from backend.dao.weather_store import PlantWeather, weather_store
+from backend.dao.storage import get_storage
 
 class WeatherDAO:
-    def __init__(self, data_directory: str):
+    def __init__(self, data_directory: str, store=weather_store):
         self.data_directory = Path(data_directory)
+        self.store = store
 
 
-    def _parse_row(self, plant_id: str, row: dict) -> Weather:
+    def _load_plant(self, plant_id: str) -> PlantWeather | None:
+        return self.store.get(get_storage().plant_path(self.data_directory, plant_id))
 
-        try:
-            return Weather(
-                timestamp=datetime.strptime(row["DATE_TIME"], "%Y-%m-%d %H:%M:%S"),
+
+    def _to_weather(self, plant_id: str, plant: PlantWeather, lo: int, hi: int) -> List[Weather]:
+        return [
+            Weather(
+                timestamp=ts,
                 plant_id=plant_id,
-                ambient_temperature=float(row["AMBIENT_TEMPERATURE"]),
-                module_temperature=float(row["MODULE_TEMPERATURE"]),
-                irradiation=float(row["IRRADIATION"])
+                ambient_temperature=ambient,
+                module_temperature=module,
+                irradiation=irradiation
+            )
+            for ts, ambient, module, irradiation in zip(
+                to_datetimes(plant.timestamps[lo:hi]),
+                plant.ambient_temperature[lo:hi].tolist(),
+                plant.module_temperature[lo:hi].tolist(),
+                plant.irradiation[lo:hi].tolist(),
             )
-        except (KeyError, ValueError, TypeError):
-            return None
+        ]
     
 
     def get_weather_by_plant_id_and_timestamp(self, plant_id: str, timestamp: datetime):
 
-        csv_file = self.data_directory / f"{plant_id}.csv"
+        plant = self._load_plant(plant_id)
+        if plant is None:
+            return
 
-        if not csv_file.exists():
+        i = plant.position(timestamp)
+        if i is None:
             return
 
-        with open(csv_file, newline="") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                wm = self._parse_row(plant_id, row)
-                if wm is not None and wm.timestamp == timestamp:
-                    return wm
-        return
+        return self._to_weather(plant_id, plant, i, i + 1)[0]
 
     def get_all_weather_measurements_by_plant_id(
         self, plant_id: str
     )-> List[Weather]:
-
-        weather_measurements = []
-
-        csv_file = self.data_directory / f"{plant_id}.csv"
-
-        if not csv_file.exists():
-            return []
-
-        seen_timestamps = set()
-
-        with open(csv_file, newline="") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                wm = self._parse_row(plant_id, row)
-                if wm is not None and wm.timestamp not in seen_timestamps:
-                    weather_measurements.append(wm)
-                    seen_timestamps.add(wm.timestamp)
-        return weather_measurements
+        return self.get_weather_measurements_by_plant_id_and_time_range(plant_id=plant_id)
     
 
     def get_weather_measurements_by_plant_id_and_time_range(
             self, plant_id: str, start_time: datetime = None, end_time: datetime = None
     ) -> List[Weather]:
-        
-        measurements = []
-        
-        csv_file = self.data_directory / f"{plant_id}.csv"
 
-        if not csv_file.exists():
+        plant = self._load_plant(plant_id)
+        if plant is None:
             return []
-        
-        if end_time is None and start_time is None:
-            return self.get_all_weather_measurements_by_plant_id(plant_id=plant_id)
-        
-        seen_timestamps = set()
-        if end_time is None:
-            end_time = datetime.max
-        if start_time is None: 
-            start_time = datetime.min
-
-        with open(csv_file, newline="") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                m = self._parse_row(plant_id, row)
-                if m is not None and start_time <= m.timestamp <= end_time and m.timestamp not in seen_timestamps:
-                    measurements.append(m)
-                    seen_timestamps.add(m.timestamp)
-
-        return measurements
+
+        lo, hi = plant.time_bounds(start_time, end_time)
+        return self._to_weather(plant_id, plant, lo, hi)
     
 
     def get_weather_measurements_time_range(
@@ -98,8 +69,7 @@ class WeatherDAO:
     ) -> List[Weather]:
         weather_measurements = []
 
-        for csv in self.data_directory.iterdir():
-            plant_id = csv.stem
+        for plant_id in get_storage().plant_ids(self.data_directory):
             plant_weather_measurements = self.get_weather_measurements_by_plant_id_and_time_range(plant_id, start_time, end_time)
             weather_measurements.extend(plant_weather_measurements)
 
@@ -109,8 +79,7 @@ class WeatherDAO:
 
         weather_measurements = []
 
-        for csv in self.data_directory.iterdir():
-            plant_id = csv.stem
+        for plant_id in get_storage().plant_ids(self.data_directory):
             plant_weather_measurements = self.get_all_weather_measurements_by_plant_id(plant_id)
             weather_measurements.extend(plant_weather_measurements)
 
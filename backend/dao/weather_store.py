@@ -0,0 +1,89 @@
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backend.dao.measurement_store import PlantFileStore, DATE_FORMAT, to_epoch
+from backend.dao.storage import CSV, get_storage
+from backend.dao.snapshot import PlantSnapshot, open_snapshot
+
+
+WEATHER_COLUMNS = ["AMBIENT_TEMPERATURE", "MODULE_TEMPERATURE", "IRRADIATION"]
+
+
+@dataclass
+class PlantWeather:
+    """
+    Deduplicated weather readings of one plant, one row per timestamp, sorted by time.
+    The cleaned csv repeats the weather once per panel: the first valid row of each timestamp is kept.
+    """
+    timestamps: np.ndarray      # int64 epoch seconds, unique
+    ambient_temperature: np.ndarray
+    module_temperature: np.ndarray
+    irradiation: np.ndarray
+    positions: Dict[int, int]   # epoch seconds -> row
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def position(self, timestamp: datetime) -> int | None:
+        return self.positions.get(to_epoch(timestamp))
+
+    def time_bounds(self, start_time: datetime = None, end_time: datetime = None) -> Tuple[int, int]:
+        """Returns the [lo, hi) row interval with start_time <= timestamp <= end_time."""
+        lo = 0 if start_time is None else int(np.searchsorted(self.timestamps, to_epoch(start_time), side="left"))
+        hi = len(self.timestamps) if end_time is None else int(np.searchsorted(self.timestamps, to_epoch(end_time), side="right"))
+        return lo, max(lo, hi)
+
+
+def load_plant_weather(path: Path) -> PlantWeather:
+    storage = get_storage()
+    header = storage.columns(path)
+    if not all(c in header for c in ["DATE_TIME", *WEATHER_COLUMNS]):
+        empty = np.empty(0, dtype=np.float64)
+        return PlantWeather(np.empty(0, dtype=np.int64), empty, empty, empty, {})
+
+    df = storage.read(path, ["DATE_TIME", *WEATHER_COLUMNS])
+    df["DATE_TIME"] = pd.to_datetime(df["DATE_TIME"], format=DATE_FORMAT, errors="coerce")
+    for col in WEATHER_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    df = df.dropna()
+
+    timestamps = df["DATE_TIME"].to_numpy(dtype="datetime64[s]").astype(np.int64)
+    order = np.argsort(timestamps, kind="stable")
+    # on a stable sort np.unique returns the first occurrence in file order
+    timestamps, first = np.unique(timestamps[order], return_index=True)
+    rows = order[first]
+
+    return PlantWeather(
+        timestamps=timestamps,
+        ambient_temperature=df["AMBIENT_TEMPERATURE"].to_numpy(dtype=np.float64)[rows],
+        module_temperature=df["MODULE_TEMPERATURE"].to_numpy(dtype=np.float64)[rows],
+        irradiation=df["IRRADIATION"].to_numpy(dtype=np.float64)[rows],
+        positions={ts: i for i, ts in enumerate(timestamps.tolist())},
+    )
+
+
+def snapshot_plant_weather(snapshot: PlantSnapshot) -> PlantWeather:
+    timestamps = snapshot.column("weather_timestamps")
+    return PlantWeather(
+        timestamps=timestamps,
+        ambient_temperature=snapshot.column("weather_ambient_temperature"),
+        module_temperature=snapshot.column("weather_module_temperature"),
+        irradiation=snapshot.column("weather_irradiation"),
+        positions={ts: i for i, ts in enumerate(timestamps.tolist())},
+    )
+
+
+class WeatherStore(PlantFileStore):
+    def _load(self, path: Path) -> PlantWeather:
+        snapshot = open_snapshot(path) if get_storage() is CSV else None
+        if snapshot is not None and "weather_timestamps" in snapshot:
+            return snapshot_plant_weather(snapshot)
+        return load_plant_weather(path)
+
+
+weather_store = WeatherStore()
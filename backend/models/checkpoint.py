@@ -0,0 +1,11 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+
+@dataclass
+class ModelCheckpoint:
+    plant_id: str
+    model: Any
+    metric: Any
+    adwin: Any
+    last_timestamp: datetime | None
\ No newline at end of file
@@ -0,0 +1,55 @@
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Callable, List, Tuple
+
+from flask import Response, current_app, request
+
+
+# files that only change when the data set is rebuilt, matches the dashboard cache TTL
+STATIC_MAX_AGE = 600
+
+# versions(**view_args) -> [(version, last modified ns)] of the files a route reads
+Versions = Callable[..., List[Tuple[object, int]]]
+
+
+def conditional(versions: Versions, max_age: int = 0):
+    """
+    Conditional GET for a read-only route.
+    The ETag hashes the path, the query arguments and the versions of the source files, Last-Modified is the
+    newest of their mtimes. A request whose If-None-Match (or, without it, If-Modified-Since) still holds is
+    answered 304 before the view runs. max_age=0 makes clients revalidate every time (Cache-Control: no-cache).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            sources = versions(**kwargs)
+            if not sources or any(version is None for version, _ in sources):
+                return view(**kwargs)
+
+            key = (request.path, sorted(request.args.items(multi=True)), [version for version, _ in sources])
+            etag = hashlib.sha1(repr(key).encode()).hexdigest()
+            last_modified = datetime.fromtimestamp(max(mtime for _, mtime in sources) // 10**9, tz=timezone.utc)
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains(etag)
+            else:
+                not_modified = request.if_modified_since is not None and last_modified <= request.if_modified_since
+
+            if not_modified:
+                response = Response(status=304)
+            else:
+                response = current_app.make_response(view(**kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            response.cache_control.public = True
+            if max_age:
+                response.cache_control.max_age = max_age
+            else:
+                response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
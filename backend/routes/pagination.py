@@ -0,0 +1,108 @@
+import json
+from datetime import datetime
+from typing import Callable, Iterator, List
+
+from flask import Response, jsonify, request
+
+from backend.utils.downsampling import Downsample, parse_downsample
+
+
+MAX_LIMIT = 10000
+STREAM_CHUNK = 1000
+STREAM_FORMATS = {"json": "application/json", "ndjson": "application/x-ndjson"}
+
+# fetch(start_time, limit, downsample=None) -> rows sorted by time, starting at start_time (inclusive),
+# reduced by the DAO when a Downsample is given
+Fetch = Callable[..., List]
+
+
+def parse_page_args():
+    """
+    Reads the pagination arguments of a range endpoint:
+    limit   rows per page, the next page is announced in the X-Next-Cursor header
+    cursor  X-Next-Cursor of the previous page
+    stream  'json' or 'ndjson', streams the whole range in chunks instead of one buffered body
+    and the resolution/agg/points arguments of parse_downsample, which apply to the whole range.
+    Raises ValueError with the message for the client.
+    """
+    limit = request.args.get("limit", default=None)
+    cursor = request.args.get("cursor", default=None)
+    stream = request.args.get("stream", default=None)
+
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValueError("Invalid limit. Use a positive integer.")
+        if not 0 < limit <= MAX_LIMIT:
+            raise ValueError(f"Invalid limit. Use a positive integer up to {MAX_LIMIT}.")
+
+    if cursor is not None:
+        try:
+            cursor = datetime.fromisoformat(cursor)
+        except ValueError:
+            raise ValueError("Invalid cursor.")
+
+    if stream is not None and stream not in STREAM_FORMATS:
+        raise ValueError(f"Invalid stream format. Use one of {list(STREAM_FORMATS)}.")
+
+    downsample = parse_downsample(request.args)
+    if downsample is not None and (limit is not None or cursor is not None or stream is not None):
+        raise ValueError("resolution/agg cannot be combined with limit, cursor or stream.")
+
+    return limit, cursor, stream, downsample
+
+
+def _pages(fetch: Fetch, start_time: datetime, limit: int = None) -> Iterator[List]:
+    """Pages of at most STREAM_CHUNK rows, only one page is materialized at a time."""
+    remaining = limit
+    while remaining is None or remaining > 0:
+        chunk = STREAM_CHUNK if remaining is None else min(STREAM_CHUNK, remaining)
+        rows = fetch(start_time, chunk + 1)
+        yield rows[:chunk]
+        if len(rows) <= chunk:
+            return
+        start_time = rows[chunk].timestamp
+        if remaining is not None:
+            remaining -= chunk
+
+
+def _stream(fetch: Fetch, serialize: Callable, start_time: datetime, limit: int, stream: str) -> Iterator[str]:
+    first = True
+    if stream == "json":
+        yield "["
+    for rows in _pages(fetch, start_time, limit):
+        if not rows:
+            continue
+        if stream == "json":
+            yield ("" if first else ",") + ",".join(json.dumps(serialize(r)) for r in rows)
+        else:
+            yield "".join(json.dumps(serialize(r)) + "\n" for r in rows)
+        first = False
+    if stream == "json":
+        yield "]"
+
+
+def paged_response(fetch: Fetch, serialize: Callable, start_time: datetime = None, limit: int = None, cursor: datetime = None, stream: str = None, downsample: Downsample = None):
+    """
+    Response of a time range endpoint whose rows have one row per timestamp.
+    The cursor is the timestamp of the first row of the next page, so a page resumes exactly where the previous one stopped.
+    Without limit and stream the whole range is returned in one body, as before.
+    """
+    if cursor is not None:
+        start_time = cursor if start_time is None else max(start_time, cursor)
+
+    if stream is not None:
+        return Response(_stream(fetch, serialize, start_time, limit, stream), mimetype=STREAM_FORMATS[stream]), 200
+
+    if downsample is not None:
+        return jsonify([serialize(r) for r in fetch(start_time, None, downsample)]), 200
+
+    if limit is None:
+        return jsonify([serialize(r) for r in fetch(start_time, None)]), 200
+
+    rows = fetch(start_time, limit + 1)
+    response = jsonify([serialize(r) for r in rows[:limit]])
+    if len(rows) > limit:
+        response.headers["X-Next-Cursor"] = rows[limit].timestamp.isoformat()
+    return response, 200
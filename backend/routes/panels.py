@@ -1,21 +1,56 @@
 from flask import Blueprint, jsonify, request, current_app
-from backend.services.panels_service import PanelsService
-from backend.services.prediction_service import PredictionService
 from datetime import datetime
+from backend.routes.pagination import parse_page_args, paged_response
+from backend.routes.caching import conditional, STATIC_MAX_AGE
 
 panels_bp = Blueprint( "panels", __name__ )
 
-data_directory = "cleaned_data"
-historical_predictions = "historical_predictions"
-panels_service = PanelsService(data_directory)
+
+def get_panels_service():
+    return current_app.services.panels_service
 
 
 def get_prediction_service():
-    return PredictionService(
-        models=current_app.models,
-        data_directory=current_app.config["DATA_DIRECTORY"],
-        historical_predictions=current_app.config["HISTORICAL_PREDICTIONS"],
-    )
+    return current_app.services.prediction_service
+
+
+def get_lstm_service():
+    return current_app.services.lstm_service
+
+
+def measurement_versions(plant_id, **_):
+    return [get_panels_service().measurements_dao.plant_version(plant_id)]
+
+
+def prediction_versions(plant_id, **_):
+    return [get_prediction_service().prediction_dao.plant_version(plant_id)]
+
+
+def LSTM_measurement_versions(plant_id, **_):
+    return [get_panels_service().LSTM_measurements_dao.plant_version(plant_id)]
+
+
+def LSTM_prediction_versions(plant_id, **_):
+    return [get_prediction_service().LSTM_prediction_dao.plant_version(plant_id)]
+
+
+def measurement_to_dict(m):
+    return {
+        "timestamp": m.timestamp.isoformat(),
+        "plant_id": m.plant_id,
+        "panel_id": m.panel_id,
+        "ac_power": m.ac_power,
+    }
+
+
+def prediction_to_dict(p):
+    return {
+        "timestamp": p.timestamp.isoformat(),
+        "plant_id": p.plant_id,
+        "panel_id": p.panel_id,
+        "ac_power": p.predicted_ac_power,
+        "drift": p.drift,
+    }
 
 
 # GET /plants/<plant_id>/panels
@@ -24,7 +59,7 @@ def get_prediction_service():
 def get_plant_panels(plant_id):
 
     try:
-        panels = panels_service.get_all_by_plant_id(plant_id=plant_id)
+        panels = get_panels_service().get_all_by_plant_id(plant_id=plant_id)
         return jsonify([
             {"id": p.id, "plant_id": p.plant_id}
             for p in panels
@@ -39,10 +74,13 @@ def get_plant_panels(plant_id):
     "/plants/<plant_id>/panels/<panel_id>/measurements",
     methods=["GET"],
 )
+@conditional(measurement_versions, max_age=STATIC_MAX_AGE)
 def get_measurements(plant_id, panel_id):
 
     #Returns a list of measurements for a specific panel.
     #Each measurement: {"timestamp": ISO8601 string, "plant_id": string, "panel_id": string, "ac_power": float}
+    #Optional limit/cursor paginate the range (next page in the X-Next-Cursor header), stream=json|ndjson streams it.
+    #resolution=1h&agg=mean, resolution=daily&agg=sum or agg=lttb&points=500 downsample it instead.
 
     start_time_str = request.args.get("start_time", default=None)
     end_time_str = request.args.get("end_time", default=None)
@@ -64,21 +102,23 @@ def get_measurements(plant_id, panel_id):
         end_time = None
 
     try:
-        measurements = panels_service.get_all_panel_measurements_by_id_and_time_reange(
-            plant_id=plant_id,
-            panel_id=panel_id,
-            start_time=start_time,
-            end_time=end_time
-        )
-        return jsonify([
-            {
-                "timestamp": m.timestamp.isoformat(),
-                "plant_id": m.plant_id,
-                "panel_id": m.panel_id,
-                "ac_power": m.ac_power,
-            }
-            for m in measurements
-        ]), 200
+        limit, cursor, stream, downsample = parse_page_args()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    panels_service = get_panels_service()
+    try:
+        def fetch(start, limit, downsample=None):
+            return panels_service.get_all_panel_measurements_by_id_and_time_reange(
+                plant_id=plant_id,
+                panel_id=panel_id,
+                start_time=start,
+                end_time=end_time,
+                limit=limit,
+                downsample=downsample
+            )
+
+        return paged_response(fetch, measurement_to_dict, start_time, limit, cursor, stream, downsample)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -89,6 +129,7 @@ def get_measurements(plant_id, panel_id):
     "/plants/<plant_id>/panels/<panel_id>/predictions",
     methods=["GET"],
 )
+@conditional(prediction_versions)
 def get_panels_predictions(plant_id, panel_id):
     
     start_time_str = request.args.get("start_time", default=None)
@@ -109,27 +150,25 @@ def get_panels_predictions(plant_id, panel_id):
             return jsonify({"error": "Invalid time format. Use ISO 8601."}), 400
     else:
         end_time = None
-        
 
-    predictions_service = get_prediction_service()
     try:
-        predictions = predictions_service.get_past_panel_predictions(
-            plant_id=plant_id,
-            panel_id=panel_id,
-            start_time=start_time,
-            end_time=end_time
-        )
+        limit, cursor, stream, downsample = parse_page_args()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-        return jsonify([
-            {
-                "timestamp": p.timestamp.isoformat(),
-                "plant_id": p.plant_id,
-                "panel_id": p.panel_id,
-                "ac_power": p.predicted_ac_power,
-                "drift": p.drift,
-            }
-            for p in predictions
-        ]), 200
+    predictions_service = get_prediction_service()
+    try:
+        def fetch(start, limit, downsample=None):
+            return predictions_service.get_past_panel_predictions(
+                plant_id=plant_id,
+                panel_id=panel_id,
+                start_time=start,
+                end_time=end_time,
+                limit=limit,
+                downsample=downsample
+            )
+
+        return paged_response(fetch, prediction_to_dict, start_time, limit, cursor, stream, downsample)
     except ValueError as e:
         return jsonify({"error": str(e)}), 500
     
@@ -182,23 +221,68 @@ def get_new_prediction_by_panel_id(plant_id, panel_id):
     "/plants/<plant_id>/panels/<panel_id>/lstm_predictions",
     methods=["GET"],
 )
+@conditional(LSTM_prediction_versions, max_age=STATIC_MAX_AGE)
 def get_LSTM_predictions(plant_id, panel_id):
+    try:
+        limit, cursor, stream, downsample = parse_page_args()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     try:
         prediction_dao = get_prediction_service()
-        predictions = prediction_dao.get_LSTM_predictions_by_plant_id_and_panel_id(plant_id, panel_id)
 
-        if not predictions:
+        def fetch(start, limit, downsample=None):
+            return prediction_dao.get_LSTM_predictions_by_plant_id_and_panel_id(plant_id, panel_id, start_time=start, limit=limit, downsample=downsample)
+
+        if cursor is None and not fetch(None, 1):
             return jsonify({"error": "No data available for LSTM"}), 404  
         
+        return paged_response(fetch, prediction_to_dict, None, limit, cursor, stream, downsample)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+
+# GET /plants/<plant_id>/panels/<panel_id>/lstm_forecast
+
+
+@panels_bp.route(
+    "/plants/<plant_id>/panels/<panel_id>/lstm_forecast",
+    methods=["GET"],
+)
+def get_LSTM_forecast(plant_id, panel_id):
+
+    #Returns the 96 step (24h) forecast of the InclLSTM ensemble for a panel, starting at time.
+    #Each prediction: {"timestamp": ISO8601 string, "plant_id": string, "panel_id": string, "ac_power": float}
+
+    time_str = request.args.get("time", default=None)
+
+    if time_str is None:
+        return jsonify({"error": "Invalid time format. Use ISO 8601."}), 400
+
+    try:
+        time = datetime.fromisoformat(time_str)
+    except ValueError:
+        return jsonify({"error": "Invalid time format. Use ISO 8601."}), 400
+
+    lstm_service = get_lstm_service()
+    if not lstm_service.available:
+        return jsonify({"error": f"LSTM model not available ({lstm_service.status})"}), 503
+
+    try:
+        forecast = lstm_service.forecast_panel(plant_id, panel_id, time)
+
+        if not forecast:
+            return jsonify({"error": "Not enough data around the requested timestamp for LSTM"}), 404
+
         return jsonify([
             {
                 "timestamp": p.timestamp.isoformat(),
                 "plant_id": p.plant_id,
                 "panel_id": p.panel_id,
-                "ac_power": p.predicted_ac_power,
-                "drift": p.drift,
+                "ac_power": p.ac_power,
             }
-            for p in predictions
+            for p in forecast
         ]), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -212,23 +296,23 @@ def get_LSTM_predictions(plant_id, panel_id):
     "/plants/<plant_id>/panels/<panel_id>/lstm_measurements",
     methods=["GET"],
 )
+@conditional(LSTM_measurement_versions, max_age=STATIC_MAX_AGE)
 def get_LSTM_measurements(plant_id, panel_id):
     try:
+        limit, cursor, stream, downsample = parse_page_args()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        panels_service = get_panels_service()
 
-        measurements = panels_service.get_LSTM_measurements_by_plant_id_and_panel_id(plant_id, panel_id)
+        def fetch(start, limit, downsample=None):
+            return panels_service.get_LSTM_measurements_by_plant_id_and_panel_id(plant_id, panel_id, start_time=start, limit=limit, downsample=downsample)
 
-        if not measurements:
+        if cursor is None and not fetch(None, 1):
             return jsonify({"error": "No data available for LSTM"}), 404  
         
-        return jsonify([
-            {
-                "timestamp": m.timestamp.isoformat(),
-                "plant_id": m.plant_id,
-                "panel_id": m.panel_id,
-                "ac_power": m.ac_power
-            }
-            for m in measurements
-        ]), 200
+        return paged_response(fetch, measurement_to_dict, None, limit, cursor, stream, downsample)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
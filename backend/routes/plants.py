@@ -1,24 +1,29 @@
 from flask import Blueprint, jsonify, request, current_app
-from backend.services.plants_service import PlantsService
-from backend.services.panels_service import PanelsService
-from backend.services.prediction_service import PredictionService
 from datetime import datetime
+from backend.utils.downsampling import parse_downsample
+from backend.routes.caching import conditional, STATIC_MAX_AGE
 
 plants_bp = Blueprint("plants", __name__)
 
 
-data_directory = "cleaned_data"
-historical_predictions = "historical_predictions"
-panles_service = PanelsService(data_directory)
-plants_service = PlantsService(data_directory)
+def get_plants_service():
+    return current_app.services.plants_service
 
 
 def get_prediction_service():
-    return PredictionService(
-        models=current_app.models,
-        data_directory=current_app.config["DATA_DIRECTORY"],
-        historical_predictions=current_app.config["HISTORICAL_PREDICTIONS"],
-    )
+    return current_app.services.prediction_service
+
+
+def get_lstm_service():
+    return current_app.services.lstm_service
+
+
+def measurement_versions(plant_id, **_):
+    return [get_plants_service().measurements_dao.plant_version(plant_id)]
+
+
+def prediction_versions(plant_id, **_):
+    return [get_prediction_service().prediction_dao.plant_version(plant_id)]
 
 
 # GET /plants
@@ -33,7 +38,7 @@ def plants():
     }
     """
     try:
-        plants = plants_service.get_plants()
+        plants = get_plants_service().get_plants()
         if not plants:
             return jsonify({"error": f"No plants found"}), 404
         return jsonify(plants), 200
@@ -46,10 +51,12 @@ def plants():
 # GET /plants/<plant_id>/predictions
 
 @plants_bp.route("/plants/<plant_id>/predictions", methods=["GET"])
+@conditional(prediction_versions)
 def plant_predictions(plant_id):
     
     #Returns a list of predictions for a specific plant.
     #Each prediction: {"timestamp": ISO8601 string, "plant_id": string, "ac_power": float}
+    #resolution=1h&agg=mean, resolution=daily&agg=sum or agg=lttb&points=500 downsample the range.
     
     start_time_str = request.args.get("start_time", default=None)
     end_time_str = request.args.get("end_time", default=None)
@@ -70,12 +77,18 @@ def plant_predictions(plant_id):
     else:
         end_time = None
 
+    try:
+        downsample = parse_downsample(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     try:
         prediction_service = get_prediction_service()
         predictions = prediction_service.get_past_global_plant_predictions(
             plant_id=plant_id,
             start_time=start_time,
-            end_time=end_time
+            end_time=end_time,
+            downsample=downsample
         )
         return jsonify(predictions), 200
     except ValueError as e:
@@ -85,9 +98,10 @@ def plant_predictions(plant_id):
 # GET /plants/<plant_id>/measurements
 
 @plants_bp.route("/plants/<plant_id>/measurements", methods=["GET"])
+@conditional(measurement_versions, max_age=STATIC_MAX_AGE)
 def plant_measurements(plant_id):
     
-    #Returns historical measurements for a plant.
+    #Returns historical measurements for a plant, optionally downsampled like the predictions.
     
     start_time_str = request.args.get("start_time", default=None)
     end_time_str = request.args.get("end_time", default="2020-06-14T10:45:00")
@@ -108,9 +122,14 @@ def plant_measurements(plant_id):
     else:
         end_time = None
 
+    try:
+        downsample = parse_downsample(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     try:
 
-        measurements = plants_service.get_global_measurements_by_plant_id_and_time_range(plant_id=plant_id, start_time=start_time, end_time=end_time)
+        measurements = get_plants_service().get_global_measurements_by_plant_id_and_time_range(plant_id=plant_id, start_time=start_time, end_time=end_time, downsample=downsample)
 
         if not measurements:
             return jsonify({"error": f"No measurements found for plant {plant_id}"}), 404
@@ -169,6 +188,38 @@ def new_plant_prediction(plant_id):
         return jsonify({"error": str(e)}), 500    
     
 
+# GET /plants/<plant_id>/lstm_forecast
+
+@plants_bp.route("/plants/<plant_id>/lstm_forecast", methods=["GET"])
+def plant_lstm_forecast(plant_id):
+
+    #Returns the 96 step (24h) InclLSTM forecast of a plant starting at time, the sum of its panels forecasts.
+    #Each prediction: {"timestamp": ISO8601 string, "plant_id": string, "ac_power": float}
+
+    time_str = request.args.get("time", default=None)
+
+    if time_str is None:
+        return jsonify({"error": "Invalid time format. Use ISO 8601."}), 400
+
+    try:
+        time = datetime.fromisoformat(time_str)
+    except ValueError:
+        return jsonify({"error": "Invalid time format. Use ISO 8601."}), 400
+
+    lstm_service = get_lstm_service()
+    if not lstm_service.available:
+        return jsonify({"error": f"LSTM model not available ({lstm_service.status})"}), 503
+
+    try:
+        forecast = lstm_service.forecast_plant(plant_id, time)
+
+        if not forecast:
+            return jsonify({"error": "Not enough data around the requested timestamp for LSTM"}), 404
+        return jsonify([{"timestamp": p.timestamp.isoformat(), "plant_id": p.plant_id, "ac_power": p.ac_power} for p in forecast]), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 # GET /plants/<plant_id>/drift_summary
 
 @plants_bp.route("/plants/<plant_id>/drift_summary", methods=["GET"])
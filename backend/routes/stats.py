@@ -0,0 +1,13 @@
+from flask import Blueprint, jsonify, current_app
+
+stats_bp = Blueprint("stats", __name__)
+
+
+# GET /stats/cache
+
+@stats_bp.route("/stats/cache", methods=["GET"])
+def cache_stats():
+    
+    #Returns hit/miss counters of the shared stores behind the DAOs.
+
+    return jsonify(current_app.services.stats()), 200
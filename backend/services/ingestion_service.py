@@ -0,0 +1,208 @@
+import asyncio
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from itertools import islice
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Tuple
+
+from backend.dao.prediction_dao import PredictionDao
+from backend.models.prediction import HistoricalPrediction
+from backend.services.model_learner import ModelLearners
+from backend.utils.model_script import create_model, create_metric, create_adwin, preprocess_realtime_2
+from backend.utils.sensor_stream_simulator import iter_full_packets
+
+
+# slots read from a file per trip to the worker thread
+READ_AHEAD_SLOTS = 32
+
+# one timestamp of a plant: the full packets (weather, ac_power, timestamp, panel_id) of all its panels
+Slot = Tuple[datetime, List[Tuple[dict, float, datetime, str]]]
+
+
+class SensorSource(ABC):
+    """Where the readings come from. Implementations yield the slots of a plant in time order."""
+    @abstractmethod
+    def slots(self, plant_id: str) -> AsyncIterator[Slot]:
+        ...
+
+
+def group_slots(packets: Iterable[Tuple[dict, float, datetime, str]]) -> Iterator[Slot]:
+    """Groups time sorted full packets into slots, the packets of consecutive rows sharing a timestamp."""
+    slot = []
+    for packet in packets:
+        if slot and packet[2] != slot[0][2]:
+            yield slot[0][2], slot
+            slot = []
+        slot.append(packet)
+    if slot:
+        yield slot[0][2], slot
+
+
+class CsvReplaySource(SensorSource):
+    """
+    Replays the cleaned csv files, one slot every interval_s seconds.
+    interval_s = 900 replays the 15 minute slots in real time, smaller values accelerate, 0 replays as fast as the consumers go.
+    The files are streamed through iter_full_packets a slot at a time, they are sorted by time so a slot is a run of rows.
+    """
+    def __init__(self, data_directory: str = "cleaned_data", start_time: datetime = None, end_time: datetime = None, interval_s: float = 0):
+        self.data_directory = data_directory
+        self.start_time = start_time
+        self.end_time = end_time
+        self.interval_s = interval_s
+
+    async def slots(self, plant_id: str) -> AsyncIterator[Slot]:
+        slots = group_slots(iter_full_packets(self.data_directory, plant_id, None, self.start_time, self.end_time))
+        first = True
+        while True:
+            # the file is read in a worker thread, so the event loop keeps serving the other plants
+            batch = await asyncio.to_thread(lambda: list(islice(slots, READ_AHEAD_SLOTS)))
+            if not batch:
+                return
+            for slot in batch:
+                # the pause goes between two slots, the last one is not followed by a wait
+                if not first:
+                    await asyncio.sleep(self.interval_s)
+                first = False
+                yield slot
+
+
+class IngestionMetrics:
+    """Events consumed and queue depth per plant, the rates count from the start of IngestionService.run."""
+    def __init__(self):
+        self.started = None
+        self.ended = None
+        self.events: Dict[str, int] = defaultdict(int)
+        self.queues: Dict[str, asyncio.Queue] = {}
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.ended = None
+
+    def stop(self):
+        self.ended = time.perf_counter()
+
+    def snapshot(self) -> dict:
+        if self.started is None:
+            return {"plants": {}, "events": 0, "events_per_s": 0.0, "elapsed_s": 0.0}
+        elapsed = max((self.ended or time.perf_counter()) - self.started, 1e-9)
+        plants = {
+            plant_id: {
+                "queue_depth": queue.qsize(),
+                "events": self.events[plant_id],
+                "events_per_s": self.events[plant_id] / elapsed,
+            }
+            for plant_id, queue in self.queues.items()
+        }
+        total = sum(self.events.values())
+        return {"plants": plants, "events": total, "events_per_s": total / elapsed, "elapsed_s": elapsed}
+
+
+class IngestionService:
+    """
+    Asyncio ingestion of many plants in one process: a producer task per plant reads its source into a bounded
+    queue, so a slow consumer holds the producer back, and a consumer task per plant predicts and learns every
+    slot through the plant learner and persists the predictions.
+    """
+    def __init__(self, source: SensorSource, learners: ModelLearners, prediction_dao: PredictionDao = None, queue_size: int = 64, report_interval_s: float = 0):
+        self.source = source
+        self.learners = learners
+        self.prediction_dao = prediction_dao if prediction_dao is not None else PredictionDao("historical_predictions")
+        self.queue_size = queue_size
+        self.report_interval_s = report_interval_s
+        self.metrics = IngestionMetrics()
+
+    async def _produce(self, plant_id: str, queue: asyncio.Queue):
+        async for slot in self.source.slots(plant_id):
+            await queue.put(slot)
+        await queue.put(None)
+
+    async def _consume(self, plant_id: str, queue: asyncio.Queue):
+        learner = self.learners.get(plant_id)
+        while True:
+            slot = await queue.get()
+            if slot is None:
+                break
+            timestamp, packets = slot
+
+            readings = [(panel_id, preprocess_realtime_2(x, ts), y) for x, y, ts, panel_id in packets]
+            results = await asyncio.wrap_future(learner.submit(readings, timestamp))
+
+            predictions = [
+                HistoricalPrediction(
+                    timestamp=ts,
+                    plant_id=plant_id,
+                    panel_id=panel_id,
+                    predicted_ac_power=y_pred,
+                    real_ac_power=y,
+                    drift=drift_detected
+                )
+                for (x, y, ts, panel_id), (y_pred, drift_detected) in zip(packets, results)
+            ]
+            await asyncio.to_thread(self.prediction_dao.save_predictions, predictions)
+            self.metrics.events[plant_id] += len(packets)
+
+    async def _report(self):
+        while True:
+            await asyncio.sleep(self.report_interval_s)
+            m = self.metrics.snapshot()
+            depths = {plant_id: p["queue_depth"] for plant_id, p in m["plants"].items()}
+            print(f"Ingestion: {m['events']} events, {m['events_per_s']:.0f} events/s, queue depth {depths}")
+
+    async def run(self, plant_ids: List[str]) -> dict:
+        self.metrics.start()
+        tasks = []
+        for plant_id in plant_ids:
+            if self.learners.get(plant_id) is None:
+                raise ValueError(f"No model available for plant {plant_id}")
+            queue = self.metrics.queues[plant_id] = asyncio.Queue(maxsize=self.queue_size)
+            tasks.append(asyncio.create_task(self._produce(plant_id, queue)))
+            tasks.append(asyncio.create_task(self._consume(plant_id, queue)))
+
+        reporter = asyncio.create_task(self._report()) if self.report_interval_s > 0 else None
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in [*tasks, reporter]:
+                if task is not None:
+                    task.cancel()
+            await asyncio.to_thread(self.prediction_dao.flush)
+            self.metrics.stop()
+        return self.metrics.snapshot()
+
+    def start(self, plant_ids: List[str]) -> threading.Thread:
+        """Runs the ingestion of plant_ids on its own event loop in a daemon thread, e.g. next to the Flask app."""
+        def target():
+            try:
+                metrics = asyncio.run(self.run(plant_ids))
+                print(f"Ingestion ended: {metrics['events']} events in {metrics['elapsed_s']:.1f}s")
+            except Exception as e:
+                print(f"Ingestion failed: {e}")
+
+        thread = threading.Thread(target=target, name="ingestion", daemon=True)
+        thread.start()
+        return thread
+
+
+def replay(
+        plant_ids: List[str], data_directory: str = "cleaned_data",
+        start_time: datetime = None, end_time: datetime = None, interval_s: float = 0,
+        learners: ModelLearners = None, historical_predictions: str = "historical_predictions"):
+    """Replays the csv files of the given plants concurrently, with fresh models unless learners are given."""
+    if learners is None:
+        learners = ModelLearners({plant_id: (create_model(), create_metric(), create_adwin()) for plant_id in plant_ids}, {})
+
+    service = IngestionService(
+        CsvReplaySource(data_directory, start_time, end_time, interval_s),
+        learners,
+        PredictionDao(historical_predictions),
+        report_interval_s=5,
+    )
+    return asyncio.run(service.run(plant_ids))
+
+
+
+##testing
+#metrics = replay(["solar_1", "solar_2"], end_time=datetime(2020, 5, 20))
+#print(metrics)
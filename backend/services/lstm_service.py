@@ -0,0 +1,211 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from backend.dao.measurement_store import PlantMeasurements, measurement_store, aggregate_by_timestamp, to_epoch, to_datetimes
+from backend.dao.weather_store import PlantWeather, weather_store
+from backend.dao.storage import get_storage
+from backend.models.prediction import PanelPrediction, GlobalPrediction
+
+
+logger = logging.getLogger(__name__)
+
+FORECAST_CACHE_SIZE = 1024
+SCALERS_FILE = "solar_scalers.pkl"
+
+
+def load_lstm_system(model_directory: str):
+    """Loads the IncLSTMDual ensemble and its scalers, TensorFlow is only imported here."""
+    import joblib
+    from InclLSTM.inclLSTM import IncLSTMDual
+
+    system = IncLSTMDual.load_system(model_directory)
+    scalers = joblib.load(Path(model_directory) / SCALERS_FILE)
+
+    if scalers["scaler_past"].n_features_in_ != system.features_past or scalers["scaler_fut"].n_features_in_ != system.features_future:
+        raise ValueError(f"{SCALERS_FILE} does not match the features of the model in {model_directory}")
+
+    # the served ensemble never changes, one fused graph instead of a Keras predict per learner
+    system.compile_inference()
+    # traces the graph now rather than on the first request
+    system.predict(np.zeros((1, system.steps_past, system.features_past)), np.zeros((1, system.steps_future, system.features_future)))
+    return system, scalers
+
+
+def hour_features(epochs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """hour_sin, hour_cos of the hour of day, as in the training script."""
+    hours = (epochs // 3600) % 24
+    return np.sin(2 * np.pi * hours / 24), np.cos(2 * np.pi * hours / 24)
+
+
+class LSTMForecastService:
+    """
+    Day-ahead forecasts of the pre-trained InclLSTM ensemble, loaded once in a background thread by start().
+    Until it is loaded the service is not available and its status says why.
+    A forecast anchored at a timestamp uses the steps_past readings of the panel before it and the weather of the
+    steps_future readings from it on, read from the shared measurement and weather stores.
+    Results are cached per (plant, panel, anchor) for as long as the plant file does not change.
+    """
+    def __init__(self, model_directory: str = "ilstm_model", data_directory: str = "cleaned_data", cache_size: int = FORECAST_CACHE_SIZE):
+        self.data_directory = data_directory
+        self.cache_size = cache_size
+        self._cache: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._predict_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.model_directory = model_directory
+        self.system = None
+        self.scalers = None
+        # "disabled", "pending", "loading", "ready" or "failed"
+        self.status = "pending" if model_directory else "disabled"
+
+
+    @property
+    def available(self) -> bool:
+        return self.system is not None
+
+
+    def load(self):
+        """Loads the ensemble, importing TensorFlow and tracing the graph take several seconds."""
+        self.status = "loading"
+        start = time.perf_counter()
+        try:
+            system, self.scalers = load_lstm_system(self.model_directory)
+        except Exception:
+            # anything Keras or joblib raises, the routes must not wait on "loading" forever
+            self.status = "failed"
+            logger.exception("LSTM forecasts disabled, could not load %s", self.model_directory)
+            return
+        self.system = system
+        self.status = "ready"
+        print(f"LSTM ensemble loaded in {time.perf_counter() - start:.2f}s")
+
+
+    def start(self) -> threading.Thread | None:
+        """Loads the ensemble in a daemon thread, so the app serves the other routes meanwhile."""
+        if self.status != "pending":
+            return None
+        self.status = "loading"
+        thread = threading.Thread(target=self.load, name="lstm-loader", daemon=True)
+        thread.start()
+        return thread
+
+
+    def _load_plant(self, plant_id: str) -> Tuple[PlantMeasurements | None, PlantWeather | None]:
+        path = get_storage().plant_path(self.data_directory, plant_id)
+        return measurement_store.get(path), weather_store.get(path)
+
+
+    def _panel_features(self, plant: PlantMeasurements, weather: PlantWeather, panel_id: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Time sorted epochs, scaled past features and scaled future features of the readings of a panel that have weather."""
+        rows = plant.panel_rows.get(panel_id)
+        if rows is None or len(weather) == 0:
+            return np.empty(0, dtype=np.int64), np.empty((0, self.system.features_past)), np.empty((0, self.system.features_future))
+
+        epochs = plant.timestamps[rows]
+        pos = np.minimum(np.searchsorted(weather.timestamps, epochs), len(weather) - 1)
+        has_weather = weather.timestamps[pos] == epochs
+        epochs, pos, rows = epochs[has_weather], pos[has_weather], rows[has_weather]
+
+        hour_sin, hour_cos = hour_features(epochs)
+        weather_cols = [weather.ambient_temperature[pos], weather.module_temperature[pos], weather.irradiation[pos], hour_sin, hour_cos]
+        past = np.column_stack([plant.ac_power[rows], *weather_cols])
+        future = np.column_stack(weather_cols)
+
+        # MinMaxScaler.transform
+        past = past * self.scalers["scaler_past"].scale_ + self.scalers["scaler_past"].min_
+        future = future * self.scalers["scaler_fut"].scale_ + self.scalers["scaler_fut"].min_
+        return epochs, past, future
+
+
+    def _forecast_panels(self, plant_id: str, panel_ids: List[str], anchor: datetime) -> Dict[str, List[PanelPrediction]]:
+        if not self.available:
+            raise ValueError("LSTM model not available")
+
+        plant, weather = self._load_plant(plant_id)
+        if plant is None or weather is None:
+            return {}
+
+        steps_past, steps_future = self.system.steps_past, self.system.steps_future
+        anchor_epoch = to_epoch(anchor)
+        results = {}
+        pending = []
+
+        for panel_id in panel_ids:
+            epochs, past, future = self._panel_features(plant, weather, panel_id)
+            # the first forecast step is the first reading at or after the anchor
+            j = int(np.searchsorted(epochs, anchor_epoch, side="left"))
+            if j < steps_past or j + steps_future > len(epochs):
+                continue
+
+            key = (plant_id, panel_id, int(epochs[j]))
+            with self._lock:
+                cached = self._cache.get(key)
+                if cached is not None and cached[0] is plant and cached[1] is weather:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    results[panel_id] = cached[2]
+                    continue
+                self.misses += 1
+            pending.append((panel_id, key, epochs[j:j + steps_future], past[j - steps_past:j], future[j:j + steps_future]))
+
+        if pending:
+            X_past = np.stack([p[3] for p in pending])
+            X_future = np.stack([p[4] for p in pending])
+            # one batched ensemble call for every panel missing from the cache
+            with self._predict_lock:
+                y_norm = self.system.predict(X_past, X_future)
+
+            target = self.scalers["scaler_target"]
+            # MinMaxScaler.inverse_transform of the non negative part
+            y = (np.maximum(y_norm, 0) - target.min_[0]) / target.scale_[0]
+
+            for (panel_id, key, epochs, _, _), powers in zip(pending, y):
+                forecast = [
+                    PanelPrediction(timestamp=ts, plant_id=plant_id, panel_id=panel_id, ac_power=power)
+                    for ts, power in zip(to_datetimes(epochs), powers.tolist())
+                ]
+                results[panel_id] = forecast
+                with self._lock:
+                    self._cache[key] = (plant, weather, forecast)
+                    self._cache.move_to_end(key)
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+
+        return results
+
+
+    def forecast_panel(self, plant_id: str, panel_id: str, anchor: datetime) -> List[PanelPrediction]:
+        """steps_future predictions of the panel from anchor on, [] when there is not enough data around anchor."""
+        return self._forecast_panels(plant_id, [panel_id], anchor).get(panel_id, [])
+
+
+    def forecast_plant(self, plant_id: str, anchor: datetime) -> List[GlobalPrediction]:
+        """Sum over the panels of their forecasts from anchor on, panels without enough data are left out."""
+        plant, _ = self._load_plant(plant_id)
+        if plant is None:
+            return []
+
+        forecasts = self._forecast_panels(plant_id, plant.panel_ids, anchor)
+        if not forecasts:
+            return []
+
+        epochs = np.array([to_epoch(p.timestamp) for f in forecasts.values() for p in f], dtype=np.int64)
+        powers = np.array([p.ac_power for f in forecasts.values() for p in f], dtype=np.float64)
+        timestamps, totals = aggregate_by_timestamp(epochs, powers)
+        return [
+            GlobalPrediction(timestamp=ts, plant_id=plant_id, ac_power=power)
+            for ts, power in zip(to_datetimes(timestamps), totals.tolist())
+        ]
+
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"available": self.available, "status": self.status, "entries": len(self._cache), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,120 @@
+import copy
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Dict, Iterator, List, Tuple
+
+from backend.utils.model_script import process_one_reading
+
+
+RESULT_CACHE_SIZE = 1024    # timestamps
+
+
+class PlantLearner:
+    """
+    Single writer of one plant model. Readings are queued and learned in arrival order on a dedicated thread,
+    so concurrent requests never update the (model, metric, adwin) state at the same time.
+    Readers get a copy of the model taken between two learning steps.
+
+    Training is idempotent: the results of the recent timestamps are cached per panel, a reading already
+    learned is answered from the cache, and one older than the last learned timestamp (the watermark) is
+    only scored, never learned again.
+    """
+    def __init__(self, plant_id: str, model, metric, adwin, last_learned: dict, cache_size: int = RESULT_CACHE_SIZE):
+        self.plant_id = plant_id
+        self.model = model
+        self.metric = metric
+        self.adwin = adwin
+        self.last_learned = last_learned
+        self.lock = threading.Lock()
+        self._snapshot = None
+        self._results: OrderedDict[datetime, Dict[str, Tuple[float, bool]]] = OrderedDict()
+        self._cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=f"learner-{plant_id}", daemon=True)
+        self._thread.start()
+
+    def submit(self, readings: List[Tuple[str, dict, float]], timestamp: datetime) -> Future:
+        """Queues (panel_id, features, target) readings of timestamp, the future resolves to their (y_pred, drift) results."""
+        future = Future()
+        self._queue.put((readings, timestamp, future))
+        return future
+
+    def learn(self, readings: List[Tuple[str, dict, float]], timestamp: datetime) -> List[Tuple[float, bool]]:
+        with self.lock:
+            cached = self._results.get(timestamp)
+            if cached is not None and all(panel_id in cached for panel_id, _, _ in readings):
+                self.hits += 1
+                return [cached[panel_id] for panel_id, _, _ in readings]
+            self.misses += 1
+        return self.submit(readings, timestamp).result()
+
+    def _run(self):
+        while True:
+            readings, timestamp, future = self._queue.get()
+            try:
+                with self.lock:
+                    future.set_result(self._learn(readings, timestamp))
+            except Exception as e:
+                future.set_exception(e)
+
+    def _learn(self, readings: List[Tuple[str, dict, float]], timestamp: datetime) -> List[Tuple[float, bool]]:
+        watermark = self.last_learned.get(self.plant_id)
+        cached = self._results.get(timestamp)
+        # a timestamp up to the watermark was learned already, unless it is the one being learned now
+        learned = watermark is not None and (timestamp < watermark or (timestamp == watermark and cached is None))
+        if cached is None:
+            cached = self._results[timestamp] = {}
+            if len(self._results) > self._cache_size:
+                self._results.popitem(last=False)
+
+        results = []
+        for panel_id, features, target in readings:
+            result = cached.get(panel_id)
+            if result is None:
+                if learned:
+                    y_pred = self.model.predict_one(features)
+                    result = (0.0 if y_pred is None else y_pred, False)
+                else:
+                    result = process_one_reading(self.model, self.metric, self.adwin, features, target)
+                    self._snapshot = None
+                cached[panel_id] = result
+            results.append(result)
+
+        if watermark is None or timestamp > watermark:
+            self.last_learned[self.plant_id] = timestamp
+        return results
+
+    def snapshot(self):
+        """Read-only copy of the model, refreshed at most once per learning step."""
+        with self.lock:
+            if self._snapshot is None:
+                self._snapshot = copy.deepcopy(self.model)
+            return self._snapshot
+
+    def state(self):
+        """Consistent copy of (model, metric, adwin) and the last learned timestamp, e.g. for checkpoints."""
+        with self.lock:
+            return copy.deepcopy((self.model, self.metric, self.adwin)), self.last_learned.get(self.plant_id)
+
+
+class ModelLearners:
+    """One PlantLearner per plant model, built once per app."""
+    def __init__(self, models: dict, last_learned: dict):
+        self._learners: Dict[str, PlantLearner] = {
+            plant_id: PlantLearner(plant_id, model, metric, adwin, last_learned)
+            for plant_id, (model, metric, adwin) in models.items()
+        }
+
+    def get(self, plant_id: str) -> PlantLearner | None:
+        return self._learners.get(plant_id)
+
+    def __iter__(self) -> Iterator[PlantLearner]:
+        return iter(list(self._learners.values()))
+
+    def stats(self) -> dict:
+        return {learner.plant_id: {"hits": learner.hits, "misses": learner.misses} for learner in self}
@@ -14,8 +14,8 @@ class PanelsService:
         return self.measurements_dao.get_all_panel_measurements_by_plant_id_and_panel_id(plant_id=plant_id, panel_id=panel_id)
 
 
-    def get_all_panel_measurements_by_id_and_time_reange(self, plant_id: str, panel_id: str, start_time: datetime = None, end_time: datetime = None):
-        return self.measurements_dao.get_panel_measurements_by_panel_id_and_time_range(plant_id=plant_id, panel_id=panel_id, start_time=start_time, end_time=end_time)
+    def get_all_panel_measurements_by_id_and_time_reange(self, plant_id: str, panel_id: str, start_time: datetime = None, end_time: datetime = None, limit: int = None, downsample=None):
+        return self.measurements_dao.get_panel_measurements_by_panel_id_and_time_range(plant_id=plant_id, panel_id=panel_id, start_time=start_time, end_time=end_time, limit=limit, downsample=downsample)
     
 
     def get_all_panel_measurements_by_plant_id(self, plant_id: str):
@@ -33,5 +33,5 @@ class PanelsService:
     def get_all_by_plant_id(self, plant_id: str):
         return self.panel_dao.get_all_by_plant_id(plant_id=plant_id)
     
-    def get_LSTM_measurements_by_plant_id_and_panel_id(self, plant_id, panel_id):
-        return self.LSTM_measurements_dao.get_all_panel_measurements_by_plant_id_and_panel_id(plant_id, panel_id)
\ No newline at end of file
+    def get_LSTM_measurements_by_plant_id_and_panel_id(self, plant_id, panel_id, start_time: datetime = None, limit: int = None, downsample=None):
+        return self.LSTM_measurements_dao.get_panel_measurements_by_panel_id_and_time_range(plant_id, panel_id, start_time=start_time, limit=limit, downsample=downsample)
\ No newline at end of file
@@ -15,5 +15,5 @@ class PlantsService:
     def get_global_measurements_by_plant_id(self, plant_id: str):
         return self.measurements_dao.get_all_global_measurements_by_plant_id(plant_id=plant_id)
     
-    def get_global_measurements_by_plant_id_and_time_range(self, plant_id: str, start_time: datetime = None, end_time: datetime = None):
-        return self.measurements_dao.get_global_measurements_by_plant_id_and_time_range(plant_id=plant_id, start_time=start_time, end_time=end_time)
\ No newline at end of file
+    def get_global_measurements_by_plant_id_and_time_range(self, plant_id: str, start_time: datetime = None, end_time: datetime = None, downsample=None):
+        return self.measurements_dao.get_global_measurements_by_plant_id_and_time_range(plant_id=plant_id, start_time=start_time, end_time=end_time, downsample=downsample)
\ No newline at end of file
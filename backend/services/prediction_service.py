@@ -8,22 +8,33 @@ from backend.dao.weather_dao import WeatherDAO
 from backend.dao.prediction_dao import PredictionDao
 from backend.dao.measurements_dao import MeasurementsDAO
 from backend.models.prediction import HistoricalPrediction, GlobalPrediction
-from backend.utils.sensor_stream_simulator import load_future_weather_data
-from backend.utils.model_script import preprocess_realtime_2, process_one_reading
+from backend.dao.measurement_store import aggregate_by_timestamp, to_datetimes
+from backend.utils.sensor_stream_simulator import load_full_packets_frame
+from backend.utils.model_script import preprocess_realtime_2, preprocess_frame, predict_many
+from backend.services.model_learner import ModelLearners
 
 
 
 class PredictionService:
-    def __init__(self, models, data_directory="cleaned_data", historical_predictions: str = "historical_predictionss"):
+    def __init__(self, models, data_directory="cleaned_data", historical_predictions: str = "historical_predictionss", last_learned: dict = None, learners: ModelLearners = None):
         self.prediction_dao = PredictionDao(historical_predictions)
         self.weather_dao = WeatherDAO(data_directory)
         self.measure_dao = MeasurementsDAO(data_directory)
         self.panels_dao = PanelsDAO(data_directory)
         self.LSTM_prediction_dao = PredictionDao("InclLSTM") #this is to show LSTM dashboard 
         self.models = models
+        self.last_learned = last_learned if last_learned is not None else {}
+        self.learners = learners if learners is not None else ModelLearners(models or {}, self.last_learned)
         self.data_directory = data_directory
 
 
+    def _learner(self, plant_id: str):
+        learner = self.learners.get(plant_id)
+        if learner is None:
+            raise ValueError("No model available for this plant")
+        return learner
+
+
     def train_next_timestamp_for_given_panel_and_timestamp(self, plant_id: str, panel_id: str, timestamp: datetime):
 
         w = self.weather_dao.get_weather_by_plant_id_and_timestamp(plant_id, timestamp)
@@ -37,8 +48,7 @@ class PredictionService:
         m = self.measure_dao.get_panel_measurement_by_plant_id_and_panel_id_and_timestamp(plant_id, panel_id, timestamp)
         target = m.ac_power
         
-        model, metric, adwin = self.models.get(plant_id)
-        y_pred, drift_detected = process_one_reading(model, metric, adwin, features, target)
+        [(y_pred, drift_detected)] = self._learner(plant_id).learn([(panel_id, features, target)], timestamp)
         prediction = HistoricalPrediction(
             timestamp = timestamp,
             plant_id= plant_id,
@@ -72,12 +82,12 @@ class PredictionService:
 
         meas_map = {m.panel_id: m for m in all_measurements}
 
+        # the learner thread runs the whole timestamp in one step, in panel order; repeated calls hit its cache
+        results = self._learner(plant_id).learn([(panel_id, features, m.ac_power) for panel_id, m in meas_map.items()], timestamp)
+
         predictions = []
         global_power = 0.0
-        model, metric, adwin = self.models.get(plant_id)
-        for panel_id, m in meas_map.items():
-            y_pred, drift_detected = process_one_reading(model, metric, adwin, features, m.ac_power)
-
+        for (panel_id, m), (y_pred, drift_detected) in zip(meas_map.items(), results):
             prediction = HistoricalPrediction(
                 timestamp=timestamp,
                 plant_id=plant_id,
@@ -92,92 +102,61 @@ class PredictionService:
         global_prediction = GlobalPrediction(timestamp=timestamp, plant_id=plant_id, ac_power=global_power)
         return global_prediction, predictions
 
-    def predict_panel(self, plant_id: str, panel_id: str, start_time: datetime = None, end_time: datetime = None):
-
-        model, metric, adwin = self.models.get(plant_id)
+    def forecast(self, plant_id: str, start_time: datetime = None, end_time: datetime = None, panel_id: str = None):
+        """
+        Batch forecast from the weather between start_time and end_time, without learning.
+        Every panel shares the weather of a timestamp, so each distinct feature row is scored once
+        and broadcast back to the panels.
+        Returns aligned arrays: timestamps (datetime64[s]), panel ids and predicted ac power.
+        """
+        model = self._learner(plant_id).snapshot()
 
-        if model is None:
-            raise ValueError("No model available for this plant")
-        
-        packets = load_future_weather_data(
+        df = load_full_packets_frame(
             data_directory=self.data_directory,
             plant_id=plant_id,
-            start_time=end_time
+            panel_id=panel_id,
+            start_time=start_time,
+            end_time=end_time
         )
 
-        packets = [p for p in packets if p[2] == panel_id]
+        y_pred = predict_many(model, preprocess_frame(df))
+        return df["DATE_TIME"].to_numpy(dtype="datetime64[s]"), df["SOURCE_KEY"].to_numpy(), y_pred
 
+    def predict_panel(self, plant_id: str, panel_id: str, start_time: datetime = None, end_time: datetime = None):
 
-        if start_time is None:
-            start_time = datetime.min
-        if end_time is None :
-            end_time = datetime.max
-
-        packets = [p for p in packets if start_time <= p[1] <= end_time]
-        
+        timestamps, _, y_pred = self.forecast(plant_id, start_time, end_time, panel_id=panel_id)
 
-        predictions_list = []
-        for weather_info, timestamp, _ in packets:
-            x = preprocess_realtime_2(weather_info, timestamp)
-            y_pred = model.predict_one(x)
-            predictions_list.append({
-                "timestamp": timestamp.isoformat(),
+        return [
+            {
+                "timestamp": ts.isoformat(),
                 "plant_id": plant_id,
                 "panel_id": panel_id,
-                "ac_power": y_pred
-            })
-
-        return predictions_list
+                "ac_power": power
+            }
+            for ts, power in zip(timestamps.tolist(), y_pred.tolist())
+        ]
     
 
     
     def predict_plant(self, plant_id: str, start_time: datetime = None, end_time: datetime = None):
 
-        model, metric, adwin = self.models.get(plant_id)
-
-        if model is None:
-            raise ValueError("No model available for this plant")
-        
-        packets = load_future_weather_data(
-            data_directory=self.data_directory,
-            plant_id=plant_id,
-            start_time=end_time
-        )
-
-        if start_time is not None or end_time is not None:
-            if start_time is None:
-                start_time = datetime.min
-            if end_time is None:
-                end_time = datetime.max
-
-            packets = [p for p in packets if start_time <= p[2] <= end_time]
-        
-
-        aggregated = defaultdict(float)  
+        timestamps, _, y_pred = self.forecast(plant_id, start_time, end_time)
+        unique_timestamps, totals = aggregate_by_timestamp(timestamps.astype(np.int64), y_pred)
 
-        for weather_info, timestamp, panel_id in packets:
-            x = preprocess_realtime_2(weather_info, timestamp)
-            y_pred = model.predict_one(x)
-            aggregated[timestamp] += y_pred  
-
-
-        predictions_list = [
+        return [
             {
                 "timestamp": ts.isoformat(),
                 "plant_id": plant_id,
                 "ac_power": ac_power
             }
-            for ts, ac_power in sorted(aggregated.items())
+            for ts, ac_power in zip(to_datetimes(unique_timestamps), totals.tolist())
         ]
-        
-
-        return predictions_list
     
-    def get_past_global_plant_predictions(self, plant_id: str, start_time: datetime = None, end_time: datetime = None):
-        return self.prediction_dao.get_global_predictions_by_plant_id_and_time_range(plant_id, start_time, end_time)
+    def get_past_global_plant_predictions(self, plant_id: str, start_time: datetime = None, end_time: datetime = None, downsample=None):
+        return self.prediction_dao.get_global_predictions_by_plant_id_and_time_range(plant_id, start_time, end_time, downsample)
     
-    def get_past_panel_predictions(self, plant_id: str, panel_id: str ,start_time: datetime = None, end_time: datetime = None):
-        return self.prediction_dao.get_panel_predictions_by_panel_id_and_time_range(plant_id, panel_id, start_time, end_time)
+    def get_past_panel_predictions(self, plant_id: str, panel_id: str ,start_time: datetime = None, end_time: datetime = None, limit: int = None, downsample=None):
+        return self.prediction_dao.get_panel_predictions_by_panel_id_and_time_range(plant_id, panel_id, start_time, end_time, limit, downsample)
     
     def get_drifts_by_plant_id_panel_id_and_time_range(self, plant_id: str, panel_id: str ,start_time: datetime = None, end_time: datetime = None):
         predictions = self.prediction_dao.get_panel_predictions_by_panel_id_and_time_range(plant_id, panel_id, start_time, end_time)
@@ -225,8 +204,8 @@ class PredictionService:
     
         return total_kpi, panels_kpis, total_drifts, panels_drifts
     
-    def get_LSTM_predictions_by_plant_id_and_panel_id(self, plant_id, panel_id):
-        return self.LSTM_prediction_dao.get_all_panel_predictions_by_panel_id(plant_id, panel_id)
+    def get_LSTM_predictions_by_plant_id_and_panel_id(self, plant_id, panel_id, start_time: datetime = None, limit: int = None, downsample=None):
+        return self.LSTM_prediction_dao.get_panel_predictions_by_panel_id_and_time_range(plant_id, panel_id, start_time, limit=limit, downsample=downsample)
     
 ##testing
 #lstm_path = "InclLSTM"
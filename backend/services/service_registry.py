@@ -0,0 +1,57 @@
+from datetime import timedelta
+from backend.services.panels_service import PanelsService
+from backend.services.plants_service import PlantsService
+from backend.services.prediction_service import PredictionService
+from backend.services.weather_service import WeatherService
+from backend.services.lstm_service import LSTMForecastService
+from backend.services.ingestion_service import IngestionService, CsvReplaySource
+from backend.dao.measurement_store import measurement_store
+from backend.dao.weather_store import weather_store
+from backend.dao.prediction_index import prediction_index
+from backend.dao.prediction_store import prediction_store
+
+
+class ServiceRegistry:
+    """
+    Application scoped services, built once in create_app and shared by all request threads.
+    The DAOs behind them share the process-wide stores, so their caches survive across requests.
+    """
+    def __init__(self, app):
+        data_directory = app.config["DATA_DIRECTORY"]
+
+        self.panels_service = PanelsService(data_directory)
+        self.plants_service = PlantsService(data_directory)
+        self.weather_service = WeatherService(data_directory)
+        self.learners = app.learners
+        self.prediction_service = PredictionService(
+            models=app.models,
+            data_directory=data_directory,
+            historical_predictions=app.config["HISTORICAL_PREDICTIONS"],
+            last_learned=app.last_learned,
+            learners=app.learners,
+        )
+        self.lstm_service = LSTMForecastService(
+            model_directory=app.config["LSTM_MODEL_DIRECTORY"],
+            data_directory=data_directory,
+        )
+
+        self.ingestion_service = None
+        if app.config["INGESTION_INTERVAL_S"] >= 0:
+            self.ingestion_service = IngestionService(
+                # the slots after the history the models were bootstrapped on
+                CsvReplaySource(data_directory, start_time=app.bootstrap_end_time + timedelta(seconds=1), interval_s=app.config["INGESTION_INTERVAL_S"]),
+                app.learners,
+                self.prediction_service.prediction_dao,
+            )
+
+    def stats(self) -> dict:
+        return {
+            "measurement_store": measurement_store.stats(),
+            "weather_store": weather_store.stats(),
+            "prediction_index": prediction_index.stats(),
+            "prediction_store": prediction_store.stats(),
+            "prediction_writer": self.prediction_service.prediction_dao.stats(),
+            "learners": self.learners.stats(),
+            "lstm_forecasts": self.lstm_service.stats(),
+            "ingestion": self.ingestion_service.metrics.snapshot() if self.ingestion_service is not None else None,
+        }
@@ -0,0 +1,148 @@
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+import numpy as np
+
+from backend.dao.measurement_store import DATE_FORMAT
+from backend.dao.prediction_dao import HEADER
+from backend.utils.model_script import create_model, create_metric, create_adwin, preprocess_frame, learn_frame
+from backend.utils.sensor_stream_simulator import load_full_packets_frame
+
+
+# (plant_id, start_time, end_time), open ended when a bound is None
+BacktestJob = Tuple[str, datetime, datetime]
+
+
+def _output_file(output_directory: str, job: BacktestJob) -> Path:
+    plant_id, start_time, end_time = job
+    name = plant_id
+    if start_time is not None or end_time is not None:
+        name += "_" + "-".join(t.strftime("%Y%m%d%H%M") if t is not None else "open" for t in (start_time, end_time))
+    return Path(output_directory) / f"{name}.csv"
+
+
+def _summary(job: BacktestJob, **values) -> dict:
+    """Result of a job, a zero-row summary unless values say otherwise."""
+    plant_id, start_time, end_time = job
+    summary = {
+        "plant_id": plant_id,
+        "start_time": start_time,
+        "end_time": end_time,
+        "output": None,
+        "rows": 0,
+        "load_s": 0.0,
+        "elapsed_s": 0.0,
+        "rows_per_s": 0.0,
+        "mae": 0.0,
+        "r2": 0.0,
+        "drifts": 0,
+        "error": None,
+    }
+    summary.update(values)
+    return summary
+
+
+def _backtest_plant(data_directory: str, output_directory: str, job: BacktestJob, chunk_size: int, model_factory: Callable) -> dict:
+    """
+    Replays one plant and date range through a fresh model, runs inside a worker process.
+    Predictions are written to the output csv a chunk at a time, so memory stays flat on long ranges.
+    """
+    start = time.perf_counter()
+    plant_id, start_time, end_time = job
+    model, metric, adwin = model_factory(), create_metric(), create_adwin()
+
+    df = load_full_packets_frame(data_directory, plant_id, start_time=start_time, end_time=end_time)
+    if df.empty:
+        # unknown plant or no data in the range
+        elapsed = time.perf_counter() - start
+        return _summary(job, load_s=elapsed, elapsed_s=elapsed)
+
+    X = preprocess_frame(df)
+    y = df["AC_POWER"].to_numpy(dtype=np.float64)
+    dates = df["DATE_TIME"].dt.strftime(DATE_FORMAT).to_numpy()
+    panels = df["SOURCE_KEY"].to_numpy()
+    load_s = time.perf_counter() - start
+
+    path = _output_file(output_directory, job)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    drifts = 0
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        for lo in range(0, len(df), chunk_size):
+            hi = min(len(df), lo + chunk_size)
+            y_pred, drift = learn_frame(model, metric, adwin, X.iloc[lo:hi], y[lo:hi])
+            drifts += int(drift.sum())
+            writer.writerows(zip(dates[lo:hi].tolist(), [plant_id] * (hi - lo), panels[lo:hi].tolist(), y_pred.tolist(), y[lo:hi].tolist(), drift.tolist()))
+
+    elapsed = time.perf_counter() - start
+    mae, r2 = metric.get()
+    return _summary(
+        job,
+        output=str(path),
+        rows=len(df),
+        load_s=load_s,
+        elapsed_s=elapsed,
+        rows_per_s=len(df) / elapsed if elapsed > 0 else 0.0,
+        mae=mae,
+        r2=r2,
+        drifts=drifts,
+    )
+
+
+def run_backtest(
+        jobs: List[BacktestJob], data_directory: str = "cleaned_data", output_directory: str = "backtests",
+        workers: int = None, chunk_size: int = 10000, model_factory: Callable = create_model) -> dict:
+    """
+    Replays every (plant, date range) job as fast as the CPU allows, one job per worker process.
+    Each job starts from a fresh model_factory() model and learns with progressive validation (see learn_frame).
+    model_factory must be a module level function so it can be sent to the workers.
+    A job that fails is reported with its error and a zero-row summary, the other jobs still run.
+    Returns the per job results and the overall throughput.
+    """
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs)))
+    args = (data_directory, output_directory)
+    options = (chunk_size, model_factory)
+    start = time.perf_counter()
+    results = []
+
+    def collect(result):
+        results.append(result)
+        if result["error"] is not None:
+            print(f"Backtest {result['plant_id']} [{result['start_time']} - {result['end_time']}] failed: {result['error']}")
+            return
+        print(
+            f"Backtest {result['plant_id']} [{result['start_time']} - {result['end_time']}]: {result['rows']} rows in {result['elapsed_s']:.2f}s "
+            f"({result['rows_per_s']:.0f} rows/s) | MAE: {result['mae']:.4f} | R^2: {result['r2']:.4f} | drifts: {result['drifts']}"
+        )
+
+    if workers == 1:
+        for job in jobs:
+            try:
+                collect(_backtest_plant(*args, job, *options))
+            except Exception as e:
+                collect(_summary(job, error=str(e)))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_backtest_plant, *args, job, *options): job for job in jobs}
+            for future in as_completed(futures):
+                try:
+                    collect(future.result())
+                except Exception as e:
+                    collect(_summary(futures[future], error=str(e)))
+
+    elapsed = time.perf_counter() - start
+    rows = sum(r["rows"] for r in results)
+    print(f"Backtest ended: {rows} rows in {elapsed:.2f}s on {workers} workers ({rows / elapsed:.0f} rows/s)")
+    return {"jobs": results, "rows": rows, "elapsed_s": elapsed, "rows_per_s": rows / elapsed if elapsed > 0 else 0.0}
+
+
+
+##testing
+#if __name__ == "__main__":
+#    run_backtest([("solar_1", None, None), ("solar_2", None, None), ("solar_1", datetime(2020, 6, 1), None)])
@@ -0,0 +1,126 @@
+import re
+from dataclasses import dataclass
+from typing import Dict, Mapping, Tuple
+
+import numpy as np
+
+
+AGGREGATIONS = ["mean", "sum", "min", "max", "lttb"]
+DEFAULT_POINTS = 500
+UNITS = {"s": 1, "min": 60, "h": 3600, "d": 86400}
+ALIASES = {"hourly": "1h", "daily": "1d"}
+
+
+def parse_resolution(resolution: str) -> int:
+    """'15min', '1h', '1d', 'hourly', 'daily' -> bucket width in seconds."""
+    match = re.fullmatch(r"(\d+)(s|min|h|d)", ALIASES.get(resolution, resolution))
+    if match is None or int(match.group(1)) == 0:
+        raise ValueError("Invalid resolution. Use <n>s, <n>min, <n>h, <n>d, hourly or daily.")
+    return int(match.group(1)) * UNITS[match.group(2)]
+
+
+def bucket_starts(epochs: np.ndarray, bucket_s: int) -> Tuple[np.ndarray, np.ndarray]:
+    """For time sorted epochs, returns the start of every non empty bucket and the index of its first row."""
+    buckets = epochs // bucket_s * bucket_s
+    first = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]]) if len(buckets) else np.empty(0, dtype=np.int64)
+    return buckets[first], first
+
+
+def aggregate(values: np.ndarray, first: np.ndarray, how: str) -> np.ndarray:
+    """Reduces the runs of values starting at first with how (mean, sum, min or max)."""
+    if how == "mean":
+        counts = np.diff(np.r_[first, len(values)])
+        return np.add.reduceat(values, first) / counts
+    return {"sum": np.add, "min": np.minimum, "max": np.maximum}[how].reduceat(values, first)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: indices of the points rows that best keep the visual shape of y(x).
+    The first and last rows are always kept, every bucket in between contributes the row forming the largest
+    triangle with the previously kept row and the mean of the next bucket.
+    """
+    size = len(x)
+    if points >= size or points < 3:
+        return np.arange(size)
+
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+    edges = (np.arange(points - 1) * ((size - 2) / (points - 2))).astype(np.int64) + 1
+    edges[-1] = size - 1
+
+    # mean of every bucket, the last "bucket" is the final row
+    counts = np.diff(edges)
+    avg_x = np.r_[np.add.reduceat(x[:size - 1], edges[:-1]) / counts, x[-1]]
+    avg_y = np.r_[np.add.reduceat(y[:size - 1], edges[:-1]) / counts, y[-1]]
+
+    selected = np.empty(points, dtype=np.int64)
+    selected[0], selected[-1] = 0, size - 1
+    a = 0
+    for i in range(points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs((x[a] - avg_x[i + 1]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y[i + 1] - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+@dataclass
+class Downsample:
+    """
+    Server-side reduction of a time series held as columns (see the DAOs):
+    either time buckets of resolution_s seconds aggregated with agg, or an LTTB selection of points rows.
+    """
+    agg: str
+    resolution_s: int = None
+    points: int = None
+
+    def reduce(self, epochs: np.ndarray, columns: Dict[str, np.ndarray]) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """
+        Reduces time sorted epochs and the value columns aligned with them, returns the epochs and columns of the output rows.
+        Bucket epochs are the bucket starts, float columns are aggregated with agg and a bool column flags a bucket
+        if any of its rows is flagged. LTTB keeps the rows selected on the first column.
+        """
+        if len(epochs) == 0:
+            return epochs, columns
+
+        if self.agg == "lttb":
+            rows = lttb_indices(epochs, next(iter(columns.values())), self.points)
+            return epochs[rows], {name: values[rows] for name, values in columns.items()}
+
+        starts, first = bucket_starts(epochs, self.resolution_s)
+        return starts, {
+            name: np.logical_or.reduceat(values, first) if values.dtype == bool else aggregate(values, first, self.agg)
+            for name, values in columns.items()
+        }
+
+
+def parse_downsample(args: Mapping) -> Downsample | None:
+    """
+    Reads resolution, agg and points from the query arguments, None when no reduction is asked.
+    resolution=1h&agg=mean, resolution=daily&agg=sum, agg=lttb&points=500. Raises ValueError for the client.
+    """
+    resolution = args.get("resolution")
+    agg = args.get("agg")
+    points = args.get("points")
+    if resolution is None and agg is None:
+        return None
+
+    agg = agg or "mean"
+    if agg not in AGGREGATIONS:
+        raise ValueError(f"Invalid agg. Use one of {AGGREGATIONS}.")
+
+    if agg == "lttb":
+        if resolution is not None:
+            raise ValueError("agg=lttb takes points, not a resolution.")
+        try:
+            points = DEFAULT_POINTS if points is None else int(points)
+        except ValueError:
+            raise ValueError("Invalid points. Use an integer of at least 3.")
+        if points < 3:
+            raise ValueError("Invalid points. Use an integer of at least 3.")
+        return Downsample(agg=agg, points=points)
+
+    if resolution is None:
+        raise ValueError(f"agg={agg} needs a resolution.")
+    return Downsample(agg=agg, resolution_s=parse_resolution(resolution))
@@ -6,7 +6,8 @@ from typing import Tuple, Dict, Any, Generator
 from river import compose, preprocessing, tree, metrics, drift
 
 from backend.models.prediction import HistoricalPrediction
-from backend.utils.sensor_stream_simulator import full_packet_stream_simulator, load_historical_data
+from backend.models.checkpoint import ModelCheckpoint
+from backend.utils.sensor_stream_simulator import full_packet_stream_simulator, load_full_packets_frame
 from backend.dao.prediction_dao import PredictionDao #this is used for tests
 from backend.dao.weather_dao import WeatherDAO #this is used for tests
 
@@ -60,6 +61,44 @@ def preprocess_realtime_2(features: Dict[str, Any], timestamp: datetime) -> Dict
     
 
 
+def preprocess_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Vectorized preprocess_realtime_2 over a frame of joined packets (see load_full_packets_frame).
+    Returns the model features in the same order as the realtime dicts.
+    """
+    hour = df["DATE_TIME"].dt.hour.to_numpy()
+    return pd.DataFrame({
+        "AMBIENT_TEMPERATURE": df["AMBIENT_TEMPERATURE"].to_numpy(dtype=np.float64),
+        "MODULE_TEMPERATURE": df["MODULE_TEMPERATURE"].to_numpy(dtype=np.float64),
+        "IRRADIATION": df["IRRADIATION"].to_numpy(dtype=np.float64),
+        "hour_sin": np.sin(2 * np.pi * hour / 24),
+        "hour_cos": np.cos(2 * np.pi * hour / 24),
+    })
+
+
+
+def predict_many(model, X: pd.DataFrame) -> np.ndarray:
+    """
+    Scores a feature frame without learning, computing each distinct feature row only once.
+    Uses the pipeline predict_many when its final step supports it, predict_one per distinct row otherwise.
+    """
+    if X.empty:
+        return np.empty(0, dtype=np.float64)
+
+    unique, inverse = np.unique(X.to_numpy(dtype=np.float64), axis=0, return_inverse=True)
+    unique_X = pd.DataFrame(unique, columns=X.columns)
+
+    final_step = list(model.steps.values())[-1] if hasattr(model, "steps") else model
+    if hasattr(final_step, "predict_many"):
+        y = model.predict_many(unique_X).to_numpy(dtype=np.float64)
+    else:
+        y = np.array([model.predict_one(x) for x in unique_X.to_dict("records")], dtype=np.float64)
+
+    y = np.nan_to_num(y, nan=0.0)
+    return y[inverse.reshape(-1)]
+
+
+
 def process_one_reading(model, metric, adwin, features: dict, target: float) -> Tuple[float, bool]:
     """
     Contains the training loop for one reading: predict, detect drift, update metric, learn
@@ -80,6 +119,31 @@ def process_one_reading(model, metric, adwin, features: dict, target: float) ->
 
 
 
+# learn_frame builds the feature dicts of this many rows at a time
+FRAME_CHUNK = 1024
+
+
+def learn_frame(model, metric, adwin, X: pd.DataFrame, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Progressive validation over a feature frame: each reading is predicted before it is learned.
+    The rows go through process_one_reading one by one, so predictions, drift flags and metrics are the ones
+    of the row-wise loop; only the feature dicts are built a chunk at a time instead of per reading.
+    Returns the predictions and the drift flags.
+    """
+    n = len(X)
+    y_pred = np.empty(n, dtype=np.float64)
+    drifts = np.zeros(n, dtype=bool)
+    y = np.asarray(y, dtype=np.float64)
+
+    for lo in range(0, n, FRAME_CHUNK):
+        hi = min(n, lo + FRAME_CHUNK)
+        for i, (features, target) in enumerate(zip(X.iloc[lo:hi].to_dict("records"), y[lo:hi].tolist())):
+            y_pred[lo + i], drifts[lo + i] = process_one_reading(model, metric, adwin, features, target)
+
+    return y_pred, drifts
+
+
+
 def run_realtime_controller(
         interval_s: int = 1, data_directory: str = "cleaned_data", 
         plant_id: str= "solar_1", panel_id: str = None, 
@@ -127,34 +191,53 @@ def run_realtime_controller(
 
 
 
-def train_model_on_historical_data(data_directory: str = "cleaned_data", plant_id: str = "solar_1", end_time: datetime = None):
-
-    model = create_model()
-    metric = create_metric()
-    adwin = create_adwin()
+def train_model_on_historical_data(
+        data_directory: str = "cleaned_data", plant_id: str = "solar_1", end_time: datetime = None,
+        checkpoint: ModelCheckpoint = None):
+    """
+    Replays the plant history up to end_time through the model.
+    When a checkpoint is given, training resumes from its state and only rows newer than its last timestamp are replayed.
+    Returns the trained (model, metric, adwin) and the last timestamp learned.
+    """
+    if checkpoint is not None:
+        model, metric, adwin = checkpoint.model, checkpoint.metric, checkpoint.adwin
+        last_timestamp = checkpoint.last_timestamp
+    else:
+        model = create_model()
+        metric = create_metric()
+        adwin = create_adwin()
+        last_timestamp = None
 
     prediction_dao = PredictionDao("historical_predictions")
 
     if end_time is None:
         s = "2020-06-14 23:45:00"
         end_time = datetime.strptime(s, "%Y-%m-%d %H:%M:%S")
-    
-    for historical_data in load_historical_data(data_directory=data_directory, plant_id=plant_id, end_time=end_time):
-        x, y, ts, panel_id = historical_data
-        x = preprocess_realtime_2(x, ts)
-        y_pred, is_drift = process_one_reading(model, metric, adwin, x, y)
 
-        prediction = HistoricalPrediction(
-            timestamp = ts,
-            plant_id= plant_id,
+    df = load_full_packets_frame(data_directory, plant_id, start_time=last_timestamp, end_time=end_time)
+    if last_timestamp is not None:
+        df = df[df["DATE_TIME"] > last_timestamp].reset_index(drop=True)
+    if df.empty:
+        return model, metric, adwin, last_timestamp
+
+    y = df["AC_POWER"].to_numpy(dtype=np.float64)
+    y_pred, drifts = learn_frame(model, metric, adwin, preprocess_frame(df), y)
+
+    timestamps = df["DATE_TIME"].to_numpy(dtype="datetime64[s]").tolist()
+    prediction_dao.save_predictions(
+        HistoricalPrediction(
+            timestamp=ts,
+            plant_id=plant_id,
             panel_id=panel_id,
-            predicted_ac_power=y_pred,
-            real_ac_power=y,
+            predicted_ac_power=pred,
+            real_ac_power=real,
             drift=is_drift
         )
-        prediction_dao.save_prediction(prediction)
+        for ts, panel_id, pred, real, is_drift in zip(timestamps, df["SOURCE_KEY"].tolist(), y_pred.tolist(), y.tolist(), drifts.tolist())
+    )
+    prediction_dao.flush()
 
-    return model, metric, adwin
+    return model, metric, adwin, timestamps[-1]
 
         
 
@@ -1,49 +1,148 @@
+import csv
 import pandas as pd
 import numpy as np
 import time
 from datetime import datetime, timedelta
-from dataclasses import dataclass
+from pathlib import Path
 from typing import Tuple, Dict, Any, Generator, List, Iterable
-from backend.dao.measurements_dao import MeasurementsDAO
-from backend.dao.weather_dao import WeatherDAO
-
-
-def _measurements_and_weather_to_full_packet(
-    measurements: Iterable,
-    weather_list: Iterable,
-    plant_id: str,
-) -> List[tuple]:
-    
-    weather_dict = {
-        (w.timestamp, w.plant_id): w
-        for w in weather_list
-    }
-
-    full_packets = []
-
-    for measure in measurements:
-        key = (measure.timestamp, plant_id)
-
-        if key not in weather_dict:
-            continue
-
-        w = weather_dict[key]
-        weather_info = {
-            "AMBIENT_TEMPERATURE": w.ambient_temperature,
-            "MODULE_TEMPERATURE": w.module_temperature,
-            "IRRADIATION": w.irradiation,
-        }
-
-        full_packets.append(
-            (
-                weather_info,
-                measure.ac_power,
-                measure.timestamp,
-                measure.panel_id,
-            )
-        )
+from backend.dao.measurement_store import DATE_FORMAT, to_epoch
+from backend.dao.storage import CSV, get_storage
+from backend.dao.snapshot import PlantSnapshot, open_snapshot
+
+
+WEATHER_COLUMNS = ["AMBIENT_TEMPERATURE", "MODULE_TEMPERATURE", "IRRADIATION"]
+
 
-    return full_packets
+def _power_column(columns: Iterable[str]) -> str:
+    return "AC_POWER" if "AC_POWER" in columns else "REAL_AC_POWER"
+
+
+def iter_full_packets(
+        data_directory: str = "cleaned_data",
+        plant_id: str = "solar_1", panel_id: str = None,
+        start_time: datetime = None, end_time: datetime = None
+) -> Generator[Tuple[Dict[str, float], float, datetime, str], None, None]:
+    """
+    Streams (weather_info, ac_power, timestamp, panel_id) packets straight from the plant csv in one pass.
+    Power and weather already share a row in the cleaned data, so no join is needed.
+    Other storage backends filter while reading, so their packets come from load_full_packets_frame.
+    """
+    if get_storage() is not CSV:
+        yield from frame_to_full_packets(load_full_packets_frame(data_directory, plant_id, panel_id, start_time, end_time))
+        return
+
+    csv_file = Path(data_directory) / f"{plant_id}.csv"
+    if not csv_file.exists():
+        return
+
+    # DATE_TIME is zero padded, so the range check can compare strings and skip parsing rejected rows
+    start_str = start_time.strftime(DATE_FORMAT) if start_time is not None else None
+    end_str = end_time.strftime(DATE_FORMAT) if end_time is not None else None
+
+    with open(csv_file, newline="") as f:
+        reader = csv.DictReader(f)
+        power_col = _power_column(reader.fieldnames or [])
+
+        for row in reader:
+            date_str = row.get("DATE_TIME")
+            if date_str is None:
+                continue
+            if start_str is not None and date_str < start_str:
+                continue
+            if end_str is not None and date_str > end_str:
+                continue
+            if panel_id is not None and row.get("SOURCE_KEY") != panel_id:
+                continue
+
+            try:
+                weather_info = {col: float(row[col]) for col in WEATHER_COLUMNS}
+                ac_power = float(row[power_col])
+                timestamp = datetime.strptime(date_str, DATE_FORMAT)
+            except (KeyError, ValueError, TypeError):
+                continue
+
+            yield weather_info, ac_power, timestamp, row["SOURCE_KEY"]
+
+
+def load_full_packets_frame(
+        data_directory: str = "cleaned_data",
+        plant_id: str = "solar_1", panel_id: str = None,
+        start_time: datetime = None, end_time: datetime = None
+) -> pd.DataFrame:
+    """
+    Bulk counterpart of iter_full_packets: loads the joined rows of a plant as a time sorted DataFrame
+    with columns DATE_TIME, SOURCE_KEY, AC_POWER and the weather features.
+    The time and panel filters are pushed down to the storage backend when it supports it.
+    """
+    columns = ["DATE_TIME", "SOURCE_KEY", "AC_POWER", *WEATHER_COLUMNS]
+
+    storage = get_storage()
+    path = storage.plant_path(data_directory, plant_id)
+    if storage.version(path) is None:
+        return pd.DataFrame(columns=columns)
+
+    snapshot = open_snapshot(path) if storage is CSV else None
+    if snapshot is not None and "frame_timestamps" in snapshot:
+        return snapshot_packets_frame(snapshot, panel_id, start_time, end_time)
+
+    power_col = _power_column(storage.columns(path))
+    try:
+        df = storage.read(
+            path, ["DATE_TIME", "SOURCE_KEY", power_col, *WEATHER_COLUMNS], dtype={"SOURCE_KEY": str},
+            start_time=start_time, end_time=end_time, panel_id=panel_id,
+        )
+    except ValueError:
+        return pd.DataFrame(columns=columns)
+
+    df = df.rename(columns={power_col: "AC_POWER"})
+    df["DATE_TIME"] = pd.to_datetime(df["DATE_TIME"], format=DATE_FORMAT, errors="coerce")
+    for col in ["AC_POWER", *WEATHER_COLUMNS]:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+
+    mask = df.notna().all(axis=1)
+    if start_time is not None:
+        mask &= df["DATE_TIME"] >= start_time
+    if end_time is not None:
+        mask &= df["DATE_TIME"] <= end_time
+    if panel_id is not None:
+        mask &= df["SOURCE_KEY"] == panel_id
+
+    df = df.loc[mask, columns]
+    return df.sort_values("DATE_TIME", kind="stable").reset_index(drop=True)
+
+
+def snapshot_packets_frame(snapshot: PlantSnapshot, panel_id: str = None, start_time: datetime = None, end_time: datetime = None) -> pd.DataFrame:
+    """load_full_packets_frame answered from the packet columns of a snapshot: a binary search on time, no parsing."""
+    timestamps = snapshot.column("frame_timestamps")
+    lo = 0 if start_time is None else int(np.searchsorted(timestamps, to_epoch(start_time), side="left"))
+    hi = len(timestamps) if end_time is None else int(np.searchsorted(timestamps, to_epoch(end_time), side="right"))
+    rows = np.arange(lo, max(lo, hi))
+
+    panel_ids = snapshot.meta["frame_panel_ids"]
+    codes = snapshot.column("frame_panel_codes")
+    if panel_id is not None:
+        code = panel_ids.index(panel_id) if panel_id in panel_ids else -1
+        rows = rows[codes[rows] == code]
+
+    return pd.DataFrame({
+        "DATE_TIME": timestamps[rows].astype("datetime64[s]").astype("datetime64[ns]"),
+        "SOURCE_KEY": np.asarray(panel_ids, dtype=object)[codes[rows]],
+        "AC_POWER": snapshot.column("frame_ac_power")[rows],
+        **{col: snapshot.column(f"frame_{col.lower()}")[rows] for col in WEATHER_COLUMNS},
+    })
+
+
+def frame_to_full_packets(df: pd.DataFrame) -> List[Tuple[Dict[str, float], float, datetime, str]]:
+    weather = zip(*(df[col].tolist() for col in WEATHER_COLUMNS))
+    return [
+        (dict(zip(WEATHER_COLUMNS, w)), ac_power, ts, panel_id)
+        for w, ac_power, ts, panel_id in zip(
+            weather,
+            df["AC_POWER"].tolist(),
+            df["DATE_TIME"].to_numpy(dtype="datetime64[s]").tolist(),
+            df["SOURCE_KEY"].tolist(),
+        )
+    ]
 
 
 def weather_stream_simulator(
@@ -51,7 +150,8 @@ def weather_stream_simulator(
         plant_id: str= "solar_1", 
         start_time: datetime = None, end_time: datetime = None
 ) -> Generator[Tuple[dict, float, datetime, str], None, None]:
-    
+    from backend.dao.weather_dao import WeatherDAO
+
     weather_dao = WeatherDAO(data_directory=data_directory)
 
     weathers = weather_dao.get_weather_measurements_by_plant_id_and_time_range(plant_id=plant_id,  start_time=start_time, end_time=end_time)
@@ -66,7 +166,8 @@ def panel_stream_simulator(interval_s: int = 1, data_directory: str = "cleaned_d
         plant_id: str= "solar_1", 
         start_time: datetime = None, end_time: datetime = None
 ) -> Generator[Tuple[dict, float, datetime, str], None, None]:
-    
+    from backend.dao.measurements_dao import MeasurementsDAO
+
     measurements_dao = MeasurementsDAO(data_directory=data_directory)
             
     measurements = measurements_dao.get_panel_measurements_by_plant_id_and_time_range(plant_id=plant_id, start_time=start_time, end_time=end_time)
@@ -82,29 +183,8 @@ def full_packet_stream_simulator(
         plant_id: str= "solar_1", panel_id: str = None, 
         start_time: datetime = None, end_time: datetime = None
 ) -> Generator[Tuple[dict, float, datetime, str], None, None]:
-    
-    measurement_dao = MeasurementsDAO (data_directory=data_directory)
-    weather_dao = WeatherDAO(data_directory=data_directory)
 
-    full_packets = []
-    measurements = []
-    weathers = []
-
-    
-    if panel_id is None:
-        measurements = measurement_dao.get_panel_measurements_by_plant_id_and_time_range(plant_id, start_time=start_time, end_time=end_time)
-        weathers = weather_dao.get_weather_measurements_by_plant_id_and_time_range(plant_id=plant_id, start_time=start_time, end_time=end_time)
-    else:
-        measurements = measurement_dao.get_panel_measurements_by_panel_id_and_time_range(plant_id=plant_id, panel_id=panel_id, start_time=start_time, end_time=end_time)
-        weathers = weather_dao.get_weather_measurements_by_plant_id_and_time_range(plant_id, start_time=start_time, end_time=end_time)
-
-    full_packets = _measurements_and_weather_to_full_packet(
-        measurements=measurements,
-        weather_list=weathers,
-        plant_id=plant_id,
-    )   
-
-    for packet in full_packets:
+    for packet in iter_full_packets(data_directory, plant_id, panel_id, start_time, end_time):
         yield packet
         if interval_s != 0:
             time.sleep(interval_s)
@@ -113,32 +193,12 @@ def full_packet_stream_simulator(
 def load_historical_data(
         data_directory: str = "cleaned_data", 
         plant_id: str= "solar_1", 
-        end_time: datetime = None
+        end_time: datetime = None,
+        start_time: datetime = None,
 ) -> List[Tuple[Dict[str, Any], float, datetime, str]]:
-    
-    measurement_dao = MeasurementsDAO (data_directory=data_directory)
-    weather_dao = WeatherDAO(data_directory=data_directory)
-
-    full_packets = []
-    measurements = []
-    weathers = []
-
-    if end_time is None:
-        measurements = measurement_dao.get_all_panel_measurements_by_plant_id(plant_id)
-        weathers = weather_dao.get_all_weather_measurements_by_plant_id(plant_id)
-
-    else:
-        measurements = measurement_dao.get_panel_measurements_by_plant_id_and_time_range(plant_id, end_time=end_time, start_time=None)
-        weathers = weather_dao.get_weather_measurements_by_plant_id_and_time_range(plant_id=plant_id, end_time=end_time, start_time = None)
 
-    
-    full_packets = _measurements_and_weather_to_full_packet(
-        measurements=measurements,
-        weather_list=weathers,
-        plant_id=plant_id,
-    )
-   
-    return full_packets
+    df = load_full_packets_frame(data_directory, plant_id, start_time=start_time, end_time=end_time)
+    return frame_to_full_packets(df)
 
 
 def load_future_weather_data(
@@ -146,36 +206,16 @@ def load_future_weather_data(
         plant_id: str= "solar_1", 
         end_time: datetime = None,
         start_time: datetime = None,
-) -> List[Tuple[Dict[str, Any], datetime, str]]:
-    
-    measurement_dao = MeasurementsDAO (data_directory=data_directory)
-    weather_dao = WeatherDAO(data_directory=data_directory)
-
-    full_packets = []
-    measurements = []
-    weathers = []
-
-
-    if start_time is None and end_time is None:
-        measurements = measurement_dao.get_all_panel_measurements_by_plant_id(plant_id)
-        weathers = weather_dao.get_all_weather_measurements_by_plant_id(plant_id)
+) -> List[Tuple[Dict[str, Any], float, datetime, str]]:
 
-    else:
+    if start_time is not None or end_time is not None:
         if end_time is None:
             end_time = datetime.max
         if start_time is None:
             start_time = datetime.max
-        measurements = measurement_dao.get_panel_measurements_by_plant_id_and_time_range(plant_id, end_time=end_time, start_time=start_time)
-        weathers = weather_dao.get_weather_measurements_by_plant_id_and_time_range(plant_id=plant_id, end_time=end_time, start_time = start_time)
-
 
-    full_packets = _measurements_and_weather_to_full_packet(
-        measurements=measurements,
-        weather_list=weathers,
-        plant_id=plant_id,
-    )
-   
-    return full_packets
+    df = load_full_packets_frame(data_directory, plant_id, start_time=start_time, end_time=end_time)
+    return frame_to_full_packets(df)
 
 
 
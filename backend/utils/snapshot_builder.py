@@ -0,0 +1,79 @@
+import sys
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from backend.dao.measurement_store import load_plant_measurements
+from backend.dao.weather_store import load_plant_weather, WEATHER_COLUMNS
+from backend.dao.snapshot import snapshot_path, write_snapshot
+from backend.dao.storage import CSV, get_storage
+from backend.utils.sensor_stream_simulator import load_full_packets_frame
+
+
+def build_snapshot(csv_file: Path) -> Path:
+    """
+    Compiles one plant csv into its .snap file: the measurement columns, the deduplicated weather
+    and the joined packet frame, exactly as the csv loaders produce them.
+    The snapshot records the csv version it was built from and is ignored once the csv changes.
+    """
+    if get_storage() is not CSV:
+        raise ValueError("Snapshots are compiled from the csv backend, set STORAGE_BACKEND=csv")
+
+    csv_file = Path(csv_file)
+    path = snapshot_path(csv_file)
+    # the loaders below must parse the csv, not read back the snapshot being replaced
+    path.unlink(missing_ok=True)
+    source = CSV.version(csv_file)
+
+    plant = load_plant_measurements(csv_file)
+    panel_rows = [plant.panel_rows[p] for p in plant.panel_ids]
+    columns = {
+        "timestamps": plant.timestamps,
+        "panel_codes": plant.panel_codes,
+        "ac_power": plant.ac_power,
+        "by_panel": np.concatenate(panel_rows) if panel_rows else np.empty(0, dtype=np.int64),
+        "panel_splits": np.cumsum([len(r) for r in panel_rows[:-1]], dtype=np.int64),
+        "global_timestamps": plant.global_timestamps,
+        "global_power": plant.global_power,
+    }
+    meta = {"source": list(source), "plant_id": csv_file.stem, "panel_ids": plant.panel_ids}
+
+    weather = load_plant_weather(csv_file)
+    if len(weather):
+        columns["weather_timestamps"] = weather.timestamps
+        columns["weather_ambient_temperature"] = weather.ambient_temperature
+        columns["weather_module_temperature"] = weather.module_temperature
+        columns["weather_irradiation"] = weather.irradiation
+
+    frame = load_full_packets_frame(str(csv_file.parent), csv_file.stem)
+    if len(frame):
+        codes, uniques = pd.factorize(frame["SOURCE_KEY"].to_numpy())
+        columns["frame_timestamps"] = frame["DATE_TIME"].to_numpy(dtype="datetime64[s]").astype(np.int64)
+        columns["frame_panel_codes"] = codes.astype(np.int32)
+        columns["frame_ac_power"] = frame["AC_POWER"].to_numpy(dtype=np.float64)
+        for col in WEATHER_COLUMNS:
+            columns[f"frame_{col.lower()}"] = frame[col].to_numpy(dtype=np.float64)
+        meta["frame_panel_ids"] = [str(p) for p in uniques]
+
+    if CSV.version(csv_file) != source:
+        raise RuntimeError(f"{csv_file} changed while its snapshot was built")
+
+    write_snapshot(path, columns, meta)
+    return path
+
+
+def build_snapshots(directory: str = "cleaned_data") -> List[Path]:
+    written = []
+    for csv_file in sorted(Path(directory).glob("*.csv")):
+        path = build_snapshot(csv_file)
+        written.append(path)
+        print(f"Compiled {csv_file} -> {path} ({path.stat().st_size} bytes)")
+    return written
+
+
+if __name__ == "__main__":
+    # python -m backend.utils.snapshot_builder cleaned_data
+    for directory in sys.argv[1:] or ["cleaned_data"]:
+        build_snapshots(directory)
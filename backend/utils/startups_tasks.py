@@ -1,29 +1,123 @@
+import atexit
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from backend.utils.model_script import train_model_on_historical_data
 from backend.dao.plant_dao import PlantsDAO
+from backend.dao.checkpoint_dao import CheckpointDao
+from backend.models.checkpoint import ModelCheckpoint
+from backend.services.model_learner import ModelLearners
+from backend.dao.storage import get_storage, set_storage
 from datetime import datetime
 
 
+def _bootstrap_plant(data_directory: str, checkpoint_directory: str, plant_id: str, end_time: datetime, storage: str = "csv"):
+    """
+    Trains the model of one plant, runs inside a worker process.
+    Resumes from the plant checkpoint when there is one, then writes the updated checkpoint.
+    The (model, metric, adwin) triple and the last learned timestamp are pickled back to the parent.
+    """
+    start = time.perf_counter()
+    set_storage(storage)
+    checkpoint_dao = CheckpointDao(checkpoint_directory)
+    checkpoint = checkpoint_dao.get_by_plant_id(plant_id)
+
+    model, metric, adwin, last_timestamp = train_model_on_historical_data(
+        data_directory=data_directory,
+        plant_id=plant_id,
+        end_time=end_time,
+        checkpoint=checkpoint
+    )
+    checkpoint_dao.save(ModelCheckpoint(plant_id, model, metric, adwin, last_timestamp))
+
+    resumed_from = checkpoint.last_timestamp if checkpoint is not None else None
+    return plant_id, (model, metric, adwin), last_timestamp, resumed_from, time.perf_counter() - start
+
+
+def save_checkpoints(app):
+    checkpoint_dao = CheckpointDao(app.config.get("CHECKPOINT_DIRECTORY", "model_checkpoints"))
+    for learner in app.learners:
+        (model, metric, adwin), last_timestamp = learner.state()
+        checkpoint_dao.save(ModelCheckpoint(learner.plant_id, model, metric, adwin, last_timestamp))
+
+
+def start_checkpoint_writer(app):
+    """Writes the checkpoints every CHECKPOINT_INTERVAL_S seconds and once more when the process exits."""
+    interval_s = app.config.get("CHECKPOINT_INTERVAL_S", 0)
+    lock = threading.Lock()
+
+    def write():
+        with lock:
+            try:
+                save_checkpoints(app)
+            except Exception as e:
+                print(f"Checkpoint write failed: {e}")
+
+    def loop():
+        while True:
+            time.sleep(interval_s)
+            write()
+
+    if interval_s > 0:
+        threading.Thread(target=loop, name="checkpoint-writer", daemon=True).start()
+    atexit.register(write)
+
+
 def startup_tasks(app):
 
     print("Server strtup...")
 
     models = {}
+    last_learned = {}
 
-    plants_dao = PlantsDAO("cleaned_data")
+    data_directory = app.config.get("DATA_DIRECTORY", "cleaned_data")
+    checkpoint_directory = app.config.get("CHECKPOINT_DIRECTORY", "model_checkpoints")
+    plants_dao = PlantsDAO(data_directory)
     plants = plants_dao.get_all()
 
     s ="2020-06-14 23:45:00"  # this is for simulation in the app
     end_time = datetime.strptime(s, "%Y-%m-%d %H:%M:%S")
 
-    for plant in plants:
-        print(f"\r\nInitialization of the model for plant {plant.name}")
-        model, metric, adwin  = train_model_on_historical_data(
-            data_directory="cleaned_data",
-            plant_id=plant.id,
-            end_time=end_time
-        )
-        models[plant.id] = (model, metric, adwin)
-    
-    print("\r\nModels initialization ended!\r\n")
-
-    app.models = models
\ No newline at end of file
+    storage = get_storage().name
+    workers = max(1, min(app.config.get("STARTUP_WORKERS", 1), len(plants)))
+    start = time.perf_counter()
+
+    def collect(result):
+        plant_id, triple, last_timestamp, resumed_from, elapsed = result
+        models[plant_id] = triple
+        last_learned[plant_id] = last_timestamp
+        origin = f"checkpoint at {resumed_from}" if resumed_from is not None else "scratch"
+        print(f"Model for plant {plant_id} ready in {elapsed:.2f}s (from {origin}, learned up to {last_timestamp})")
+
+    if workers == 1:
+        for plant in plants:
+            print(f"\r\nInitialization of the model for plant {plant.name}")
+            collect(_bootstrap_plant(data_directory, checkpoint_directory, plant.id, end_time, storage))
+    else:
+        print(f"\r\nInitialization of the models for {len(plants)} plants on {workers} workers")
+        # spawn on every platform, forking a process that already runs threads is unsafe
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [pool.submit(_bootstrap_plant, data_directory, checkpoint_directory, plant.id, end_time, storage) for plant in plants]
+            for future in as_completed(futures):
+                collect(future.result())
+
+    print(f"\r\nModels initialization ended in {time.perf_counter() - start:.2f}s!\r\n")
+
+    app.models = models
+    app.last_learned = last_learned
+    app.bootstrap_end_time = end_time
+    app.learners = ModelLearners(models, last_learned)
+
+    start_checkpoint_writer(app)
+
+
+def start_ingestion(app):
+    """Feeds the slots after the bootstrapped history to the plant learners, the live data path of the app."""
+    service = app.services.ingestion_service
+    if service is None:
+        return
+
+    plant_ids = [learner.plant_id for learner in app.learners]
+    print(f"Ingestion of {len(plant_ids)} plants started, one slot every {app.config['INGESTION_INTERVAL_S']}s")
+    service.start(plant_ids)
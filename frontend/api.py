@@ -1,7 +1,53 @@
+import threading
+from collections import OrderedDict
+
 import requests
 import streamlit as st
 
 BASE_URL = "http://127.0.0.1:5000"  # Flask backend
+VALIDATED_CACHE_SIZE = 256
+
+# (url, params) -> (etag, last_modified, body) of the responses the backend sent an ETag with
+_validated = OrderedDict()
+_validated_lock = threading.Lock()
+
+
+def get_json(url, params=None):
+    """
+    GET returning the decoded json body.
+    Bodies sent with an ETag are kept, and the next request for the same url and params is conditional:
+    when the data did not change the backend answers 304 without a body and the kept one is returned.
+    """
+    key = (url, tuple(sorted((params or {}).items())))
+    with _validated_lock:
+        cached = _validated.get(key)
+
+    headers = {}
+    if cached is not None:
+        etag, last_modified, _ = cached
+        headers["If-None-Match"] = etag
+        if last_modified is not None:
+            headers["If-Modified-Since"] = last_modified
+
+    response = requests.get(url, params=params, headers=headers)
+    if response.status_code == 304 and cached is not None:
+        with _validated_lock:
+            if key in _validated:
+                _validated.move_to_end(key)
+        return cached[2]
+
+    response.raise_for_status()
+    body = response.json()
+
+    etag = response.headers.get("ETag")
+    if etag is not None:
+        with _validated_lock:
+            _validated[key] = (etag, response.headers.get("Last-Modified"), body)
+            _validated.move_to_end(key)
+            while len(_validated) > VALIDATED_CACHE_SIZE:
+                _validated.popitem(last=False)
+    return body
+
 
 @st.cache_data(ttl=600)
 def get_plants():
@@ -43,10 +89,7 @@ def get_predictions_by_plant_id(plant_id, start_time = None, end_time = None):
         if end_time is not None:
             params["end_time"] = end_time
 
-        response = requests.get(f"{BASE_URL}/plants/{plant_id}/predictions", params=params)
-        response.raise_for_status()
-
-        return response.json()
+        return get_json(f"{BASE_URL}/plants/{plant_id}/predictions", params=params)
     
     except requests.RequestException as e:
         print(f"Error fetching predictions for plant {plant_id}: {e}")
@@ -73,10 +116,7 @@ def get_measurements_by_plant_id(plant_id, start_time = None, end_time = None):
         if end_time is not None:
             params["end_time"] = end_time
 
-        response = requests.get(f"{BASE_URL}/plants/{plant_id}/measurements", params=params)
-        response.raise_for_status()
-
-        return response.json()
+        return get_json(f"{BASE_URL}/plants/{plant_id}/measurements", params=params)
     
     except requests.RequestException as e:
         print(f"Error fetching predictions for plant {plant_id}: {e}")
@@ -103,10 +143,7 @@ def get_measurements_by_panel_id(plant_id, panel_id, start_time = None, end_time
         if end_time is not None:
             params["end_time"] = end_time
 
-        response = requests.get(f"{BASE_URL}/plants/{plant_id}/panels/{panel_id}/measurements", params=params)
-        response.raise_for_status()
-
-        return response.json()
+        return get_json(f"{BASE_URL}/plants/{plant_id}/panels/{panel_id}/measurements", params=params)
     
     except requests.RequestException as e:
         print(f"Error fetching measurements for panel {panel_id}: {e}")
@@ -121,10 +158,7 @@ def get_predictions_by_panel_id(plant_id, panel_id, start_time = None, end_time=
         if end_time is not None:
             params["end_time"] = end_time
         
-        response = requests.get(f"{BASE_URL}/plants/{plant_id}/panels/{panel_id}/predictions", params=params)
-        response.raise_for_status()
-
-        return response.json()
+        return get_json(f"{BASE_URL}/plants/{plant_id}/panels/{panel_id}/predictions", params=params)
     
     except requests.RequestException as e:
         print(f"Error fetching predictions for panel {panel_id}: {e}")
@@ -193,9 +227,7 @@ def get_drift_summary_by_plant_id(plant_id, start_time=None, end_time=None):
 @st.cache_data(ttl=600)
 def get_LSTM_measurements_by_plant_id_and_panel_id(plant_id, panel_id):
     try:
-        response = requests.get(f"{BASE_URL}/plants/{plant_id}/panels/{panel_id}/lstm_measurements")
-        response.raise_for_status()
-        return response.json()
+        return get_json(f"{BASE_URL}/plants/{plant_id}/panels/{panel_id}/lstm_measurements")
     except Exception as e:
         print(f"Error fetching drift summary: {e}")
         return {}
@@ -204,9 +236,19 @@ def get_LSTM_measurements_by_plant_id_and_panel_id(plant_id, panel_id):
 @st.cache_data(ttl=600)
 def get_LSTM_predictions_by_plant_id_and_panel_id(plant_id, panel_id):
     try:
-        response = requests.get(f"{BASE_URL}/plants/{plant_id}/panels/{panel_id}/lstm_predictions")
+        return get_json(f"{BASE_URL}/plants/{plant_id}/panels/{panel_id}/lstm_predictions")
+    except Exception as e:
+        print(f"Error fetching drift summary: {e}")
+        return {}
+
+
+@st.cache_data(ttl=600)
+def get_LSTM_forecast_by_plant_id_and_panel_id(plant_id, panel_id, time):
+    try:
+        params = {"time": time}
+        response = requests.get(f"{BASE_URL}/plants/{plant_id}/panels/{panel_id}/lstm_forecast", params=params)
         response.raise_for_status()
         return response.json()
     except Exception as e:
-        print(f"Error fetching drift summary: {e}")
-        return {}
\ No newline at end of file
+        print(f"Error fetching LSTM forecast for panel {panel_id}: {e}")
+        return []
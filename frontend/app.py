@@ -14,7 +14,8 @@ from api import (
     get_new_prediction_by_plant_id,
     get_new_prediction_by_panel_id,
     get_LSTM_measurements_by_plant_id_and_panel_id,
-    get_LSTM_predictions_by_plant_id_and_panel_id
+    get_LSTM_predictions_by_plant_id_and_panel_id,
+    get_LSTM_forecast_by_plant_id_and_panel_id
 )
 
 
@@ -297,6 +298,16 @@ if st.session_state.selected_panel_id:
             color=["#1f77b4", "#ff7f0e"]
         )
 
+    st.subheader(f"Panel {panel_number} LSTM day-ahead forecast")
+    with st.spinner("Running LSTM forecast..."):
+        lstm_forecast = get_LSTM_forecast_by_plant_id_and_panel_id(selected_plant_id, panel_id, next_sim_time_str)
+    df_lstm_f = to_dataframe(lstm_forecast)
+
+    if not df_lstm_f.empty:
+        st.line_chart(df_lstm_f.set_index("timestamp")["ac_power"], color="#2ca02c")
+    else:
+        st.info("Not enough data around the simulation time for an LSTM forecast.")
+
     if st.button("Clear panel selection"):
         st.session_state.selected_panel_id = None
         st.rerun()
\ No newline at end of file
@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from backend.dao.storage import DATE_FORMAT
+
+
+START = datetime(2020, 5, 15)
+PANELS = ["0NOh1cLO0KhgijO", "1BY6WEcLGh8j5v7", "zVJPv84UY57bAof"]
+
+
+def make_plant_frame(days=3, panels=PANELS, seed=0) -> pd.DataFrame:
+    """Cleaned data rows of one plant: a reading per panel every 15 minutes, a few missing, time sorted."""
+    rng = np.random.default_rng(seed)
+    slots = [START + timedelta(minutes=15 * i) for i in range(days * 96)]
+    rows = []
+    for ts in slots:
+        irradiation = max(0.0, np.sin(np.pi * (ts.hour * 60 + ts.minute - 360) / 720))
+        for panel_id in rng.permutation(panels):
+            if rng.random() < 0.03:
+                continue
+            rows.append({
+                "DATE_TIME": ts.strftime(DATE_FORMAT),
+                "SOURCE_KEY": panel_id,
+                "AC_POWER": round(1000 * irradiation * rng.uniform(0.8, 1.0), 3),
+                "AMBIENT_TEMPERATURE": round(20 + 10 * irradiation + rng.normal(0, 0.5), 3),
+                "MODULE_TEMPERATURE": round(20 + 30 * irradiation + rng.normal(0, 0.5), 3),
+                "IRRADIATION": round(irradiation, 4),
+            })
+    return pd.DataFrame(rows)
+
+
+def make_prediction_frame(plant_id="solar_1", days=3, seed=1) -> pd.DataFrame:
+    """Historical predictions in the PredictionDao layout for the readings of make_plant_frame."""
+    rng = np.random.default_rng(seed)
+    df = make_plant_frame(days, seed=seed)
+    return pd.DataFrame({
+        "DATE_TIME": df["DATE_TIME"],
+        "PLANT_ID": plant_id,
+        "SOURCE_KEY": df["SOURCE_KEY"],
+        "PREDICTED_AC_POWER": (df["AC_POWER"] + rng.normal(0, 20, len(df))).round(3),
+        "REAL_AC_POWER": df["AC_POWER"],
+        "DRIFT": rng.random(len(df)) < 0.05,
+    })
+
+
+def write_plant(directory, plant_id="solar_1", **kwargs) -> Path:
+    """Writes make_plant_frame as <directory>/<plant_id>.csv, with the index column of the cleaned files."""
+    path = Path(directory) / f"{plant_id}.csv"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    make_plant_frame(**kwargs).to_csv(path)
+    return path
+
+
+def write_predictions(directory, plant_id="solar_1", **kwargs) -> Path:
+    path = Path(directory) / f"{plant_id}.csv"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    make_prediction_frame(plant_id, **kwargs).to_csv(path, index=False)
+    return path
@@ -0,0 +1,53 @@
+import unittest
+
+import numpy as np
+
+from InclLSTM.inclLSTM import IncLSTMDual
+
+
+STEPS_PAST, FEATURES_PAST, STEPS_FUTURE, FEATURES_FUTURE = 8, 6, 4, 5
+
+
+def make_windows(n, seed):
+    rng = np.random.default_rng(seed)
+    return (
+        rng.random((n, STEPS_PAST, FEATURES_PAST)),
+        rng.random((n, STEPS_FUTURE, FEATURES_FUTURE)),
+        rng.random((n, STEPS_FUTURE)),
+    )
+
+
+class CompileInferenceTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # a base learner and two transfer learners, each built on the one before it
+        cls.system = IncLSTMDual(STEPS_PAST, FEATURES_PAST, STEPS_FUTURE, FEATURES_FUTURE, buffer_size=5)
+        for seed in range(3):
+            cls.system.fit_incremental(*make_windows(64, seed), epochs=1)
+        cls.system.learner_weights = [0.5, 0.2, 0.3]
+        cls.X_past, cls.X_future, _ = make_windows(300, 10)
+
+    def assert_fused_matches_learners(self, system):
+        system._fused = None
+        expected = system.combine(system.predict_learners(self.X_past, self.X_future))
+        stats = system.compile_inference()
+        np.testing.assert_allclose(system.predict(self.X_past, self.X_future), expected, rtol=1e-4, atol=1e-5)
+        return stats
+
+    def test_fused_ensemble_matches_per_learner_predictions(self):
+        stats = self.assert_fused_matches_learners(self.system)
+        # both transfer learners reuse the hidden state of the learner before them
+        self.assertEqual(stats, {"learners": 3, "shared_branches": 2})
+
+    def test_fused_ensemble_without_the_source_of_an_old_branch(self):
+        system = IncLSTMDual(STEPS_PAST, FEATURES_PAST, STEPS_FUTURE, FEATURES_FUTURE, buffer_size=5)
+        # the middle learner dropped, as update_weights_and_buffer does: the last old branch is computed on its own
+        system.weak_learners = [self.system.weak_learners[0], self.system.weak_learners[2]]
+        system.learner_weights = [0.4, 0.6]
+        stats = self.assert_fused_matches_learners(system)
+        self.assertEqual(stats, {"learners": 2, "shared_branches": 0})
+
+
+if __name__ == "__main__":
+    unittest.main()
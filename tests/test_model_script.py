@@ -0,0 +1,52 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from backend.utils.model_script import FRAME_CHUNK, create_adwin, create_metric, create_model, learn_frame, process_one_reading
+
+
+def make_frame(n=3000, seed=0):
+    """Synthetic readings with the features of preprocess_frame and a drift halfway through."""
+    rng = np.random.default_rng(seed)
+    hour = rng.integers(0, 24, n)
+    X = pd.DataFrame({
+        "AMBIENT_TEMPERATURE": rng.uniform(15, 35, n),
+        "MODULE_TEMPERATURE": rng.uniform(15, 60, n),
+        "IRRADIATION": rng.uniform(0, 1.2, n),
+        "hour_sin": np.sin(2 * np.pi * hour / 24),
+        "hour_cos": np.cos(2 * np.pi * hour / 24),
+    })
+    y = 1000 * X["IRRADIATION"].to_numpy() + rng.normal(0, 20, n)
+    y[n // 2:] *= 0.6
+    return X, y
+
+
+def row_wise(X, y):
+    model, metric, adwin = create_model(), create_metric(), create_adwin()
+    results = [process_one_reading(model, metric, adwin, features, target) for features, target in zip(X.to_dict("records"), y.tolist())]
+    y_pred = np.array([r[0] for r in results], dtype=np.float64)
+    drifts = np.array([r[1] for r in results], dtype=bool)
+    return model, metric, y_pred, drifts
+
+
+class LearnFrameParityTest(unittest.TestCase):
+
+    def test_matches_process_one_reading(self):
+        X, y = make_frame()
+        self.assertGreater(len(X), 2 * FRAME_CHUNK)
+        ref_model, ref_metric, ref_pred, ref_drifts = row_wise(X, y)
+
+        model, metric, adwin = create_model(), create_metric(), create_adwin()
+        y_pred, drifts = learn_frame(model, metric, adwin, X, y)
+
+        np.testing.assert_array_equal(y_pred, ref_pred)
+        np.testing.assert_array_equal(drifts, ref_drifts)
+        self.assertTrue(ref_drifts.any())
+        self.assertEqual(metric.get(), ref_metric.get())
+        for features in X.head(50).to_dict("records"):
+            self.assertEqual(model.predict_one(features), ref_model.predict_one(features))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import json
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+from flask import Flask
+
+from backend.routes.panels import panels_bp
+from backend.services.panels_service import PanelsService
+from backend.utils.downsampling import lttb_indices
+from tests.helpers import PANELS, make_plant_frame, write_plant
+
+
+PANEL = PANELS[0]
+URL = f"/plants/solar_1/panels/{PANEL}/measurements"
+
+
+class PanelMeasurementRoutesTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.data_directory = Path(cls.tmp.name) / "cleaned_data"
+        cls.plant_file = write_plant(cls.data_directory, "solar_1", days=4)
+
+        app = Flask(__name__)
+        app.register_blueprint(panels_bp)
+        app.services = SimpleNamespace(panels_service=PanelsService(cls.data_directory))
+        cls.client = app.test_client()
+
+        df = make_plant_frame(days=4)
+        cls.rows = df[df["SOURCE_KEY"] == PANEL].reset_index(drop=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def get(self, **args):
+        response = self.client.get(URL, query_string=args)
+        return response, response.get_json()
+
+    def test_cursor_pages_cover_the_range_once(self):
+        _, everything = self.get(start_time="2020-05-15T12:00:00")
+        pages, cursor = [], None
+        while True:
+            args = {"start_time": "2020-05-15T12:00:00", "limit": 37}
+            if cursor is not None:
+                args["cursor"] = cursor
+            response, page = self.get(**args)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(page), 37)
+            pages.append(page)
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor is None:
+                break
+            # the cursor is the first row of the next page
+            self.assertGreater(cursor, page[-1]["timestamp"])
+
+        self.assertGreater(len(pages), 5)
+        self.assertEqual([r for page in pages for r in page], everything)
+        self.assertEqual(everything[0]["timestamp"], "2020-05-15T12:00:00")
+
+    def test_streams_match_the_buffered_body(self):
+        _, everything = self.get(end_time="2020-05-17T00:00:00")
+        response = self.client.get(URL, query_string={"end_time": "2020-05-17T00:00:00", "stream": "ndjson"})
+        self.assertEqual([json.loads(line) for line in response.get_data(as_text=True).splitlines()], everything)
+        response = self.client.get(URL, query_string={"end_time": "2020-05-17T00:00:00", "stream": "json", "limit": 100})
+        self.assertEqual(json.loads(response.get_data(as_text=True)), everything[:100])
+
+    def test_lttb_keeps_the_ends_and_the_selected_rows(self):
+        response, points = self.get(agg="lttb", points=40)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(points), 40)
+
+        epochs = pd.to_datetime(self.rows["DATE_TIME"]).to_numpy(dtype="datetime64[s]").astype(np.int64)
+        expected = self.rows.iloc[lttb_indices(epochs, self.rows["AC_POWER"].to_numpy(), 40)]
+        self.assertEqual([p["timestamp"] for p in points], [datetime.fromisoformat(t).isoformat() for t in expected["DATE_TIME"]])
+        self.assertEqual([p["ac_power"] for p in points], expected["AC_POWER"].tolist())
+        self.assertEqual(points[0]["timestamp"], "2020-05-15T00:00:00")
+
+    def test_lttb_with_fewer_rows_than_points_returns_the_range(self):
+        args = {"start_time": "2020-05-16T10:00:00", "end_time": "2020-05-16T12:00:00"}
+        _, everything = self.get(**args)
+        _, points = self.get(agg="lttb", points=500, **args)
+        self.assertEqual(points, everything)
+
+    def test_time_buckets_match_pandas(self):
+        _, buckets = self.get(resolution="1h", agg="mean")
+        expected = self.rows.assign(DATE_TIME=pd.to_datetime(self.rows["DATE_TIME"])).set_index("DATE_TIME")["AC_POWER"].resample("1h").mean().dropna()
+        self.assertEqual([b["timestamp"] for b in buckets], [t.isoformat() for t in expected.index])
+        np.testing.assert_allclose([b["ac_power"] for b in buckets], expected.to_numpy())
+
+    def test_invalid_arguments_are_rejected(self):
+        for args in [
+            {"limit": 0},
+            {"limit": "ten"},
+            {"cursor": "yesterday"},
+            {"stream": "xml"},
+            {"agg": "lttb", "points": 2},
+            {"agg": "lttb", "resolution": "1h"},
+            {"agg": "median", "resolution": "1h"},
+            {"agg": "mean"},
+            {"resolution": "0h"},
+            {"agg": "lttb", "limit": 10},
+            {"resolution": "1h", "cursor": "2020-05-15T00:00:00"},
+        ]:
+            with self.subTest(**args):
+                response, body = self.get(**args)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("error", body)
+
+    def test_etag_revalidation(self):
+        response, _ = self.get(limit=10)
+        etag = response.headers["ETag"]
+        self.assertEqual(self.client.get(URL, query_string={"limit": 10}, headers={"If-None-Match": etag}).status_code, 304)
+        # other arguments, other representation
+        self.assertEqual(self.client.get(URL, query_string={"limit": 11}, headers={"If-None-Match": etag}).status_code, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
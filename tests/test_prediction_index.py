@@ -0,0 +1,85 @@
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+from backend.dao.prediction_dao import PredictionDao
+from backend.models.prediction import HistoricalPrediction
+
+
+START = datetime(2020, 5, 15, 6)
+
+
+def predictions(slots, panels=("a", "b"), plant_id="solar_1", start=START, step=timedelta(minutes=15)):
+    return [
+        HistoricalPrediction(
+            timestamp=start + i * step,
+            plant_id=plant_id,
+            panel_id=panel_id,
+            predicted_ac_power=float(i),
+            real_ac_power=float(i) + 1,
+            drift=False
+        )
+        for i in slots
+        for panel_id in panels
+    ]
+
+
+class PredictionIndexDedupTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = Path(self.tmp.name) / "historical_predictions"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def dao(self, **kwargs):
+        return PredictionDao(self.directory, flush_interval_s=0, **kwargs)
+
+    def written_keys(self, plant_id="solar_1"):
+        df = pd.read_csv(self.directory / f"{plant_id}.csv")
+        return list(zip(df["DATE_TIME"], df["SOURCE_KEY"]))
+
+    def test_duplicates_rejected_across_instances_before_flush(self):
+        first, second = self.dao(), self.dao()
+        first.save_predictions(predictions(range(10)))
+        # overlaps the rows still buffered by the other instance
+        second.save_predictions(predictions(range(5, 15)))
+        first.flush()
+        second.flush()
+
+        keys = self.written_keys()
+        self.assertEqual(len(keys), 30)
+        self.assertEqual(len(set(keys)), 30)
+
+    def test_duplicates_rejected_by_a_new_instance_after_flush(self):
+        dao = self.dao(buffer_size=7)
+        dao.save_predictions(predictions(range(20)))
+        dao.flush()
+
+        other = self.dao()
+        other.save_predictions(predictions(range(20)))
+        other.save_predictions(predictions(range(18, 22)))
+        other.flush()
+
+        keys = self.written_keys()
+        self.assertEqual(len(keys), 44)
+        self.assertEqual(len(set(keys)), 44)
+        self.assertEqual(len(other.get_panel_predictions_by_panel_id_and_time_range("solar_1", "a")), 22)
+
+    def test_off_grid_timestamps_and_plants_are_keyed_separately(self):
+        dao = self.dao()
+        off_grid = predictions(range(4), start=START + timedelta(minutes=7))
+        dao.save_predictions(predictions(range(4)) + off_grid + predictions(range(4), plant_id="solar_2"))
+        self.dao().save_predictions(off_grid + predictions(range(4), plant_id="solar_2"))
+        dao.flush()
+
+        self.assertEqual(len(self.written_keys("solar_1")), 16)
+        self.assertEqual(len(self.written_keys("solar_2")), 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
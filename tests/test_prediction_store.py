@@ -0,0 +1,79 @@
+import unittest
+
+import numpy as np
+
+from backend.dao.prediction_store import PlantPredictions
+
+
+PANELS = ["a", "b", "c", "d"]
+
+
+def make_rows(n, start, seed, panels=PANELS):
+    """n prediction rows on 15 minute slots from start, several panels per slot, in random slot order."""
+    rng = np.random.default_rng(seed)
+    timestamps = start + 900 * rng.integers(0, max(1, n // 3), n)
+    return (
+        timestamps.astype(np.int64),
+        [panels[i] for i in rng.integers(0, len(panels), n)],
+        rng.uniform(0, 1000, n),
+        rng.uniform(0, 1000, n),
+        rng.random(n) < 0.1,
+    )
+
+
+def concat(a, b):
+    return tuple(np.concatenate([x, y]) if isinstance(x, np.ndarray) else list(x) + list(y) for x, y in zip(a, b))
+
+
+class PlantPredictionsAppendTest(unittest.TestCase):
+
+    def assert_same_plant(self, plant, expected):
+        np.testing.assert_array_equal(plant.timestamps, expected.timestamps)
+        np.testing.assert_array_equal(plant.predicted, expected.predicted)
+        np.testing.assert_array_equal(plant.real, expected.real)
+        np.testing.assert_array_equal(plant.drift, expected.drift)
+        np.testing.assert_array_equal(plant.global_timestamps, expected.global_timestamps)
+        np.testing.assert_allclose(plant.global_predicted, expected.global_predicted)
+        self.assertEqual(
+            [plant.panel_ids[c] for c in plant.panel_codes.tolist()],
+            [expected.panel_ids[c] for c in expected.panel_codes.tolist()],
+        )
+        self.assertEqual(set(plant.panel_rows), set(expected.panel_rows))
+        for panel_id, rows in expected.panel_rows.items():
+            np.testing.assert_array_equal(plant.panel_rows[panel_id], rows)
+
+    def test_append_in_time_order_matches_build(self):
+        history = make_rows(500, 1_600_000_000, seed=0, panels=PANELS[:3])
+        batch = make_rows(60, 1_700_000_000, seed=1)
+        plant = PlantPredictions.build(*history)
+
+        appended = plant.appended(*batch)
+
+        self.assert_same_plant(appended, PlantPredictions.build(*concat(history, batch)))
+        # panels missing from the batch keep their row group
+        untouched = set(PANELS[:3]) - set(batch[1])
+        for panel_id in untouched:
+            self.assertIs(appended.panel_rows[panel_id], plant.panel_rows[panel_id])
+
+    def test_late_rows_match_build(self):
+        history = make_rows(500, 1_600_000_000, seed=2)
+        # overlaps the stored range, including timestamps already stored
+        batch = make_rows(40, 1_600_000_000, seed=3)
+
+        appended = PlantPredictions.build(*history).appended(*batch)
+
+        self.assert_same_plant(appended, PlantPredictions.build(*concat(history, batch)))
+
+    def test_successive_appends_match_build(self):
+        rows = make_rows(50, 1_600_000_000, seed=4)
+        plant = PlantPredictions.build(*rows)
+        for seed in range(5, 15):
+            batch = make_rows(30, 1_600_000_000 + 900 * seed, seed=seed)
+            plant = plant.appended(*batch)
+            rows = concat(rows, batch)
+
+        self.assert_same_plant(plant, PlantPredictions.build(*rows))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import tempfile
+import unittest
+from dataclasses import asdict
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from backend.dao.measurements_dao import MeasurementsDAO
+from backend.dao.panel_dao import PanelsDAO
+from backend.dao.prediction_dao import PredictionDao
+from backend.dao.storage import convert_csv_directory, get_storage, set_storage
+from backend.dao.weather_dao import WeatherDAO
+from backend.models.prediction import HistoricalPrediction
+from backend.utils.sensor_stream_simulator import load_full_packets_frame
+from tests.helpers import PANELS, write_plant, write_predictions
+
+
+RANGES = [
+    (None, None),
+    (datetime(2020, 5, 15, 10), datetime(2020, 5, 16, 14, 30)),     # across a day partition
+    (datetime(2020, 5, 16, 6, 7), datetime(2020, 5, 16, 6, 7)),      # between two readings
+    (datetime(2020, 5, 17, 23), None),
+    (datetime(2021, 1, 1), None),                                    # after the data
+]
+
+
+def records(items):
+    return [asdict(i) for i in items]
+
+
+class StorageBackendParityTest(unittest.TestCase):
+    """The same csv data read through the csv files and through the converted Parquet datasets."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        root = Path(cls.tmp.name)
+        for backend in ("csv", "parquet"):
+            write_plant(root / backend / "cleaned_data", "solar_1", seed=0)
+            write_plant(root / backend / "cleaned_data", "solar_2", seed=3)
+            write_predictions(root / backend / "historical_predictions", "solar_1")
+        set_storage("csv")
+        convert_csv_directory(root / "parquet" / "cleaned_data")
+        convert_csv_directory(root / "parquet" / "historical_predictions")
+        cls.root = root
+
+    @classmethod
+    def tearDownClass(cls):
+        set_storage("csv")
+        cls.tmp.cleanup()
+
+    def tearDown(self):
+        set_storage("csv")
+
+    def both(self, read):
+        """read(directory) under each backend, on its own copy of the data."""
+        results = []
+        for backend in ("csv", "parquet"):
+            set_storage(backend)
+            results.append(read(self.root / backend))
+        set_storage("csv")
+        return results
+
+    def assert_same(self, read):
+        csv_result, parquet_result = self.both(read)
+        self.assertEqual(csv_result, parquet_result)
+        return csv_result
+
+    def test_plant_ids_and_panels(self):
+        self.assert_same(lambda d: get_storage().plant_ids(d / "cleaned_data"))
+        panels = self.assert_same(lambda d: [p.id for p in PanelsDAO(d / "cleaned_data").get_all_by_plant_id("solar_1")])
+        self.assertEqual(sorted(panels), sorted(PANELS))
+
+    def test_measurement_ranges(self):
+        for start_time, end_time in RANGES:
+            with self.subTest(start_time=start_time, end_time=end_time):
+                self.assert_same(lambda d: records(MeasurementsDAO(d / "cleaned_data").get_panel_measurements_by_plant_id_and_time_range("solar_1", start_time, end_time)))
+                self.assert_same(lambda d: records(MeasurementsDAO(d / "cleaned_data").get_global_measurements_by_plant_id_and_time_range("solar_1", start_time, end_time)))
+                self.assert_same(lambda d: records(MeasurementsDAO(d / "cleaned_data").get_panel_measurements_by_panel_id_and_time_range("solar_1", PANELS[1], start_time, end_time, limit=50)))
+                self.assert_same(lambda d: records(WeatherDAO(d / "cleaned_data").get_weather_measurements_by_plant_id_and_time_range("solar_2", start_time, end_time)))
+
+    def test_packet_frames_with_pushed_down_filters(self):
+        for start_time, end_time in RANGES:
+            for panel_id in (None, PANELS[2]):
+                with self.subTest(start_time=start_time, end_time=end_time, panel_id=panel_id):
+                    csv_frame, parquet_frame = self.both(lambda d: load_full_packets_frame(d / "cleaned_data", "solar_1", panel_id, start_time, end_time))
+                    pd.testing.assert_frame_equal(csv_frame, parquet_frame, check_dtype=False)
+
+    def test_prediction_ranges_and_appends(self):
+        new = [
+            HistoricalPrediction(timestamp=datetime(2020, 5, 18, h), plant_id="solar_1", panel_id=panel_id, predicted_ac_power=float(h), real_ac_power=1.0, drift=h == 3)
+            for h in range(6)
+            for panel_id in PANELS
+        ]
+
+        def append_and_read(d):
+            dao = PredictionDao(d / "historical_predictions", flush_interval_s=0)
+            # the second save only repeats keys already buffered, the index drops it
+            dao.save_predictions(new)
+            dao.save_predictions(new[:9])
+            dao.flush()
+            return (
+                records(dao.get_panel_predictions_by_plant_id_and_time_range("solar_1", datetime(2020, 5, 17, 20))),
+                records(dao.get_global_predictions_by_plant_id_and_time_range("solar_1")),
+                records(dao.get_panel_predictions_by_panel_id_and_time_range("solar_1", PANELS[0], datetime(2020, 5, 16))),
+            )
+
+        for start_time, end_time in RANGES:
+            with self.subTest(start_time=start_time, end_time=end_time):
+                self.assert_same(lambda d: records(PredictionDao(d / "historical_predictions").get_panel_predictions_by_plant_id_and_time_range("solar_1", start_time, end_time)))
+        panel_rows, _, _ = self.assert_same(append_and_read)
+        self.assertEqual(sum(1 for p in panel_rows if p["timestamp"] >= datetime(2020, 5, 18)), len(new))
+
+
+if __name__ == "__main__":
+    unittest.main()